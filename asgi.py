@@ -0,0 +1,76 @@
+"""
+KingGroup Backend - Async (ASGI) Application
+Same API as main.py on Quart + AsyncSession, run with:
+    hypercorn asgi:app --bind 0.0.0.0:8080
+"""
+import os
+import asyncio
+import datetime
+from quart import Quart, jsonify
+from quart_cors import cors
+from sqlalchemy import text
+
+from config.async_database import async_db_config
+from async_routes.user_routes import user_bp
+from async_routes.map_routes import map_bp
+from async_routes.admin_routes import admin_bp
+from services.last_seen import last_seen
+# Registers the mapper events that keep geography ids in step with the names
+import services.geography
+
+def create_async_app():
+    """Application factory for the async serving mode"""
+    app = Quart(__name__)
+    
+    # Configuration
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'kinggroup-secret-key-2025')
+    
+    # CORS configuration (same origins as main.py)
+    app = cors(app, allow_origin=[
+        'https://kinggrouptech.com',
+        'https://www.kinggrouptech.com',
+        'https://kinggrouptech-93908.web.app',
+        'http://localhost:3000',  # Development
+        'http://localhost:8080'   # Local testing
+    ])
+    
+    # Register blueprints
+    app.register_blueprint(user_bp)
+    app.register_blueprint(map_bp)
+    app.register_blueprint(admin_bp)
+    
+    @app.route('/health/live', methods=['GET'])
+    async def health_live():
+        """Liveness probe: no I/O"""
+        return jsonify({'status': 'alive', 'mode': 'async'})
+    
+    @app.route('/health/ready', methods=['GET'])
+    async def health_ready():
+        """Readiness probe: a single pooled SELECT 1"""
+        try:
+            async with async_db_config.get_session() as session:
+                await session.execute(text("SELECT 1"))
+            return jsonify({'status': 'ready', 'mode': 'async'})
+        except Exception as e:
+            return jsonify({'status': 'not_ready', 'error': str(e)}), 503
+    
+    @app.route('/', methods=['GET'])
+    async def index():
+        """API root endpoint"""
+        return jsonify({
+            'message': 'KingGroup API v2.0 - Async Mode',
+            'version': '2.0.0',
+            'status': 'active',
+            'mode': 'asgi',
+            'timestamp': datetime.datetime.utcnow().isoformat()
+        })
+    
+    @app.after_serving
+    async def dispose_engine():
+        # Write the last-seen times still held in memory before the pools close
+        await asyncio.to_thread(last_seen.flush)
+        await async_db_config.dispose()
+    
+    return app
+
+app = create_async_app()
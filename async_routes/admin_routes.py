@@ -0,0 +1,258 @@
+"""
+Async admin routes for KingGroup backend
+Handles administrative functions and statistics
+"""
+import asyncio
+import datetime
+from quart import Blueprint, Response, request, jsonify
+from sqlalchemy import select, func, or_
+from models.user import User
+from models.map import Map
+from models.download import Download
+from models.geography import Country
+from config.async_database import async_db_config
+from auth.async_jwt_auth import admin_required
+from services.bulk_users import bulk_update_statement, apply_bulk_result, stream_bulk_result, parse_license_expiry
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+async def _count(model, *conditions):
+    """COUNT(*) on its own session so independent counts can run concurrently"""
+    async with async_db_config.get_session() as session:
+        return (await session.execute(select(func.count(model.id)).where(*conditions))).scalar()
+
+async def _all(statement):
+    async with async_db_config.get_session() as session:
+        result = await session.execute(statement)
+        return result.all()
+
+def _users_by_country_statement():
+    """Ten countries with the most users, grouped on the integer key"""
+    country_counts = select(
+        User.country_id,
+        func.count(User.id).label('count')
+    ).where(User.country_id != None).group_by(User.country_id).order_by(
+        func.count(User.id).desc()
+    ).limit(10).subquery()
+    return select(Country.name.label('country'), country_counts.c.count).join(
+        country_counts, Country.id == country_counts.c.country_id
+    ).order_by(country_counts.c.count.desc())
+
+@admin_bp.route('/stats', methods=['GET'])
+@admin_required
+async def get_stats(current_user_id):
+    """Get comprehensive system statistics"""
+    try:
+        # Day bounds as ranges so the date indexes apply (func.date() defeats them)
+        today_start = datetime.datetime.combine(datetime.date.today(), datetime.time.min)
+        tomorrow_start = today_start + datetime.timedelta(days=1)
+        week_ago = datetime.datetime.now() - datetime.timedelta(days=7)
+        month_ago = datetime.datetime.now() - datetime.timedelta(days=30)
+        
+        # Every statistic is independent: fan out and await them together
+        (
+            users_total, users_active, users_premium, users_today, users_week,
+            users_seen_today, users_seen_week, users_seen_month,
+            maps_total, maps_active, maps_premium,
+            downloads_total, downloads_today, downloads_week, downloads_month,
+            map_types, top_maps, recent_downloads, user_countries
+        ) = await asyncio.gather(
+            _count(User),
+            _count(User, User.is_active == True),
+            _count(User, User.is_premium == True),
+            _count(User, User.created_at >= today_start, User.created_at < tomorrow_start),
+            _count(User, User.created_at >= week_ago),
+            _count(User, User.last_seen_at >= today_start),
+            _count(User, User.last_seen_at >= datetime.datetime.utcnow() - datetime.timedelta(days=7)),
+            _count(User, User.last_seen_at >= datetime.datetime.utcnow() - datetime.timedelta(days=30)),
+            _count(Map),
+            _count(Map, Map.is_active == True),
+            _count(Map, Map.is_premium == True),
+            _count(Download),
+            _count(Download, Download.download_date >= today_start, Download.download_date < tomorrow_start),
+            _count(Download, Download.download_date >= week_ago),
+            _count(Download, Download.download_date >= month_ago),
+            _all(select(Map.map_type, func.count(Map.id).label('count')).where(
+                Map.is_active == True
+            ).group_by(Map.map_type)),
+            _all(select(Map.id, Map.map_name, Map.country, Map.download_count).where(
+                Map.is_active == True
+            ).order_by(Map.download_count.desc()).limit(5)),
+            _all(select(Download.id, Download.user_id, Download.map_id, Download.download_date).order_by(
+                Download.download_date.desc()
+            ).limit(10)),
+            _all(_users_by_country_statement())
+        )
+        
+        return jsonify({
+            'users': {
+                'total': users_total,
+                'active': users_active,
+                'premium': users_premium,
+                'new_today': users_today,
+                'new_this_week': users_week,
+                'seen_today': users_seen_today,
+                'seen_this_week': users_seen_week,
+                'seen_this_month': users_seen_month,
+                'by_country': [{'country': row.country, 'count': row.count} for row in user_countries]
+            },
+            'maps': {
+                'total': maps_total,
+                'active': maps_active,
+                'premium': maps_premium,
+                'by_type': {row.map_type: row.count for row in map_types}
+            },
+            'downloads': {
+                'total': downloads_total,
+                'today': downloads_today,
+                'this_week': downloads_week,
+                'this_month': downloads_month
+            },
+            'top_maps': [
+                {
+                    'id': row.id,
+                    'name': row.map_name,
+                    'country': row.country,
+                    'download_count': row.download_count
+                }
+                for row in top_maps
+            ],
+            'recent_activity': [
+                {
+                    'download_id': row.id,
+                    'user_id': row.user_id,
+                    'map_id': row.map_id,
+                    'date': row.download_date.isoformat() if row.download_date else None
+                }
+                for row in recent_downloads
+            ],
+            'generated_at': datetime.datetime.utcnow().isoformat()
+        })
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@admin_bp.route('/users', methods=['GET'])
+@admin_required
+async def get_users(current_user_id):
+    """Get users list with filtering and pagination"""
+    try:
+        active_only = request.args.get('active_only') == 'true'
+        premium_only = request.args.get('premium_only') == 'true'
+        search = request.args.get('search')
+        
+        page = int(request.args.get('page', 1))
+        per_page = min(int(request.args.get('per_page', 20)), 100)
+        offset = (page - 1) * per_page
+        
+        conditions = []
+        if active_only:
+            conditions.append(User.is_active == True)
+        if premium_only:
+            conditions.append(User.is_premium == True)
+        if search:
+            conditions.append(or_(
+                User.username.ilike(f'%{search}%'),
+                User.email.ilike(f'%{search}%'),
+                User.country.ilike(f'%{search}%')
+            ))
+        
+        async def load_page():
+            async with async_db_config.get_session() as session:
+                result = await session.execute(
+                    select(User).where(*conditions).order_by(User.created_at.desc()).offset(offset).limit(per_page)
+                )
+                return result.scalars().all()
+        
+        total, users = await asyncio.gather(_count(User, *conditions), load_page())
+        
+        return jsonify({
+            'users': [user.to_dict(include_sensitive=True) for user in users],
+            'pagination': {
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': (total + per_page - 1) // per_page
+            }
+        })
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+async def _toggle(user_id, field):
+    """Flip a boolean user field, returning the user or None"""
+    async with async_db_config.get_session() as session:
+        user = await session.get(User, user_id)
+        if not user:
+            return None
+        if field == 'is_active' and user.username == 'admin':
+            return user
+        
+        setattr(user, field, not getattr(user, field))
+        await session.commit()
+        await session.refresh(user)
+        return user
+
+@admin_bp.route('/users/<int:user_id>/toggle-status', methods=['POST'])
+@admin_required
+async def toggle_user_status(current_user_id, user_id):
+    """Toggle user active status"""
+    try:
+        user = await _toggle(user_id, 'is_active')
+        if not user:
+            return jsonify({'message': 'Usuário não encontrado'}), 404
+        
+        # Don't allow deactivating admin
+        if user.username == 'admin':
+            return jsonify({'message': 'Não é possível desativar o usuário admin'}), 400
+        
+        return jsonify({
+            'message': f'Usuário {"ativado" if user.is_active else "desativado"} com sucesso',
+            'user': user.to_dict(include_sensitive=True)
+        })
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@admin_bp.route('/users/<int:user_id>/toggle-premium', methods=['POST'])
+@admin_required
+async def toggle_user_premium(current_user_id, user_id):
+    """Toggle user premium status"""
+    try:
+        user = await _toggle(user_id, 'is_premium')
+        if not user:
+            return jsonify({'message': 'Usuário não encontrado'}), 404
+        
+        return jsonify({
+            'message': f'Status premium {"ativado" if user.is_premium else "desativado"} com sucesso',
+            'user': user.to_dict(include_sensitive=True)
+        })
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@admin_bp.route('/users/bulk', methods=['POST'])
+@admin_required
+async def bulk_update_users(current_user_id):
+    """Apply one action to many users in a single UPDATE, streaming back the affected ids"""
+    try:
+        data = await request.get_json() or {}
+        action = data.get('action')
+        try:
+            expires_at = parse_license_expiry(data) if action == 'set_license' else None
+        except (TypeError, ValueError):
+            return jsonify({'message': 'Data de expiração inválida'}), 400
+        try:
+            statement = bulk_update_statement(action, data.get('user_ids'), data.get('filter'), expires_at)
+        except (TypeError, ValueError) as e:
+            return jsonify({'message': str(e)}), 400
+        
+        async with async_db_config.get_session() as session:
+            rows = (await session.execute(statement)).all()
+            await session.commit()
+        
+        user_ids = apply_bulk_result(action, rows, current_user_id)
+        return Response(stream_bulk_result(action, user_ids), mimetype='application/json')
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
@@ -0,0 +1,250 @@
+"""
+Async map routes for KingGroup backend
+Handles offline maps listing, filtering, and downloads
+"""
+import asyncio
+from quart import Blueprint, request, jsonify
+from sqlalchemy import select, func, or_
+from sqlalchemy.orm import selectinload
+from models.map import Map
+from models.download import Download
+from models.geography import Country
+from config.async_database import async_db_config
+from auth.async_jwt_auth import token_required
+from services.entitlements import entitlements
+from middleware.async_idempotency import idempotent
+
+map_bp = Blueprint('map', __name__, url_prefix='/api/maps')
+
+async def _scalar(statement):
+    """Run one scalar query on its own session so callers can gather() them"""
+    async with async_db_config.get_session() as session:
+        return (await session.execute(statement)).scalar()
+
+@map_bp.route('/', methods=['GET'])
+async def get_maps():
+    """List available maps with filtering"""
+    try:
+        # Optional filters
+        country = request.args.get('country')
+        state = request.args.get('state')
+        map_type = request.args.get('type')
+        premium_only = request.args.get('premium') == 'true'
+        search = request.args.get('search')
+        
+        # Pagination
+        page = int(request.args.get('page', 1))
+        per_page = min(int(request.args.get('per_page', 20)), 100)  # Max 100 per page
+        offset = (page - 1) * per_page
+        
+        # Build query
+        query = select(Map).where(Map.is_active == True)
+        
+        if country:
+            query = query.where(Map.country.ilike(f'%{country}%'))
+        if state:
+            query = query.where(Map.state.ilike(f'%{state}%'))
+        if map_type:
+            query = query.where(Map.map_type == map_type)
+        if premium_only:
+            query = query.where(Map.is_premium == True)
+        if search:
+            query = query.where(or_(
+                Map.map_name.ilike(f'%{search}%'),
+                Map.description.ilike(f'%{search}%')
+            ))
+        
+        async def load_page():
+            async with async_db_config.get_session() as session:
+                result = await session.execute(
+                    query.order_by(Map.download_count.desc()).offset(offset).limit(per_page)
+                )
+                return result.scalars().all()
+        
+        # Count and page are independent: run them concurrently
+        total, maps = await asyncio.gather(
+            _scalar(select(func.count()).select_from(query.subquery())),
+            load_page()
+        )
+        
+        return jsonify({
+            'maps': [map_obj.to_dict() for map_obj in maps],
+            'pagination': {
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': (total + per_page - 1) // per_page
+            },
+            'filters': {
+                'country': country,
+                'state': state,
+                'type': map_type,
+                'premium_only': premium_only,
+                'search': search
+            }
+        })
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@map_bp.route('/<int:map_id>', methods=['GET'])
+async def get_map_details(map_id):
+    """Get detailed information about a specific map"""
+    try:
+        async with async_db_config.get_session() as session:
+            map_obj = (await session.execute(
+                select(Map).where(Map.id == map_id, Map.is_active == True)
+            )).scalar_one_or_none()
+        
+        if not map_obj:
+            return jsonify({'message': 'Mapa não encontrado'}), 404
+        
+        return jsonify({'map': map_obj.to_dict()})
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@map_bp.route('/<int:map_id>/download', methods=['POST'])
+@idempotent
+@token_required
+async def download_map(current_user_id, map_id):
+    """Initiate map download"""
+    try:
+        request_data = await request.get_json(silent=True) or {}
+        
+        async with async_db_config.get_session() as session:
+            map_obj = (await session.execute(
+                select(Map).where(Map.id == map_id, Map.is_active == True)
+            )).scalar_one_or_none()
+            if not map_obj:
+                return jsonify({'message': 'Mapa não encontrado'}), 404
+            
+            # Check user access (premium): same entitlement index as the sync app, so an
+            # expired license is refused here too (its first load queries the database)
+            if not await asyncio.to_thread(entitlements.can_download, current_user_id, map_obj.is_premium):
+                return jsonify({
+                    'message': 'Acesso premium necessário',
+                    'upgrade_required': True
+                }), 403
+            
+            download = Download(
+                user_id=current_user_id,
+                map_id=map_id,
+                ip_address=request.remote_addr,
+                user_agent=request.headers.get('User-Agent', ''),
+                device_type=request_data.get('device_type', 'unknown'),
+                platform=request_data.get('platform', 'unknown'),
+                app_version=request_data.get('app_version', '1.0')
+            )
+            session.add(download)
+            
+            # Increment download counter
+            map_obj.download_count += 1
+            await session.commit()
+            await session.refresh(map_obj)
+            
+            downloads_today = (await session.execute(
+                select(func.count(Download.id)).where(
+                    Download.user_id == current_user_id,
+                    Download.download_date >= func.current_date()
+                )
+            )).scalar()
+            
+            result = {
+                'message': 'Download autorizado',
+                'download_id': download.id,
+                'map': map_obj.to_dict(include_download_url=True),
+                'user_downloads_today': downloads_today
+            }
+        
+        return jsonify(result)
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+def _top_countries_statement():
+    """Ten countries with the most active maps, grouped on the integer key"""
+    country_counts = select(
+        Map.country_id,
+        func.count(Map.id).label('count')
+    ).where(Map.is_active == True, Map.country_id != None).group_by(Map.country_id).order_by(
+        func.count(Map.id).desc()
+    ).limit(10).subquery()
+    return select(Country.name.label('country'), country_counts.c.count).join(
+        country_counts, Country.id == country_counts.c.country_id
+    ).order_by(country_counts.c.count.desc())
+
+@map_bp.route('/categories', methods=['GET'])
+async def get_map_categories():
+    """Get available map categories and statistics"""
+    try:
+        async def load(statement):
+            async with async_db_config.get_session() as session:
+                return (await session.execute(statement)).all()
+        
+        categories, countries = await asyncio.gather(
+            load(select(
+                Map.map_type,
+                func.count(Map.id).label('count'),
+                func.count(func.nullif(Map.is_premium, False)).label('premium_count')
+            ).where(Map.is_active == True).group_by(Map.map_type)),
+            load(_top_countries_statement())
+        )
+        
+        return jsonify({
+            'categories': [
+                {
+                    'type': cat.map_type,
+                    'total_maps': cat.count,
+                    'premium_maps': cat.premium_count
+                }
+                for cat in categories
+            ],
+            'top_countries': [
+                {
+                    'country': country.country,
+                    'map_count': country.count
+                }
+                for country in countries
+            ]
+        })
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@map_bp.route('/user/downloads', methods=['GET'])
+@token_required
+async def get_user_downloads(current_user_id):
+    """Get user's download history"""
+    try:
+        page = int(request.args.get('page', 1))
+        per_page = min(int(request.args.get('per_page', 20)), 50)
+        offset = (page - 1) * per_page
+        
+        async def load_page():
+            async with async_db_config.get_session() as session:
+                # Lazy loads are not available on AsyncSession: load maps eagerly
+                result = await session.execute(
+                    select(Download).options(selectinload(Download.map)).where(
+                        Download.user_id == current_user_id
+                    ).order_by(Download.download_date.desc()).offset(offset).limit(per_page)
+                )
+                return [download.to_dict(include_map_info=True) for download in result.scalars().all()]
+        
+        download_list, total = await asyncio.gather(
+            load_page(),
+            _scalar(select(func.count(Download.id)).where(Download.user_id == current_user_id))
+        )
+        
+        return jsonify({
+            'downloads': download_list,
+            'pagination': {
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': (total + per_page - 1) // per_page
+            }
+        })
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
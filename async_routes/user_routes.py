@@ -0,0 +1,163 @@
+"""
+Async user routes for KingGroup backend
+Handles user registration, login, and profile management
+"""
+import re
+import asyncio
+from quart import Blueprint, request, jsonify
+from sqlalchemy import select, or_
+from models.user import User
+from config.async_database import async_db_config
+from auth.async_jwt_auth import token_required, generate_token
+from middleware.async_idempotency import idempotent
+from services.last_seen import last_seen
+
+user_bp = Blueprint('user', __name__, url_prefix='/api/user')
+
+EMAIL_PATTERN = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+
+@user_bp.route('/register', methods=['POST'])
+@idempotent
+async def register():
+    """Register new user"""
+    try:
+        data = await request.get_json()
+        
+        # Basic validation
+        if not data or not data.get('username') or not data.get('email') or not data.get('password'):
+            return jsonify({'message': 'Username, email e password são obrigatórios'}), 400
+        
+        if not re.match(EMAIL_PATTERN, data['email']):
+            return jsonify({'message': 'Formato de email inválido'}), 400
+        
+        if len(data['password']) < 6:
+            return jsonify({'message': 'Password deve ter pelo menos 6 caracteres'}), 400
+        
+        async with async_db_config.get_session() as session:
+            existing_user = (await session.execute(select(User.id).where(
+                or_(User.username == data['username'], User.email == data['email'])
+            ))).first()
+            
+            if existing_user:
+                return jsonify({'message': 'Usuário ou email já existe'}), 400
+            
+            # Password hashing is CPU bound, keep it off the event loop
+            user = await asyncio.to_thread(
+                User,
+                username=data['username'],
+                email=data['email'],
+                password=data['password'],
+                country=data.get('country'),
+                region=data.get('region'),
+                invite_code=data.get('invite_code'),
+                phone=data.get('phone'),
+                company=data.get('company')
+            )
+            
+            session.add(user)
+            await session.commit()
+            await session.refresh(user)
+            
+            token = generate_token(user.id)
+            user_data = user.to_dict()
+        
+        return jsonify({
+            'message': 'Usuário criado com sucesso',
+            'token': token,
+            'user': user_data
+        }), 201
+        
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@user_bp.route('/login', methods=['POST'])
+async def login():
+    """User login"""
+    try:
+        data = await request.get_json()
+        
+        if not data or not data.get('username') or not data.get('password'):
+            return jsonify({'message': 'Username e password são obrigatórios'}), 400
+        
+        async with async_db_config.get_session() as session:
+            user = (await session.execute(
+                select(User).where(User.username == data['username'])
+            )).scalar_one_or_none()
+            
+            if not user or not await asyncio.to_thread(user.check_password, data['password']):
+                return jsonify({'message': 'Credenciais inválidas'}), 401
+            
+            if not user.is_active:
+                return jsonify({'message': 'Conta desativada'}), 401
+            
+            # Recorded in memory and written with the next batched last-seen flush
+            logged_in_at = last_seen.login(user.id)
+            
+            token = generate_token(user.id)
+            user_data = user.to_dict()
+            user_data['last_login'] = logged_in_at.isoformat()
+        
+        return jsonify({
+            'message': 'Login realizado com sucesso',
+            'token': token,
+            'user': user_data
+        })
+        
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@user_bp.route('/profile', methods=['GET'])
+@token_required
+async def get_profile(current_user_id):
+    """Get user profile"""
+    try:
+        async with async_db_config.get_session() as session:
+            user = await session.get(User, current_user_id)
+        
+        if not user:
+            return jsonify({'message': 'Usuário não encontrado'}), 404
+        
+        return jsonify({'user': user.to_dict()})
+        
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@user_bp.route('/profile', methods=['PUT'])
+@idempotent
+@token_required
+async def update_profile(current_user_id):
+    """Update user profile"""
+    try:
+        data = await request.get_json()
+        
+        if not data:
+            return jsonify({'message': 'Dados não fornecidos'}), 400
+        
+        async with async_db_config.get_session() as session:
+            user = await session.get(User, current_user_id)
+            
+            if not user:
+                return jsonify({'message': 'Usuário não encontrado'}), 404
+            
+            # Update allowed fields
+            for field in ['country', 'region', 'phone', 'company', 'profile_image']:
+                if field in data:
+                    setattr(user, field, data[field])
+            
+            # Update password if provided
+            if 'password' in data and data['password']:
+                if len(data['password']) < 6:
+                    return jsonify({'message': 'Password deve ter pelo menos 6 caracteres'}), 400
+                await asyncio.to_thread(user.set_password, data['password'])
+            
+            await session.commit()
+            await session.refresh(user)
+            user_data = user.to_dict()
+        
+        return jsonify({
+            'message': 'Perfil atualizado com sucesso',
+            'user': user_data
+        })
+        
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
@@ -0,0 +1,92 @@
+"""
+Async authentication decorators for the ASGI app
+Same token format and messages as auth.jwt_auth
+"""
+import jwt
+import datetime
+from functools import wraps
+from quart import request, jsonify, current_app
+from models.user import User
+from config.async_database import async_db_config
+from services.last_seen import last_seen
+
+def generate_token(user_id, expires_hours=24):
+    """Generate JWT token for user"""
+    payload = {
+        'user_id': user_id,
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=expires_hours),
+        'iat': datetime.datetime.utcnow()
+    }
+    return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
+
+def decode_token(token):
+    """Decode and validate JWT token"""
+    if token.startswith('Bearer '):
+        token = token[7:]
+    
+    try:
+        return jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+    except jwt.ExpiredSignatureError:
+        raise Exception("Token expired")
+    except jwt.InvalidTokenError:
+        raise Exception("Invalid token")
+
+async def get_current_user(token):
+    """Get current user from token"""
+    payload = decode_token(token)
+    
+    async with async_db_config.get_session() as session:
+        user = await session.get(User, payload['user_id'])
+    
+    if not user or not user.is_active:
+        raise Exception("User not found or inactive")
+    last_seen.touch(user.id)
+    return user
+
+def token_required(f):
+    """Decorator for routes that require authentication"""
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        token = request.headers.get('Authorization')
+        
+        if not token:
+            return jsonify({'message': 'Token é obrigatório'}), 401
+        
+        try:
+            payload = decode_token(token)
+            current_user_id = payload['user_id']
+            
+            async with async_db_config.get_session() as session:
+                user = await session.get(User, current_user_id)
+            
+            if not user or not user.is_active:
+                return jsonify({'message': 'Usuário inválido ou inativo'}), 401
+            
+            last_seen.touch(current_user_id)
+            
+        except Exception as e:
+            return jsonify({'message': f'Token inválido: {str(e)}'}), 401
+        
+        return await f(current_user_id, *args, **kwargs)
+    return decorated
+
+def admin_required(f):
+    """Decorator for routes that require admin access"""
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        token = request.headers.get('Authorization')
+        
+        if not token:
+            return jsonify({'message': 'Token é obrigatório'}), 401
+        
+        try:
+            user = await get_current_user(token)
+            
+            if user.username != 'admin':
+                return jsonify({'message': 'Acesso administrativo necessário'}), 403
+            
+        except Exception as e:
+            return jsonify({'message': f'Erro de autenticação: {str(e)}'}), 401
+        
+        return await f(user.id, *args, **kwargs)
+    return decorated
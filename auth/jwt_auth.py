@@ -8,6 +8,11 @@ from functools import wraps
 from flask import request, jsonify, current_app
 from models.user import User
 from config.database import db_config
+from services.entitlements import entitlements
+from services.last_seen import last_seen
+
+# WSGI environ key set by /api/batch for sub-requests it already authenticated
+PREAUTHENTICATED_USER_KEY = 'kinggroup.preauthenticated_user_id'
 
 class JWTAuth:
     """JWT Authentication handler"""
@@ -69,6 +74,7 @@ class JWTAuth:
             if not user or not user.is_active:
                 raise Exception("User not found or inactive")
                 
+            last_seen.touch(user.id)
             return user
             
         except Exception as e:
@@ -78,6 +84,11 @@ def token_required(f):
     """Decorator for routes that require authentication"""
     @wraps(f)
     def decorated(*args, **kwargs):
+        # Batch sub-requests reuse the batch's single authentication
+        preauthenticated_user_id = request.environ.get(PREAUTHENTICATED_USER_KEY)
+        if preauthenticated_user_id is not None:
+            return f(preauthenticated_user_id, *args, **kwargs)
+        
         token = request.headers.get('Authorization')
         
         if not token:
@@ -94,6 +105,8 @@ def token_required(f):
             
             if not user or not user.is_active:
                 return jsonify({'message': 'Usuário inválido ou inativo'}), 401
+            
+            last_seen.touch(current_user_id)
                 
         except Exception as e:
             return jsonify({'message': f'Token inválido: {str(e)}'}), 401
@@ -136,7 +149,8 @@ def premium_required(f):
         try:
             user = JWTAuth.get_current_user(token)
             
-            if not user.is_premium:
+            # Same answer as every other premium check: the entitlement index
+            if not entitlements.is_premium(user.id):
                 return jsonify({'message': 'Acesso premium necessário'}), 403
                 
             current_user_id = user.id
@@ -0,0 +1,59 @@
+"""
+Async database configuration for KingGroup backend
+AsyncEngine/AsyncSession on the same database chosen by db_config
+"""
+import logging
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from .database import db_config
+
+logger = logging.getLogger(__name__)
+
+def to_async_url(database_url):
+    """Map a sync SQLAlchemy URL to its async driver (asyncpg / aiosqlite)"""
+    if database_url.startswith('postgresql+psycopg2://'):
+        return 'postgresql+asyncpg://' + database_url[len('postgresql+psycopg2://'):]
+    if database_url.startswith('postgresql://'):
+        return 'postgresql+asyncpg://' + database_url[len('postgresql://'):]
+    if database_url.startswith('sqlite:///'):
+        return 'sqlite+aiosqlite:///' + database_url[len('sqlite:///'):]
+    return database_url
+
+class AsyncDatabaseConfig:
+    """Lazily created async engine mirroring the sync configuration"""
+    
+    def __init__(self, database_url=None):
+        self.database_url = to_async_url(database_url or db_config.database_url)
+        self.engine = None
+        self.SessionLocal = None
+    
+    def _ensure_engine(self):
+        if self.engine is not None:
+            return
+        
+        if self.database_url.startswith('postgresql'):
+            self.engine = create_async_engine(
+                self.database_url,
+                pool_size=10,
+                max_overflow=20,
+                pool_pre_ping=True,
+                pool_recycle=3600
+            )
+        else:
+            self.engine = create_async_engine(self.database_url)
+        
+        # expire_on_commit=False: serialized objects stay readable after commit
+        self.SessionLocal = async_sessionmaker(self.engine, expire_on_commit=False, autoflush=False)
+        logger.info(f"✅ Async engine ready ({self.database_url.split('://')[0]})")
+    
+    def get_session(self):
+        """Get a new AsyncSession (use as an async context manager)"""
+        self._ensure_engine()
+        return self.SessionLocal()
+    
+    async def dispose(self):
+        """Close all pooled async connections"""
+        if self.engine is not None:
+            await self.engine.dispose()
+
+# Global async database configuration
+async_db_config = AsyncDatabaseConfig()
@@ -4,9 +4,10 @@ Intelligent fallback: Cloud SQL → SQLite
 """
 import os
 import logging
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text, inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from .replicas import Replica, ReplicaSet
 
 # Base class for all models
 Base = declarative_base()
@@ -23,11 +24,17 @@ class DatabaseConfig:
         self.engine = None
         self.SessionLocal = None
         self.db_type = None
+        self.replicas = ReplicaSet([])
         self._initialize_database()
+        self._initialize_replicas()
         
     def _initialize_database(self):
         """Initialize database with intelligent fallback"""
         
+        # Explicit URL (local testing, load tests, self-managed PostgreSQL)
+        if self._try_database_url():
+            return
+        
         # Try Cloud SQL first (production)
         if self._try_cloud_sql():
             return
@@ -35,6 +42,52 @@ class DatabaseConfig:
         # Fallback to SQLite (development/backup)
         self._use_sqlite_fallback()
     
+    def _create_engine(self, database_url):
+        """Create an engine with the pool settings used for this backend"""
+        if database_url.startswith('postgresql'):
+            return create_engine(
+                database_url,
+                pool_size=10,
+                max_overflow=20,
+                pool_pre_ping=True,
+                pool_recycle=3600
+            )
+        
+        return create_engine(
+            database_url,
+            connect_args={"check_same_thread": False} if "sqlite" in database_url else {}
+        )
+    
+    def _try_database_url(self):
+        """Use DATABASE_URL when it is set"""
+        database_url = os.environ.get('DATABASE_URL')
+        if not database_url:
+            return False
+        
+        self.database_url = database_url
+        self.engine = self._create_engine(database_url)
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.db_type = "postgresql" if database_url.startswith('postgresql') else "sqlite"
+        
+        logger.info(f"✅ Using DATABASE_URL ({self.db_type})")
+        return True
+    
+    def _initialize_replicas(self):
+        """Create replica engines from DB_REPLICA_URLS (comma separated)"""
+        replica_urls = [url.strip() for url in os.environ.get('DB_REPLICA_URLS', '').split(',') if url.strip()]
+        
+        replicas = []
+        for index, replica_url in enumerate(replica_urls):
+            try:
+                replicas.append(Replica(f"replica-{index}", replica_url, self._create_engine(replica_url)))
+            except Exception as e:
+                logger.warning(f"⚠️ Replica {index} configuration failed: {str(e)}")
+        
+        self.replicas = ReplicaSet(replicas)
+        if replicas:
+            self.replicas.start_monitor()
+            logger.info(f"✅ {len(replicas)} read replica(s) configured")
+    
     def _try_cloud_sql(self):
         """Try to connect to Cloud SQL PostgreSQL"""
         try:
@@ -105,12 +158,60 @@ class DatabaseConfig:
             logger.error(f"❌ SQLite fallback failed: {str(e)}")
             raise Exception("Database initialization failed completely")
     
+    def get_session(self):
+        """Get a new session bound to the configured engine"""
+        return self.SessionLocal()
+    
+    def get_read_session(self, user_id=None):
+        """Get a session for read-only work, routed to a healthy replica when possible"""
+        replica = self.replicas.choose(user_id)
+        if replica is None:
+            return self.SessionLocal()
+        return replica.SessionLocal()
+    
+    def mark_write(self, user_id):
+        """Record a user's write so their next reads go to the primary"""
+        self.replicas.mark_write(user_id)
+    
+    def initialize_database(self):
+        """Create tables for all registered models"""
+        if not init_database():
+            raise Exception("Database table creation failed")
+        return True
+    
+    def is_postgres(self):
+        """Check whether the active database is PostgreSQL"""
+        return bool(self.database_url) and self.database_url.startswith('postgresql')
+    
+    def ping(self, timeout_seconds=2):
+        """Run a single SELECT 1 on a pooled connection, bounded by a timeout"""
+        with self.engine.connect() as connection:
+            if self.is_postgres():
+                # SET LOCAL only lasts for this transaction, the pooled
+                # connection goes back with its default timeout
+                connection.execute(text(f"SET LOCAL statement_timeout = {int(timeout_seconds * 1000)}"))
+            connection.execute(text("SELECT 1"))
+            connection.rollback()
+        return True
+    
+    def dispose(self):
+        """Close every pooled connection (call in the master before forking)"""
+        self.engine.dispose()
+        self.replicas.dispose()
+    
+    def after_fork(self):
+        """Forget connections inherited from the parent process"""
+        # close=False leaves the parent's sockets alone, the child starts with an empty pool
+        self.engine.dispose(close=False)
+        self.replicas.after_fork()
+    
     def get_database_info(self):
         """Get current database information"""
         return {
             "type": self.db_type,
             "url_masked": self.database_url.split('@')[0] + '@***' if '@' in self.database_url else self.database_url,
-            "status": "connected" if self.engine else "disconnected"
+            "status": "connected" if self.engine else "disconnected",
+            "replicas": self.replicas.status()
         }
 
 # Global database configuration
@@ -124,6 +225,42 @@ def get_db():
     finally:
         db.close()
 
+def ensure_columns(engine):
+    """Add nullable columns declared on the models that an existing table is missing"""
+    inspector = inspect(engine)
+    added = []
+    for table in Base.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable or column.primary_key:
+                logger.warning(f"⚠️ {table.name}.{column.name} is missing and cannot be added automatically")
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            with engine.begin() as connection:
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            added.append(f"{table.name}.{column.name}")
+    
+    if added:
+        logger.info(f"🗂️ Added columns: {', '.join(added)}")
+    return added
+
+def ensure_indexes(engine):
+    """Create indexes declared on the models that an existing table is missing"""
+    inspector = inspect(engine)
+    created = []
+    for table in Base.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=engine)
+                created.append(index.name)
+    
+    if created:
+        logger.info(f"🗂️ Created indexes: {', '.join(created)}")
+    return created
+
 def init_database():
     """Initialize database tables"""
     try:
@@ -131,9 +268,27 @@ def init_database():
         from models.user import User
         from models.map import Map
         from models.download import Download
+        from models.catalogue_change import CatalogueChange
+        from models.analytics_sketch import AnalyticsSketch
+        from models.geography import Country, State, City, GeoAlias
         
         # Create all tables
         Base.metadata.create_all(bind=db_config.engine)
+        ensure_columns(db_config.engine)
+        ensure_indexes(db_config.engine)
+        
+        from services.entitlements import backfill_license_expiry
+        from services.geography import backfill_geography
+        session = db_config.get_session()
+        try:
+            backfill_license_expiry(session)
+            backfill_geography(session)
+        finally:
+            session.close()
+        
+        if db_config.is_postgres() and os.environ.get('DOWNLOADS_PARTITIONING', 'false').lower() == 'true':
+            from services.partitions import download_partitions
+            download_partitions.prepare()
         
         logger.info("✅ Database tables initialized successfully")
         return True
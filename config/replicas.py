@@ -0,0 +1,163 @@
+"""
+Read replica routing for KingGroup backend
+Round-robin over healthy replicas with read-your-writes stickiness
+"""
+import os
+import time
+import logging
+import itertools
+import threading
+from contextvars import ContextVar
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+logger = logging.getLogger(__name__)
+
+# Read-your-writes across workers: the user whose signed write marker came with
+# this request, and the user who wrote during it (see middleware.read_your_writes)
+client_write = ContextVar('client_write', default=None)
+request_write = ContextVar('request_write', default=None)
+
+class Replica:
+    """A single read replica engine and its last known health"""
+    
+    def __init__(self, name, database_url, engine):
+        self.name = name
+        self.database_url = database_url
+        self.engine = engine
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        self.healthy = True
+        self.lag_seconds = 0.0
+        self.last_error = None
+        self.last_check = None
+    
+    def measure_lag(self):
+        """Return replication lag in seconds (0 when not a streaming replica)"""
+        with self.engine.connect() as connection:
+            if self.database_url.startswith('postgresql'):
+                # An idle primary makes replay timestamps look old, so only
+                # count lag while WAL is still waiting to be replayed
+                lag = connection.execute(text(
+                    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+                    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+                )).scalar()
+                return float(lag or 0)
+            
+            connection.execute(text("SELECT 1"))
+            return 0.0
+    
+    def to_dict(self):
+        """Convert replica state to dictionary for status endpoints"""
+        return {
+            'name': self.name,
+            'healthy': self.healthy,
+            'lag_seconds': round(self.lag_seconds, 3),
+            'last_error': self.last_error,
+            'last_check': self.last_check
+        }
+
+class ReplicaSet:
+    """Health-checked pool of read replicas"""
+    
+    def __init__(self, replicas, max_lag_seconds=None, check_interval=None, sticky_seconds=None):
+        self.replicas = replicas
+        self.max_lag_seconds = max_lag_seconds or float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+        self.check_interval = check_interval or float(os.environ.get('REPLICA_CHECK_INTERVAL', 15))
+        self.sticky_seconds = sticky_seconds or float(os.environ.get('READ_YOUR_WRITES_SECONDS', 10))
+        self._round_robin = itertools.count()
+        self._recent_writes = {}
+        self._lock = threading.Lock()
+        self._monitor = None
+    
+    def __len__(self):
+        return len(self.replicas)
+    
+    def mark_write(self, user_id):
+        """Pin a user's reads to the primary for the stickiness window"""
+        if user_id is None:
+            return
+        with self._lock:
+            self._recent_writes[user_id] = time.monotonic()
+        # Handed back to the client so other workers and instances honour it too
+        request_write.set(user_id)
+    
+    def is_sticky(self, user_id):
+        """Check whether a user wrote recently enough to need the primary"""
+        if user_id is None:
+            return False
+        if client_write.get() == user_id:
+            return True
+        
+        written_at = self._recent_writes.get(user_id)
+        if written_at is None:
+            return False
+        
+        if time.monotonic() - written_at <= self.sticky_seconds:
+            return True
+        
+        with self._lock:
+            if self._recent_writes.get(user_id) == written_at:
+                del self._recent_writes[user_id]
+        return False
+    
+    def choose(self, user_id=None):
+        """Pick a healthy replica, or None when the primary should serve the read"""
+        if not self.replicas or self.is_sticky(user_id):
+            return None
+        
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        
+        return healthy[next(self._round_robin) % len(healthy)]
+    
+    def check(self):
+        """Measure every replica, ejecting the failing or lagging ones"""
+        for replica in self.replicas:
+            try:
+                replica.lag_seconds = replica.measure_lag()
+                replica.last_error = None
+                healthy = replica.lag_seconds <= self.max_lag_seconds
+            except Exception as e:
+                replica.last_error = str(e)
+                healthy = False
+            
+            if healthy != replica.healthy:
+                if healthy:
+                    logger.info(f"✅ Replica {replica.name} back in rotation")
+                else:
+                    logger.warning(f"⚠️ Replica {replica.name} ejected (lag={replica.lag_seconds:.1f}s, error={replica.last_error})")
+            
+            replica.healthy = healthy
+            replica.last_check = time.time()
+    
+    def start_monitor(self):
+        """Run health checks periodically in a daemon thread"""
+        if not self.replicas or (self._monitor and self._monitor.is_alive()):
+            return
+        
+        def run():
+            while True:
+                self.check()
+                time.sleep(self.check_interval)
+        
+        self._monitor = threading.Thread(target=run, name='replica-monitor', daemon=True)
+        self._monitor.start()
+    
+    def after_fork(self):
+        """Drop inherited connections and restart the monitor in a forked child"""
+        self._lock = threading.Lock()
+        self._monitor = None
+        for replica in self.replicas:
+            replica.engine.dispose(close=False)
+        self.start_monitor()
+    
+    def dispose(self):
+        """Dispose every replica engine"""
+        for replica in self.replicas:
+            replica.engine.dispose()
+    
+    def status(self):
+        """Get health information for all replicas"""
+        return [replica.to_dict() for replica in self.replicas]
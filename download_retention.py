@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Download Retention Script for KingGroup Backend
+Rolls closed months out of the hot downloads table and archives those past retention
+"""
+import os
+import sys
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config.database import db_config
+from services.partitions import download_partitions
+
+def run_retention():
+    """Run one retention pass (schedule monthly, e.g. from cron)"""
+    print("🗄️ Running downloads retention...")
+    
+    try:
+        db_config.initialize_database()
+        # One-off conversion (DOWNLOADS_PARTITIONING=true); never done at app start
+        if download_partitions.migrate():
+            print("🧱 downloads converted to a monthly partitioned table")
+        result = download_partitions.run_retention()
+        
+        print(f"✅ Moved out of the hot table: {', '.join(result['rolled']) or 'nothing'}")
+        for archive in result['archived']:
+            print(f"📦 {archive['month']}: {archive['rows']} rows → {archive['file']}")
+        
+        status = download_partitions.status()
+        print(f"ℹ️ Hot months: {', '.join(status['hot_months'])}")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Retention failed: {str(e)}")
+        return False
+
+if __name__ == "__main__":
+    sys.exit(0 if run_retention() else 1)
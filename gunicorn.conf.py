@@ -0,0 +1,33 @@
+"""
+Gunicorn configuration for KingGroup backend
+Pre-fork mode: the app and warm caches load once in the master
+"""
+import os
+import multiprocessing
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = 60
+
+# Import main:app in the master so code and warm data are shared copy-on-write
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true') == 'true'
+
+def when_ready(server):
+    """Master is up, workers not yet forked: warm shared caches"""
+    if preload_app:
+        from services.prefork import warm_shared_state
+        warm_shared_state()
+        server.log.info("🔥 Shared state warmed in master")
+
+def post_fork(server, worker):
+    """Runs in each new worker: never reuse the master's pooled connections"""
+    if preload_app:
+        from services.prefork import after_fork_in_child
+        after_fork_in_child()
+
+def worker_exit(server, worker):
+    """Worker is stopping: write the last-seen times it still holds in memory"""
+    from services.last_seen import last_seen
+    last_seen.flush()
@@ -0,0 +1,8 @@
+"""
+Load testing package for KingGroup backend
+Deterministic dataset generation and a concurrent driver for create_app()
+"""
+from .generator import DatasetSpec, SCALES, generate_dataset
+from .driver import LoadDriver
+
+__all__ = ['DatasetSpec', 'SCALES', 'generate_dataset', 'LoadDriver']
@@ -0,0 +1,64 @@
+"""
+Compression ratio and CPU cost per codec on real listing payloads
+Renders responses through the app against a seeded database and times each codec/level.
+
+Usage:
+    python -m loadtest.bench_compression --database-url sqlite:///loadtest.db
+"""
+import os
+import sys
+import time
+import argparse
+
+def _payloads(client):
+    """Uncompressed bodies of the responses truckers fetch the most"""
+    paths = {
+        'maps page (20)': '/api/maps/',
+        'maps page (100)': '/api/maps/?per_page=100',
+        'map details': '/api/maps/1',
+        'categories': '/api/maps/categories',
+        'multi-get (200)': '/api/maps/batch?ids=' + ','.join(str(map_id) for map_id in range(1, 201)),
+    }
+    payloads = {}
+    for label, path in paths.items():
+        response = client.get(path, headers={'Accept-Encoding': 'identity'})
+        payloads[label] = response.get_data()
+    return payloads
+
+def _time_codec(codec, body, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        compressed = codec.compress(body)
+    elapsed = (time.perf_counter() - started) / rounds
+    return len(compressed), elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark response compression codecs')
+    parser.add_argument('--database-url', default='sqlite:///loadtest.db')
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from main import app
+    from middleware.compression import GzipCodec, BrotliCodec, ZstdCodec, brotli, zstandard
+
+    codecs = [GzipCodec(1), GzipCodec(6), GzipCodec(9)]
+    if brotli is not None:
+        codecs += [BrotliCodec(1), BrotliCodec(5), BrotliCodec(11)]
+    if zstandard is not None:
+        codecs += [ZstdCodec(1), ZstdCodec(3), ZstdCodec(9), ZstdCodec(19)]
+
+    payloads = _payloads(app.test_client())
+
+    print(f"{'payload':<18}{'bytes':>9}  {'codec':<9}{'bytes':>9}{'ratio':>8}{'µs':>10}{'MB/s':>9}")
+    for label, body in payloads.items():
+        for codec in codecs:
+            size, elapsed = _time_codec(codec, body, args.rounds)
+            throughput = len(body) / elapsed / 1e6 if elapsed else 0
+            print(f"{label:<18}{len(body):>9}  {codec.name + '-' + str(codec.level):<9}"
+                  f"{size:>9}{len(body) / size:>8.1f}{elapsed * 1e6:>10.0f}{throughput:>9.1f}")
+        print()
+
+if __name__ == '__main__':
+    main()
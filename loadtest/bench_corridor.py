@@ -0,0 +1,83 @@
+"""
+Latency of the along-route corridor query on long synthetic routes
+Times POST /api/maps/along-route against a seeded database and checks it against a brute-force scan.
+
+Usage:
+    python -m loadtest.bench_corridor --database-url sqlite:///loadtest.db --route-km 2000
+"""
+import os
+import sys
+import math
+import time
+import random
+import argparse
+
+def synthetic_route(start, end, step_km, seed=0):
+    """Points every step_km from start to end, wandering like a road network"""
+    rng = random.Random(seed)
+    from services.corridor import segment_length_km
+    total = segment_length_km(start, end)
+    steps = max(1, int(total / step_km))
+    points = []
+    for index in range(steps + 1):
+        fraction = index / steps
+        wobble = 0.05 * math.sin(fraction * 40) + rng.uniform(-0.0002, 0.0002)
+        points.append((start[0] + (end[0] - start[0]) * fraction + wobble,
+                       start[1] + (end[1] - start[1]) * fraction - wobble))
+    return points
+
+def brute_force(points, buffer_km, map_types):
+    """Every map against every segment, for checking the indexed answer"""
+    from services.catalogue import catalogue_cache
+    from services.corridor import segment_box_distance_km
+    found = set()
+    for map_id, map_data in catalogue_cache.snapshot().by_id.items():
+        if not map_data.get('bounds') or map_data['map_type'] not in map_types:
+            continue
+        if any(segment_box_distance_km(a, b, map_data['bounds']) <= buffer_km for a, b in zip(points, points[1:])):
+            found.add(map_id)
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the along-route corridor query')
+    parser.add_argument('--database-url', default='sqlite:///loadtest.db')
+    parser.add_argument('--route-km', type=float, default=2000)
+    parser.add_argument('--step-km', type=float, default=0.1)
+    parser.add_argument('--buffer-km', type=float, default=5)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--check', action='store_true', help='compare with a brute-force scan (slow)')
+    args = parser.parse_args()
+    
+    os.environ['DATABASE_URL'] = args.database_url
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from main import app
+    from services.corridor import encode_polyline
+    
+    # São Paulo heading north-east; scaled so the straight line is route_km long
+    start = (-23.55, -46.63)
+    degrees = args.route_km / 111.0
+    end = (start[0] + degrees * 0.6, start[1] + degrees * 0.8)
+    points = synthetic_route(start, end, args.step_km)
+    body = {'polyline': encode_polyline(points), 'buffer_km': args.buffer_km,
+            'map_types': ['truck_stops', 'offline', 'routes']}
+    
+    client = app.test_client()
+    response = client.post('/api/maps/along-route', json=body)  # builds the catalogue and grid
+    result = response.get_json()
+    timings = []
+    for _ in range(args.rounds):
+        started = time.perf_counter()
+        client.post('/api/maps/along-route', json=body)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    
+    print(f"route {result['route_km']:.0f} km, {len(points)} points, buffer {args.buffer_km} km → {result['total']} maps")
+    print(f"p50 {timings[len(timings) // 2] * 1000:.1f} ms, max {timings[-1] * 1000:.1f} ms over {args.rounds} requests")
+    
+    if args.check:
+        expected = brute_force(points, args.buffer_km, set(body['map_types']))
+        got = {map_data['id'] for map_data in result['maps']}
+        print('✅ matches brute force' if got == expected else f"❌ differs: missing {expected - got}, extra {got - expected}")
+
+if __name__ == '__main__':
+    main()
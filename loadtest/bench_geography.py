@@ -0,0 +1,88 @@
+"""
+Grouping on geography names versus integer dimension keys
+Times the categories and statistics breakdowns both ways and reports index sizes.
+
+Usage:
+    python -m loadtest.bench_geography --database-url sqlite:///loadtest.db
+"""
+import os
+import sys
+import time
+import argparse
+
+# (label, GROUP BY on the free-text names, GROUP BY on the dimension keys)
+QUERIES = [
+    ('categories: maps per country',
+     "SELECT country, COUNT(id) FROM maps WHERE is_active = :active GROUP BY country ORDER BY COUNT(id) DESC LIMIT 10",
+     "SELECT g.name, c.n FROM (SELECT country_id, COUNT(id) AS n FROM maps WHERE is_active = :active "
+     "AND country_id IS NOT NULL GROUP BY country_id ORDER BY n DESC LIMIT 10) c "
+     "JOIN geo_countries g ON g.id = c.country_id ORDER BY c.n DESC"),
+    ('stats: users per country',
+     "SELECT country, COUNT(id) FROM users WHERE country IS NOT NULL GROUP BY country ORDER BY COUNT(id) DESC LIMIT 10",
+     "SELECT g.name, c.n FROM (SELECT country_id, COUNT(id) AS n FROM users WHERE country_id IS NOT NULL "
+     "GROUP BY country_id ORDER BY n DESC LIMIT 10) c JOIN geo_countries g ON g.id = c.country_id ORDER BY c.n DESC"),
+    ('stats: users per state',
+     "SELECT country, region, COUNT(id) FROM users WHERE region IS NOT NULL GROUP BY country, region "
+     "ORDER BY COUNT(id) DESC LIMIT 10",
+     "SELECT s.name, c.n FROM (SELECT state_id, COUNT(id) AS n FROM users WHERE state_id IS NOT NULL "
+     "GROUP BY state_id ORDER BY n DESC LIMIT 10) c JOIN geo_states s ON s.id = c.state_id ORDER BY c.n DESC"),
+    ('downloads per country',
+     "SELECT m.country, COUNT(d.id) FROM downloads d JOIN maps m ON m.id = d.map_id GROUP BY m.country "
+     "ORDER BY COUNT(d.id) DESC",
+     "SELECT g.name, c.n FROM (SELECT country_id, COUNT(id) AS n FROM downloads WHERE country_id IS NOT NULL "
+     "GROUP BY country_id) c JOIN geo_countries g ON g.id = c.country_id ORDER BY c.n DESC"),
+]
+
+INDEXES = [
+    ('maps country (text)', 'ix_maps_country'),
+    ('maps active + country_id', 'ix_maps_active_country'),
+    ('users country_id', 'ix_users_country_id'),
+    ('downloads country_id + date', 'ix_downloads_country_date'),
+]
+
+def _time(connection, statement, rounds):
+    from sqlalchemy import text
+    query = text(statement)
+    connection.execute(query, {'active': True}).all()  # warm the page cache
+    started = time.perf_counter()
+    for _ in range(rounds):
+        rows = connection.execute(query, {'active': True}).all()
+    return (time.perf_counter() - started) / rounds, rows
+
+def _index_size(connection, name):
+    from sqlalchemy import text
+    if connection.dialect.name == 'postgresql':
+        return connection.execute(text("SELECT pg_relation_size(to_regclass(:name))"), {'name': name}).scalar()
+    try:
+        return connection.execute(text("SELECT SUM(pgsize) FROM dbstat WHERE name = :name"), {'name': name}).scalar()
+    except Exception:
+        return None  # SQLite built without dbstat
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark grouping on geography names vs integer keys')
+    parser.add_argument('--database-url', default='sqlite:///loadtest.db')
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+    
+    os.environ['DATABASE_URL'] = args.database_url
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from config.database import db_config, init_database
+    init_database()  # adds the columns and backfills them on older databases
+    
+    with db_config.engine.connect() as connection:
+        print(f"{'query':<32}{'names ms':>10}{'ids ms':>10}{'speedup':>9}  same")
+        for label, by_name, by_id in QUERIES:
+            name_time, name_rows = _time(connection, by_name, args.rounds)
+            id_time, id_rows = _time(connection, by_id, args.rounds)
+            # Counts per name may differ where spellings were merged ("Brasil" → "Brazil")
+            same = sorted(row[-1] for row in name_rows[:5]) == sorted(row[-1] for row in id_rows[:5])
+            print(f"{label:<32}{name_time * 1000:>10.2f}{id_time * 1000:>10.2f}"
+                  f"{name_time / id_time if id_time else 0:>8.1f}x  {'yes' if same else 'merged'}")
+        
+        print()
+        for label, name in INDEXES:
+            size = _index_size(connection, name)
+            print(f"{label:<32}{'n/a' if size is None else f'{size / 1024:.0f} KiB':>12}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Threaded vs async serving benchmark
+Starts (or targets) one gunicorn gthread worker and one hypercorn worker on the
+same database and ramps concurrent clients until p95 breaks the SLO.
+
+Usage:
+    python -m loadtest.compare_async --database-url sqlite:///loadtest.db
+    python -m loadtest.compare_async --threaded-url http://127.0.0.1:8081 --async-url http://127.0.0.1:8082
+
+The two modes need different environments (requirements.txt vs
+requirements-async.txt); pass --async-python to launch hypercorn from the
+async virtualenv, or start the servers yourself and pass their URLs.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlsplit
+from .driver import percentile
+
+PATHS = (
+    '/api/maps/',
+    '/api/maps/?type=truck_stops',
+    '/api/maps/categories',
+    '/api/maps/{map_id}',
+)
+
+def _client_loop(base_url, deadline, map_count, seed, samples):
+    parts = urlsplit(base_url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+    rng = random.Random(seed)
+    
+    while time.perf_counter() < deadline:
+        path = rng.choice(PATHS).format(map_id=rng.randint(1, map_count))
+        started = time.perf_counter()
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+            ok = response.status < 500
+        except Exception:
+            ok = False
+            connection.close()
+            connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+        samples.append((time.perf_counter() - started, ok))
+    connection.close()
+
+def measure(base_url, concurrency, duration, map_count=200):
+    """Run `concurrency` keep-alive clients for `duration` seconds"""
+    results = [[] for _ in range(concurrency)]
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=_client_loop, args=(base_url, deadline, map_count, index, results[index]))
+        for index in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_time = time.perf_counter() - started
+    
+    samples = [sample for result in results for sample in result]
+    latencies = sorted(elapsed for elapsed, _ in samples)
+    errors = sum(1 for _, ok in samples if not ok)
+    return {
+        'concurrency': concurrency,
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / wall_time, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+        'error_rate': round(errors / len(samples), 4) if samples else 1.0,
+    }
+
+def _wait_until_up(base_url, timeout=30):
+    parts = urlsplit(base_url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=2)
+            connection.request('GET', '/health/live')
+            if connection.getresponse().status == 200:
+                return True
+        except Exception:
+            time.sleep(0.3)
+    return False
+
+def _launch(command, env):
+    return subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare threaded and async serving capacity per instance')
+    parser.add_argument('--database-url', default='sqlite:///loadtest.db')
+    parser.add_argument('--threaded-url')
+    parser.add_argument('--async-url')
+    parser.add_argument('--threads', type=int, default=8, help='gthread threads per worker')
+    parser.add_argument('--async-python', default=sys.executable)
+    parser.add_argument('--levels', default='4,16,64,128,256')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--slo-ms', type=float, default=250.0)
+    parser.add_argument('--map-count', type=int, default=200)
+    args = parser.parse_args()
+    
+    env = dict(os.environ, DATABASE_URL=args.database_url)
+    processes = []
+    targets = {}
+    
+    if args.threaded_url:
+        targets['threaded'] = args.threaded_url
+    else:
+        processes.append(_launch([
+            sys.executable, '-m', 'gunicorn', '-w', '1', '-k', 'gthread', '--threads', str(args.threads),
+            '-b', '127.0.0.1:8081', 'main:app'
+        ], env))
+        targets['threaded'] = 'http://127.0.0.1:8081'
+    
+    if args.async_url:
+        targets['async'] = args.async_url
+    else:
+        processes.append(_launch([
+            args.async_python, '-m', 'hypercorn', '-w', '1', '-b', '127.0.0.1:8082', 'asgi:app'
+        ], env))
+        targets['async'] = 'http://127.0.0.1:8082'
+    
+    try:
+        levels = [int(level) for level in args.levels.split(',')]
+        capacity = {}
+        for mode, base_url in targets.items():
+            if not _wait_until_up(base_url):
+                print(f"❌ {mode} server at {base_url} did not come up")
+                continue
+            
+            print(f"\n⚙️ {mode} ({base_url})")
+            print(f"{'clients':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+            capacity[mode] = 0
+            for concurrency in levels:
+                result = measure(base_url, concurrency, args.duration, args.map_count)
+                print(f"{concurrency:>8}{result['throughput_rps']:>10}{result['p50_ms']:>10}"
+                      f"{result['p95_ms']:>10}{result['error_rate']:>8}")
+                if result['p95_ms'] is not None and result['p95_ms'] <= args.slo_ms and result['error_rate'] < 0.01:
+                    capacity[mode] = concurrency
+        
+        print(f"\n📊 Concurrent clients within p95 <= {args.slo_ms:.0f}ms per instance:")
+        for mode, clients in capacity.items():
+            print(f"   {mode:<10}{clients}")
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+if __name__ == '__main__':
+    main()
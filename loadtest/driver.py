@@ -0,0 +1,191 @@
+"""
+Concurrent load driver for KingGroup backend
+Replays a weighted endpoint mix against create_app() and compares with saved baselines
+"""
+import os
+import time
+import random
+import logging
+import platform
+import datetime
+import threading
+from .generator import ZipfSampler
+
+logger = logging.getLogger(__name__)
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), 'baselines')
+
+class Scenario:
+    """One endpoint in the traffic mix"""
+    
+    def __init__(self, name, weight, method, path, auth=None, body=None, ok_statuses=(200,)):
+        self.name = name
+        self.weight = weight
+        self.method = method
+        self.path = path  # callable(rng, context) -> str
+        self.auth = auth  # None, 'user' or 'admin'
+        self.body = body  # callable(rng, context) -> dict
+        self.ok_statuses = ok_statuses
+
+def _listing_path(rng, context):
+    filters = rng.choice((
+        '',
+        '?type=truck_stops',
+        '?country=Brazil',
+        '?country=Brazil&state=São Paulo',
+        f'?search={rng.choice(("Paulo", "Curitiba", "Truck", "Manaus"))}',
+        f'?page={rng.randint(2, 20)}',
+    ))
+    return '/api/maps/' + filters
+
+DEFAULT_SCENARIOS = [
+    Scenario('maps.list', 30, 'GET', _listing_path),
+    Scenario('maps.details', 25, 'GET', lambda rng, ctx: f"/api/maps/{ctx['map_id'](rng)}", ok_statuses=(200, 404)),
+    Scenario('maps.categories', 10, 'GET', lambda rng, ctx: '/api/maps/categories'),
+    Scenario('user.profile', 10, 'GET', lambda rng, ctx: '/api/user/profile', auth='user'),
+    Scenario('maps.user_downloads', 10, 'GET', lambda rng, ctx: '/api/maps/user/downloads', auth='user'),
+    Scenario('maps.download', 8, 'POST', lambda rng, ctx: f"/api/maps/{ctx['map_id'](rng)}/download", auth='user',
+             body=lambda rng, ctx: {'platform': 'android', 'device_type': 'mobile', 'app_version': '2.5'},
+             ok_statuses=(200, 403, 404)),
+    Scenario('admin.stats', 1, 'GET', lambda rng, ctx: '/api/admin/stats', auth='admin'),
+]
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+class LoadDriver:
+    """Runs scenarios from concurrent threads, each with its own test client"""
+    
+    def __init__(self, app, scenarios=None, concurrency=8, duration=30.0, seed=2025, users_sample=500):
+        self.app = app
+        self.scenarios = scenarios or DEFAULT_SCENARIOS
+        self.concurrency = concurrency
+        self.duration = duration
+        self.seed = seed
+        self.users_sample = users_sample
+    
+    def _context(self):
+        """Tokens and id samplers shared read-only by all workers"""
+        from sqlalchemy import func
+        from config.database import db_config
+        from models.user import User
+        from models.map import Map
+        from auth.jwt_auth import JWTAuth
+        
+        session = db_config.get_session()
+        try:
+            map_count = session.query(func.max(Map.id)).scalar() or 1
+            user_ids = [row.id for row in session.query(User.id).filter(
+                User.is_active == True, User.username != 'admin'
+            ).order_by(User.id).limit(self.users_sample).all()]
+            admin = session.query(User).filter(User.username == 'admin').first()
+        finally:
+            session.close()
+        
+        with self.app.app_context():
+            user_tokens = [JWTAuth.generate_token(user_id) for user_id in user_ids]
+            admin_token = JWTAuth.generate_token(admin.id) if admin else None
+        
+        return {'map_count': map_count, 'user_tokens': user_tokens, 'admin_token': admin_token}
+    
+    def _worker(self, worker_id, context, deadline, results):
+        rng = random.Random(f'{self.seed}:worker:{worker_id}')
+        popularity = ZipfSampler(context['map_count'], 1.07, rng)
+        worker_context = dict(context, map_id=lambda _rng: popularity.sample() + 1)
+        client = self.app.test_client()
+        
+        scenarios = [s for s in self.scenarios if s.auth != 'admin' or context['admin_token']]
+        scenarios = [s for s in scenarios if s.auth != 'user' or context['user_tokens']]
+        weights = [s.weight for s in scenarios]
+        samples = []
+        
+        while time.perf_counter() < deadline:
+            scenario = rng.choices(scenarios, weights)[0]
+            headers = {}
+            if scenario.auth == 'user':
+                headers['Authorization'] = 'Bearer ' + rng.choice(context['user_tokens'])
+            elif scenario.auth == 'admin':
+                headers['Authorization'] = 'Bearer ' + context['admin_token']
+            
+            path = scenario.path(rng, worker_context)
+            body = scenario.body(rng, worker_context) if scenario.body else None
+            
+            started = time.perf_counter()
+            response = client.open(path, method=scenario.method, headers=headers, json=body)
+            elapsed = time.perf_counter() - started
+            samples.append((scenario.name, elapsed, response.status_code in scenario.ok_statuses))
+        
+        results[worker_id] = samples
+    
+    def run(self):
+        """Run the mix for the configured duration and return a report"""
+        context = self._context()
+        results = [None] * self.concurrency
+        started = time.perf_counter()
+        deadline = started + self.duration
+        
+        threads = [
+            threading.Thread(target=self._worker, args=(worker_id, context, deadline, results))
+            for worker_id in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall_time = time.perf_counter() - started
+        
+        return self._report([sample for samples in results for sample in (samples or [])], wall_time)
+    
+    def _report(self, samples, wall_time):
+        by_endpoint = {}
+        for name, elapsed, ok in samples:
+            by_endpoint.setdefault(name, []).append((elapsed, ok))
+        
+        def summarize(entries):
+            latencies = sorted(elapsed for elapsed, _ in entries)
+            errors = sum(1 for _, ok in entries if not ok)
+            return {
+                'requests': len(entries),
+                'errors': errors,
+                'error_rate': round(errors / len(entries), 4) if entries else 0.0,
+                'throughput_rps': round(len(entries) / wall_time, 2),
+                'p50_ms': round(percentile(latencies, 0.50) * 1000, 3) if latencies else None,
+                'p95_ms': round(percentile(latencies, 0.95) * 1000, 3) if latencies else None,
+                'p99_ms': round(percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+            }
+        
+        return {
+            'generated_at': datetime.datetime.utcnow().isoformat(),
+            'concurrency': self.concurrency,
+            'duration_seconds': round(wall_time, 2),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'total': summarize([(elapsed, ok) for _, elapsed, ok in samples]),
+            'endpoints': {name: summarize(entries) for name, entries in sorted(by_endpoint.items())},
+        }
+
+def compare_with_baseline(report, baseline, tolerance=0.25):
+    """List regressions: p95 slower or throughput lower than baseline beyond the tolerance"""
+    regressions = []
+    for name, expected in baseline['endpoints'].items():
+        actual = report['endpoints'].get(name)
+        if actual is None:
+            regressions.append(f"{name}: missing from run")
+            continue
+        if expected['p95_ms'] and actual['p95_ms'] and actual['p95_ms'] > expected['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {actual['p95_ms']}ms > baseline {expected['p95_ms']}ms")
+        if actual['throughput_rps'] < expected['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {actual['throughput_rps']} rps < baseline {expected['throughput_rps']} rps")
+        if actual['error_rate'] > expected['error_rate'] + 0.01:
+            regressions.append(f"{name}: error rate {actual['error_rate']} > baseline {expected['error_rate']}")
+    return regressions
+
+def print_report(report):
+    print(f"{'endpoint':<22}{'reqs':>8}{'err':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stats in list(report['endpoints'].items()) + [('TOTAL', report['total'])]:
+        print(f"{name:<22}{stats['requests']:>8}{stats['errors']:>6}{stats['throughput_rps']:>10}"
+              f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
@@ -0,0 +1,301 @@
+"""
+Deterministic dataset generator for KingGroup load tests
+Bulk-loads users, maps and downloads with realistic skew into SQLite or PostgreSQL
+"""
+import io
+import csv
+import math
+import random
+import bisect
+import logging
+import datetime
+from itertools import accumulate
+from sqlalchemy import create_engine, text, bindparam
+from werkzeug.security import generate_password_hash
+from .geography import weighted_locations
+
+logger = logging.getLogger(__name__)
+
+# Every generated user shares this password so the driver can log in
+LOADTEST_PASSWORD = 'loadtest-2025'
+
+MAP_TYPES = [('offline', 50), ('truck_stops', 35), ('routes', 15)]
+PLATFORMS = [('android', 70), ('ios', 22), ('web', 8)]
+
+class DatasetSpec:
+    """Size and shape of a generated dataset"""
+    
+    def __init__(self, users, maps, downloads, zipf_exponent=1.07, days=365, seed=2025, batch_size=10000):
+        self.users = users
+        self.maps = maps
+        self.downloads = downloads
+        self.zipf_exponent = zipf_exponent
+        self.days = days
+        self.seed = seed
+        self.batch_size = batch_size
+    
+    def to_dict(self):
+        return dict(self.__dict__)
+
+# Named scales; 'full' is the production sizing target
+SCALES = {
+    'smoke': DatasetSpec(users=1_000, maps=200, downloads=20_000),
+    'medium': DatasetSpec(users=100_000, maps=10_000, downloads=2_000_000),
+    'full': DatasetSpec(users=1_000_000, maps=100_000, downloads=50_000_000),
+}
+
+class ZipfSampler:
+    """Sample ranks 0..n-1 with P(rank k) proportional to 1 / (k + 1) ** s"""
+    
+    def __init__(self, n, exponent, rng):
+        self.rng = rng
+        self.cumulative = list(accumulate(1.0 / (rank + 1) ** exponent for rank in range(n)))
+        self.total = self.cumulative[-1]
+    
+    def sample(self):
+        return bisect.bisect_left(self.cumulative, self.rng.random() * self.total)
+
+class WeightedChoice:
+    """Repeated weighted choice with a precomputed cumulative table"""
+    
+    def __init__(self, items, weights, rng):
+        self.items = items
+        self.rng = rng
+        self.cumulative = list(accumulate(weights))
+        self.total = self.cumulative[-1]
+    
+    def sample(self):
+        return self.items[bisect.bisect_left(self.cumulative, self.rng.random() * self.total)]
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class DatasetGenerator:
+    """Generates rows deterministically from a spec and bulk-loads them"""
+    
+    def __init__(self, engine, spec):
+        self.engine = engine
+        self.spec = spec
+        self.now = datetime.datetime(2025, 7, 1, tzinfo=datetime.timezone.utc)
+        locations, weights = weighted_locations()
+        self.locations = locations
+        self.location_weights = weights
+        self.map_download_counts = [0] * spec.maps
+    
+    def _rng(self, stream):
+        """Independent, reproducible random stream per table"""
+        return random.Random(f"{self.spec.seed}:{stream}")
+    
+    def generate_users(self):
+        rng = self._rng('users')
+        locations = WeightedChoice(self.locations, self.location_weights, rng)
+        # Hash once: PBKDF2 per row would dominate generation time
+        password_hash = generate_password_hash(LOADTEST_PASSWORD)
+        
+        for user_id in range(1, self.spec.users + 1):
+            country, state, city, _, _ = locations.sample()
+            created_at = self.now - datetime.timedelta(days=rng.random() * self.spec.days * 2)
+            license_expires = (created_at + datetime.timedelta(days=rng.choice((30, 90, 365)))).date().isoformat()
+            yield {
+                'id': user_id,
+                'username': f'driver{user_id:07d}',
+                'email': f'driver{user_id:07d}@loadtest.kinggrouptech.com',
+                'password_hash': password_hash,
+                'country': country,
+                'region': state,
+                'invite_code': None,
+                'license_expires': license_expires,
+                'is_active': rng.random() > 0.03,
+                'is_premium': rng.random() < 0.25,
+                'created_at': created_at,
+                'company': f'Transportadora {rng.randint(1, max(1, self.spec.users // 50))}',
+            }
+        
+        # Admin account used by the driver for /api/admin endpoints
+        yield {
+            'id': self.spec.users + 1,
+            'username': 'admin',
+            'email': 'admin@loadtest.kinggrouptech.com',
+            'password_hash': password_hash,
+            'country': 'Brazil',
+            'region': 'São Paulo',
+            'invite_code': None,
+            'license_expires': None,
+            'is_active': True,
+            'is_premium': True,
+            'created_at': self.now,
+            'company': 'KingGroup Tech',
+        }
+    
+    def generate_maps(self):
+        rng = self._rng('maps')
+        locations = WeightedChoice(self.locations, self.location_weights, rng)
+        map_types = WeightedChoice([name for name, _ in MAP_TYPES], [weight for _, weight in MAP_TYPES], rng)
+        
+        for map_id in range(1, self.spec.maps + 1):
+            country, state, city, lat, lng = locations.sample()
+            map_type = map_types.sample()
+            half_span = rng.uniform(0.05, 1.5) if map_type != 'routes' else rng.uniform(1.0, 6.0)
+            center_lat = lat + rng.gauss(0, 0.3)
+            center_lng = lng + rng.gauss(0, 0.3)
+            created_at = self.now - datetime.timedelta(days=rng.random() * self.spec.days * 3)
+            file_size = int(rng.lognormvariate(math.log(40_000_000 if map_type == 'offline' else 3_000_000), 0.8))
+            yield {
+                'id': map_id,
+                'country': country,
+                'state': state,
+                'city': city,
+                'region': state,
+                'map_type': map_type,
+                'map_name': f'{city} {map_type.replace("_", " ").title()} #{map_id}',
+                'description': f'{map_type} dataset for {city}, {state} ({country})',
+                'file_size': file_size,
+                'file_format': 'gpx' if map_type == 'truck_stops' else 'osm',
+                'download_url': f'https://storage.kinggrouptech.com/maps/{map_id}.{map_type}',
+                'file_hash': f'{rng.getrandbits(256):064x}',
+                'lat_min': center_lat - half_span,
+                'lat_max': center_lat + half_span,
+                'lng_min': center_lng - half_span,
+                'lng_max': center_lng + half_span,
+                'is_premium': rng.random() < 0.3,
+                'is_active': rng.random() > 0.05,
+                'download_count': 0,
+                'version': f'{rng.randint(1, 4)}.{rng.randint(0, 9)}',
+                'last_updated': created_at + datetime.timedelta(days=rng.random() * 30),
+                'created_at': created_at,
+                'tags': 'truck-friendly,' + map_type,
+                'difficulty_level': rng.choice(('easy', 'medium', 'hard')),
+                'estimated_download_time': max(1, file_size // 8_000_000),
+            }
+    
+    def generate_downloads(self):
+        rng = self._rng('downloads')
+        # Map popularity is Zipfian; which map holds which rank is shuffled
+        popularity = ZipfSampler(self.spec.maps, self.spec.zipf_exponent, rng)
+        map_by_rank = list(range(1, self.spec.maps + 1))
+        rng.shuffle(map_by_rank)
+        # Heavy users exist too, with a flatter skew
+        activity = ZipfSampler(self.spec.users, 0.6, rng)
+        user_by_rank = list(range(1, self.spec.users + 1))
+        rng.shuffle(user_by_rank)
+        platforms = WeightedChoice([name for name, _ in PLATFORMS], [weight for _, weight in PLATFORMS], rng)
+        
+        seconds_span = self.spec.days * 86400
+        for download_id in range(1, self.spec.downloads + 1):
+            map_id = map_by_rank[popularity.sample()]
+            self.map_download_counts[map_id - 1] += 1
+            # Recent days are busier: square the uniform draw toward "now"
+            age = seconds_span * rng.random() ** 2
+            download_date = self.now - datetime.timedelta(seconds=age)
+            platform = platforms.sample()
+            yield {
+                'id': download_id,
+                'user_id': user_by_rank[activity.sample()],
+                'map_id': map_id,
+                'download_date': download_date,
+                'status': 'completed' if rng.random() > 0.04 else 'failed',
+                'download_size': rng.randint(1_000_000, 60_000_000),
+                'download_time': round(rng.uniform(5, 600), 2),
+                'device_type': 'mobile' if platform != 'web' else 'desktop',
+                'platform': platform,
+                'app_version': f'2.{rng.randint(0, 6)}',
+                'started_at': download_date,
+                'completed_at': download_date + datetime.timedelta(seconds=rng.randint(5, 600)),
+            }
+    
+    def _load(self, table, rows):
+        """Bulk insert: COPY on PostgreSQL, batched executemany elsewhere"""
+        loaded = 0
+        columns = None
+        for batch in _batches(rows, self.spec.batch_size):
+            columns = columns or list(batch[0].keys())
+            if self.engine.dialect.name == 'postgresql':
+                self._copy(table.name, columns, batch)
+            else:
+                with self.engine.begin() as connection:
+                    connection.execute(table.insert(), batch)
+            loaded += len(batch)
+            if loaded % (self.spec.batch_size * 50) == 0:
+                logger.info(f"   {table.name}: {loaded:,} rows")
+        return loaded
+    
+    def _copy(self, table_name, columns, batch):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in batch:
+            writer.writerow(['\\N' if row[column] is None else row[column] for column in columns])
+        buffer.seek(0)
+        
+        raw = self.engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            cursor.copy_expert(
+                f"COPY {table_name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer
+            )
+            raw.commit()
+        finally:
+            raw.close()
+    
+    def _prepare(self, connection):
+        if self.engine.dialect.name == 'sqlite':
+            connection.execute(text("PRAGMA journal_mode = WAL"))
+            connection.execute(text("PRAGMA synchronous = OFF"))
+    
+    def run(self):
+        """Create the schema and load all tables"""
+        from config.database import Base
+        from models.user import User
+        from models.map import Map
+        from models.download import Download
+        
+        Base.metadata.create_all(bind=self.engine)
+        with self.engine.begin() as connection:
+            self._prepare(connection)
+        
+        logger.info(f"🗄️ Loading dataset {self.spec.to_dict()}")
+        totals = {
+            'users': self._load(User.__table__, self.generate_users()),
+            'maps': self._load(Map.__table__, self.generate_maps()),
+            'downloads': self._load(Download.__table__, self.generate_downloads()),
+        }
+        
+        # Keep Map.download_count consistent with the generated downloads
+        with self.engine.begin() as connection:
+            statement = Map.__table__.update().where(Map.__table__.c.id == bindparam('map_id')).values(
+                download_count=bindparam('count')
+            )
+            connection.execute(statement, [
+                {'map_id': map_id, 'count': count}
+                for map_id, count in enumerate(self.map_download_counts, start=1) if count
+            ])
+            connection.execute(text("ANALYZE"))
+            
+            # Explicit ids were inserted, move PostgreSQL sequences past them
+            if self.engine.dialect.name == 'postgresql':
+                for table_name in ('users', 'maps', 'downloads'):
+                    connection.execute(text(
+                        f"SELECT setval(pg_get_serial_sequence('{table_name}', 'id'), "
+                        f"(SELECT COALESCE(MAX(id), 1) FROM {table_name}))"
+                    ))
+        
+        logger.info(f"✅ Dataset loaded: {totals}")
+        return totals
+
+def generate_dataset(database_url, scale='smoke', seed=None):
+    """Generate a named-scale dataset into the given database"""
+    spec = SCALES[scale]
+    if seed is not None:
+        spec = DatasetSpec(**{**spec.to_dict(), 'seed': seed})
+    
+    engine = create_engine(database_url)
+    try:
+        return DatasetGenerator(engine, spec).run()
+    finally:
+        engine.dispose()
@@ -0,0 +1,68 @@
+"""
+Reference geography for generated datasets
+Brazilian states and South American countries with city centers and weights
+"""
+
+# (state, [(city, lat, lng, weight)]) - weights roughly follow population
+BRAZIL_STATES = [
+    ('São Paulo', [('São Paulo', -23.55, -46.63, 120), ('Campinas', -22.91, -47.06, 12), ('Santos', -23.96, -46.33, 5), ('Ribeirão Preto', -21.18, -47.81, 7)]),
+    ('Rio de Janeiro', [('Rio de Janeiro', -22.91, -43.17, 65), ('Niterói', -22.88, -43.10, 5), ('Volta Redonda', -22.52, -44.10, 3)]),
+    ('Minas Gerais', [('Belo Horizonte', -19.92, -43.94, 25), ('Uberlândia', -18.92, -48.28, 7), ('Juiz de Fora', -21.76, -43.35, 5)]),
+    ('Bahia', [('Salvador', -12.97, -38.50, 24), ('Feira de Santana', -12.27, -38.97, 6), ('Vitória da Conquista', -14.86, -40.84, 3)]),
+    ('Paraná', [('Curitiba', -25.43, -49.27, 19), ('Londrina', -23.31, -51.16, 6), ('Maringá', -23.42, -51.94, 4), ('Foz do Iguaçu', -25.55, -54.59, 3)]),
+    ('Rio Grande do Sul', [('Porto Alegre', -30.03, -51.23, 15), ('Caxias do Sul', -29.17, -51.18, 5), ('Pelotas', -31.77, -52.34, 3)]),
+    ('Pernambuco', [('Recife', -8.05, -34.88, 16), ('Petrolina', -9.39, -40.50, 3)]),
+    ('Ceará', [('Fortaleza', -3.72, -38.54, 27), ('Juazeiro do Norte', -7.21, -39.31, 3)]),
+    ('Pará', [('Belém', -1.46, -48.50, 15), ('Marabá', -5.37, -49.12, 3), ('Santarém', -2.44, -54.71, 3)]),
+    ('Santa Catarina', [('Florianópolis', -27.59, -48.55, 5), ('Joinville', -26.30, -48.85, 6), ('Chapecó', -27.10, -52.62, 2)]),
+    ('Goiás', [('Goiânia', -16.69, -49.25, 15), ('Rio Verde', -17.80, -50.93, 2), ('Anápolis', -16.33, -48.95, 4)]),
+    ('Maranhão', [('São Luís', -2.53, -44.30, 11), ('Imperatriz', -5.53, -47.48, 3)]),
+    ('Amazonas', [('Manaus', -3.12, -60.02, 22)]),
+    ('Espírito Santo', [('Vitória', -20.32, -40.34, 4), ('Vila Velha', -20.33, -40.29, 5)]),
+    ('Paraíba', [('João Pessoa', -7.12, -34.86, 8), ('Campina Grande', -7.23, -35.88, 4)]),
+    ('Rio Grande do Norte', [('Natal', -5.79, -35.21, 9), ('Mossoró', -5.19, -37.34, 3)]),
+    ('Mato Grosso', [('Cuiabá', -15.60, -56.10, 6), ('Sinop', -11.86, -55.50, 2), ('Rondonópolis', -16.47, -54.64, 2)]),
+    ('Alagoas', [('Maceió', -9.67, -35.74, 10)]),
+    ('Piauí', [('Teresina', -5.09, -42.80, 9)]),
+    ('Mato Grosso do Sul', [('Campo Grande', -20.47, -54.62, 9), ('Dourados', -22.22, -54.81, 2)]),
+    ('Distrito Federal', [('Brasília', -15.79, -47.88, 30)]),
+    ('Sergipe', [('Aracaju', -10.91, -37.07, 7)]),
+    ('Rondônia', [('Porto Velho', -8.76, -63.90, 5), ('Ji-Paraná', -10.88, -61.95, 1)]),
+    ('Tocantins', [('Palmas', -10.18, -48.33, 3), ('Araguaína', -7.19, -48.21, 2)]),
+    ('Acre', [('Rio Branco', -9.97, -67.81, 4)]),
+    ('Amapá', [('Macapá', 0.03, -51.07, 5)]),
+    ('Roraima', [('Boa Vista', 2.82, -60.67, 4)]),
+]
+
+# (country, weight, [(state, city, lat, lng)])
+SOUTH_AMERICA = [
+    ('Argentina', 8, [('Buenos Aires', 'Buenos Aires', -34.60, -58.38), ('Córdoba', 'Córdoba', -31.42, -64.18), ('Santa Fe', 'Rosario', -32.95, -60.65), ('Mendoza', 'Mendoza', -32.89, -68.83)]),
+    ('Chile', 4, [('Santiago', 'Santiago', -33.45, -70.67), ('Valparaíso', 'Valparaíso', -33.05, -71.62), ('Antofagasta', 'Antofagasta', -23.65, -70.40)]),
+    ('Paraguay', 3, [('Asunción', 'Asunción', -25.26, -57.58), ('Alto Paraná', 'Ciudad del Este', -25.51, -54.61)]),
+    ('Uruguay', 2, [('Montevideo', 'Montevideo', -34.90, -56.16), ('Rivera', 'Rivera', -30.90, -55.55)]),
+    ('Bolivia', 2, [('Santa Cruz', 'Santa Cruz de la Sierra', -17.78, -63.18), ('La Paz', 'La Paz', -16.50, -68.15)]),
+    ('Peru', 3, [('Lima', 'Lima', -12.05, -77.04), ('Arequipa', 'Arequipa', -16.41, -71.54)]),
+    ('Colombia', 3, [('Bogotá', 'Bogotá', 4.71, -74.07), ('Antioquia', 'Medellín', 6.24, -75.58)]),
+]
+
+# Share of generated rows located in Brazil (the rest spread over SOUTH_AMERICA)
+BRAZIL_SHARE = 0.82
+
+def weighted_locations():
+    """Flatten the reference data into (country, state, city, lat, lng) plus weights"""
+    locations = []
+    weights = []
+    
+    brazil_total = sum(weight for _, cities in BRAZIL_STATES for *_, weight in cities)
+    for state, cities in BRAZIL_STATES:
+        for city, lat, lng, weight in cities:
+            locations.append(('Brazil', state, city, lat, lng))
+            weights.append(BRAZIL_SHARE * weight / brazil_total)
+    
+    others_total = sum(weight for _, weight, _ in SOUTH_AMERICA)
+    for country, country_weight, cities in SOUTH_AMERICA:
+        for state, city, lat, lng in cities:
+            locations.append((country, state, city, lat, lng))
+            weights.append((1 - BRAZIL_SHARE) * country_weight / others_total / len(cities))
+    
+    return locations, weights
@@ -0,0 +1,85 @@
+"""
+Per-worker memory of gunicorn with and without --preload
+Reads /proc/<pid>/smaps_rollup (Linux) for every worker after a warm-up request burst.
+
+Usage:
+    python -m loadtest.measure_rss --database-url sqlite:///loadtest.db --workers 4
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+import http.client
+
+def _children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as children_file:
+        return [int(child) for child in children_file.read().split()]
+
+def _memory_kb(pid):
+    """Rss, Pss and private (unshared) memory of a process in kB"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as rollup:
+        for line in rollup:
+            parts = line.split()
+            if len(parts) >= 3 and parts[0].rstrip(':') in ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty'):
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'rss': values.get('Rss', 0),
+        'pss': values.get('Pss', 0),
+        'private': values.get('Private_Clean', 0) + values.get('Private_Dirty', 0),
+    }
+
+def _warm(port, requests=200):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    for index in range(requests):
+        for path in ('/api/maps/', f'/api/maps/{index % 50 + 1}', '/api/maps/categories'):
+            connection.request('GET', path)
+            connection.getresponse().read()
+    connection.close()
+
+def measure(database_url, workers, preload, port):
+    env = dict(os.environ, DATABASE_URL=database_url, GUNICORN_PRELOAD='true' if preload else 'false',
+               GUNICORN_WORKERS=str(workers), PORT=str(port))
+    master = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'main:app'],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + 30
+        while time.time() < deadline and len(_children(master.pid)) < workers:
+            time.sleep(0.2)
+        time.sleep(1.0)
+        _warm(port)
+        time.sleep(0.5)
+        
+        samples = [_memory_kb(pid) for pid in _children(master.pid)]
+        return {
+            'workers': len(samples),
+            'rss_kb': sum(sample['rss'] for sample in samples) // max(1, len(samples)),
+            'pss_kb': sum(sample['pss'] for sample in samples) // max(1, len(samples)),
+            'private_kb': sum(sample['private'] for sample in samples) // max(1, len(samples)),
+        }
+    finally:
+        master.terminate()
+        master.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-worker memory with and without preload')
+    parser.add_argument('--database-url', default='sqlite:///loadtest.db')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8090)
+    args = parser.parse_args()
+    
+    results = {
+        'no preload': measure(args.database_url, args.workers, False, args.port),
+        'preload': measure(args.database_url, args.workers, True, args.port + 1),
+    }
+    
+    print(f"{'mode':<12}{'workers':>8}{'RSS kB':>10}{'PSS kB':>10}{'private kB':>12}")
+    for mode, result in results.items():
+        print(f"{mode:<12}{result['workers']:>8}{result['rss_kb']:>10}{result['pss_kb']:>10}{result['private_kb']:>12}")
+    
+    saved = results['no preload']['private_kb'] - results['preload']['private_kb']
+    print(f"\n💾 Private memory saved per worker with preload: {saved} kB")
+
+if __name__ == '__main__':
+    main()
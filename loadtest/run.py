@@ -0,0 +1,54 @@
+"""
+Load-test runner CLI
+Usage: python -m loadtest.run --database-url sqlite:///loadtest.db --duration 30 --baseline smoke [--save-baseline]
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+from .driver import LoadDriver, BASELINE_DIR, compare_with_baseline, print_report
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the KingGroup load mix against create_app()')
+    parser.add_argument('--database-url', default='sqlite:///loadtest.db')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--seed', type=int, default=2025)
+    parser.add_argument('--baseline', help='baseline name in loadtest/baselines')
+    parser.add_argument('--save-baseline', action='store_true', help='write this run as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+    
+    # The app reads its database from the environment at import time
+    os.environ['DATABASE_URL'] = args.database_url
+    logging.getLogger().setLevel(logging.WARNING)
+    from main import create_app
+    
+    report = LoadDriver(create_app(), concurrency=args.concurrency, duration=args.duration, seed=args.seed).run()
+    print_report(report)
+    
+    if not args.baseline:
+        return 0
+    
+    baseline_path = os.path.join(BASELINE_DIR, f'{args.baseline}.json')
+    if args.save_baseline:
+        with open(baseline_path, 'w') as baseline_file:
+            json.dump(report, baseline_file, indent=2, sort_keys=True)
+        print(f"💾 Baseline saved to {baseline_path}")
+        return 0
+    
+    with open(baseline_path) as baseline_file:
+        regressions = compare_with_baseline(report, json.load(baseline_file), args.tolerance)
+    
+    if regressions:
+        print("💥 Regressions against baseline:")
+        for regression in regressions:
+            print(f"   {regression}")
+        return 1
+    
+    print("✅ No regressions against baseline")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,21 @@
+"""
+Load-test dataset CLI
+Usage: python -m loadtest.seed --database-url sqlite:///loadtest.db --scale smoke
+"""
+import argparse
+import logging
+from .generator import SCALES, generate_dataset
+
+logging.basicConfig(level=logging.INFO)
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a deterministic KingGroup load-test dataset')
+    parser.add_argument('--database-url', default='sqlite:///loadtest.db')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='smoke')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+    
+    generate_dataset(args.database_url, args.scale, args.seed)
+
+if __name__ == '__main__':
+    main()
@@ -12,11 +12,17 @@ from config.database import db_config
 from models.user import User
 from models.map import Map
 from models.download import Download
+from services.health import health_metrics
+from monitoring.metrics import init_metrics
+from monitoring.query_log import init_query_log
+from middleware.compression import init_compression
+from middleware.read_your_writes import init_read_your_writes, WRITE_HEADER
 
 # Import route blueprints
 from routes.user_routes import user_bp
 from routes.map_routes import map_bp
 from routes.admin_routes import admin_bp
+from routes.batch_routes import batch_bp
 
 def create_app():
     """Application factory pattern"""
@@ -32,12 +38,26 @@ def create_app():
         'https://kinggrouptech-93908.web.app',
         'http://localhost:3000',  # Development
         'http://localhost:8080'   # Local testing
-    ])
+    ], expose_headers=[WRITE_HEADER])
     
     # Register blueprints
     app.register_blueprint(user_bp)
     app.register_blueprint(map_bp)
     app.register_blueprint(admin_bp)
+    app.register_blueprint(batch_bp)
+    
+    # Request latency, per-request query count/DB time and /metrics
+    engines = {'primary': db_config.engine}
+    for replica in db_config.replicas.replicas:
+        engines[replica.name] = replica.engine
+    init_metrics(app, engines)
+    init_query_log(app)
+    
+    # Recent writers read from the primary on every worker, not just the one that wrote
+    init_read_your_writes(app)
+    
+    # Negotiated gzip/br/zstd for JSON responses
+    init_compression(app)
     
     return app
 
@@ -65,7 +85,8 @@ def index():
         'endpoints': {
             'users': '/api/user/',
             'maps': '/api/maps/',
-            'admin': '/api/admin/'
+            'admin': '/api/admin/',
+            'batch': '/api/batch'
         },
         'features': [
             'Modular architecture',
@@ -78,26 +99,44 @@ def index():
         'timestamp': datetime.datetime.utcnow().isoformat()
     })
 
+@app.route('/health/live', methods=['GET'])
+def health_live():
+    """Liveness probe: the process is up and serving, no I/O"""
+    return jsonify({'status': 'alive'})
+
+@app.route('/health/ready', methods=['GET'])
+def health_ready():
+    """Readiness probe: a single pooled SELECT 1 with a timeout"""
+    try:
+        db_config.ping(timeout_seconds=float(os.environ.get('HEALTH_READY_TIMEOUT', 2)))
+        return jsonify({'status': 'ready'})
+        
+    except Exception as e:
+        return jsonify({
+            'status': 'not_ready',
+            'error': str(e)
+        }), 503
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint for monitoring"""
+    """Detailed health check with cached table counts"""
     try:
-        # Test database connection
-        session = db_config.get_session()
-        user_count = session.query(User).count()
-        map_count = session.query(Map).count()
-        download_count = session.query(Download).count()
-        session.close()
+        db_config.ping(timeout_seconds=float(os.environ.get('HEALTH_READY_TIMEOUT', 2)))
+        metrics = health_metrics.get()
+        counts = metrics['counts'] or {}
         
         return jsonify({
             'status': 'healthy',
             'timestamp': datetime.datetime.utcnow().isoformat(),
             'database': {
                 'status': 'connected',
-                'type': 'Cloud SQL PostgreSQL' if db_config.database_url.startswith('postgresql') else 'SQLite',
-                'users': user_count,
-                'maps': map_count,
-                'downloads': download_count
+                'type': 'Cloud SQL PostgreSQL' if db_config.is_postgres() else 'SQLite',
+                'users': counts.get('users'),
+                'maps': counts.get('maps'),
+                'downloads': counts.get('downloads'),
+                'counts_source': metrics['source'],
+                'counts_refreshed_at': metrics['refreshed_at'],
+                'counts_age_seconds': metrics['age_seconds']
             },
             'version': '2.0.0',
             'architecture': 'modular'
@@ -125,15 +164,23 @@ def api_info():
                 'profile': 'GET /api/user/profile'
             },
             'maps': {
-                'list': 'GET /api/maps/',
+                'list': 'GET /api/maps/?sort=downloads|trending',
                 'details': 'GET /api/maps/{id}',
+                'multi_get': 'GET /api/maps/batch?ids=1,2,3 | POST /api/maps/batch',
+                'changes': 'GET /api/maps/changes?since={watermark}',
+                'snapshot': 'GET /api/maps/snapshot',
+                'access': 'GET /api/maps/access?ids=1,2,3 | POST /api/maps/access',
                 'download': 'POST /api/maps/{id}/download',
                 'categories': 'GET /api/maps/categories'
             },
+            'batch': {
+                'run': 'POST /api/batch {"requests": [{"id", "method", "path", "body"}]}'
+            },
             'admin': {
                 'stats': 'GET /api/admin/stats',
                 'users': 'GET /api/admin/users',
-                'user_management': 'POST /api/admin/users/{id}/toggle-status'
+                'user_management': 'POST /api/admin/users/{id}/toggle-status',
+                'query_offenders': 'GET /api/admin/queries'
             }
         },
         'features': {
@@ -157,10 +204,14 @@ def not_found(error):
         'available_endpoints': [
             '/',
             '/health',
+            '/health/live',
+            '/health/ready',
+            '/metrics',
             '/api/info',
             '/api/user/*',
             '/api/maps/*',
-            '/api/admin/*'
+            '/api/admin/*',
+            '/api/batch'
         ]
     }), 404
 
@@ -0,0 +1,10 @@
+"""
+Middleware package for KingGroup backend
+HTTP-level response processing shared by every blueprint
+"""
+from .compression import response_compressor, init_compression, cache_compressed, available_codecs
+from .idempotency import idempotency_store, idempotent
+from .read_your_writes import init_read_your_writes
+
+__all__ = ['response_compressor', 'init_compression', 'cache_compressed', 'available_codecs',
+           'idempotency_store', 'idempotent', 'init_read_your_writes']
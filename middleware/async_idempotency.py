@@ -0,0 +1,61 @@
+"""
+Async idempotency keys for the ASGI app
+Same store, header and messages as middleware.idempotency
+"""
+import asyncio
+import hashlib
+from functools import wraps
+from quart import request, jsonify, make_response, current_app
+from .idempotency import idempotency_store, REPLAYED_HEADERS
+
+def _replay(stored):
+    status, body, headers = stored
+    response = current_app.response_class(body, status=status, headers=headers)
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def idempotent(f):
+    """Decorator for write routes honouring an Idempotency-Key header (put it above token_required)"""
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return await f(*args, **kwargs)
+        if len(key) > 255:
+            return jsonify({'message': 'Idempotency-Key inválida'}), 400
+        
+        # Keys are only meaningful per client credentials and endpoint
+        scope = hashlib.sha256(request.headers.get('Authorization', '').encode('utf-8')).hexdigest()
+        store_key = (scope, request.method, request.path, key)
+        fingerprint = hashlib.sha256(await request.get_data()).hexdigest()
+        
+        while True:
+            entry, owner = idempotency_store.begin(store_key, fingerprint)
+            if owner:
+                break
+            if entry is None:
+                return jsonify({'message': 'Muitas requisições com Idempotency-Key em andamento'}), 503, {'Retry-After': '1'}
+            if entry.fingerprint != fingerprint:
+                return jsonify({'message': 'Idempotency-Key já usada com outra requisição'}), 422
+            # Wait off the event loop: the first attempt may be on another task
+            if not await asyncio.to_thread(entry.done.wait, idempotency_store.wait_seconds):
+                return jsonify({'message': 'Requisição com esta Idempotency-Key ainda em andamento'}), 409
+            if entry.response is not None:
+                return _replay(entry.response)
+            # The first attempt failed and was abandoned: run it ourselves
+        
+        try:
+            response = await make_response(await f(*args, **kwargs))
+        except Exception:
+            idempotency_store.abandon(store_key, entry)
+            raise
+        
+        # Server errors are not stored: a retry should really retry
+        if response.status_code >= 500:
+            idempotency_store.abandon(store_key, entry)
+            return response
+        
+        headers = {name: response.headers[name] for name in REPLAYED_HEADERS if name in response.headers}
+        idempotency_store.complete(store_key, entry, (response.status_code, await response.get_data(), headers))
+        return response
+    return decorated
@@ -0,0 +1,198 @@
+"""
+Response compression for KingGroup backend
+Negotiates Accept-Encoding (br, zstd, gzip) and reuses compressed cacheable payloads
+"""
+import os
+import zlib
+import logging
+import threading
+from collections import OrderedDict
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip is always available
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_MIMETYPES = (
+    'application/json', 'application/javascript', 'application/xml',
+    'application/x-ndjson', 'image/svg+xml'
+)
+
+class GzipCodec:
+    """gzip via zlib (stdlib)"""
+    name = 'gzip'
+    
+    def __init__(self, level):
+        self.level = level
+    
+    def compress(self, data):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+    
+    def stream(self, chunks):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            # Sync flush so each chunk reaches the client without waiting for the next one
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+class BrotliCodec:
+    """Brotli (br) via the brotli package"""
+    name = 'br'
+    
+    def __init__(self, level):
+        self.level = level
+    
+    def compress(self, data):
+        return brotli.compress(data, quality=self.level)
+    
+    def stream(self, chunks):
+        compressor = brotli.Compressor(quality=self.level)
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+
+class ZstdCodec:
+    """Zstandard (zstd) via the zstandard package"""
+    name = 'zstd'
+    
+    def __init__(self, level):
+        self.level = level
+        self._local = threading.local()
+    
+    def _compressor(self):
+        # ZstdCompressor instances are not thread-safe; keep one per thread
+        compressor = getattr(self._local, 'compressor', None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(level=self.level)
+        return compressor
+    
+    def compress(self, data):
+        return self._compressor().compress(data)
+    
+    def stream(self, chunks):
+        compressor = zstandard.ZstdCompressor(level=self.level).compressobj()
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        yield compressor.flush()
+
+def available_codecs():
+    """Codecs installed here, in server preference order"""
+    # Smallest payload first: our users pay for mobile data by the megabyte
+    codecs = []
+    if brotli is not None:
+        codecs.append(BrotliCodec(int(os.environ.get('COMPRESSION_BROTLI_LEVEL', 5))))
+    if zstandard is not None:
+        codecs.append(ZstdCodec(int(os.environ.get('COMPRESSION_ZSTD_LEVEL', 3))))
+    codecs.append(GzipCodec(int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))))
+    return codecs
+
+class CompressedPayloadCache:
+    """Bounded LRU of compressed bodies keyed by (cache key, encoding)"""
+    
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or int(os.environ.get('COMPRESSION_CACHE_ENTRIES', 512))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key):
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+    
+    def put(self, key, payload):
+        with self._lock:
+            self._entries[key] = payload
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class ResponseCompressor:
+    """after_request hook compressing eligible responses with the negotiated codec"""
+    
+    def __init__(self, codecs=None, min_bytes=None, cache=None):
+        self.codecs = codecs or available_codecs()
+        self.min_bytes = min_bytes if min_bytes is not None else int(os.environ.get('COMPRESSION_MIN_BYTES', 1024))
+        self.cache = cache or CompressedPayloadCache()
+    
+    def negotiate(self, accept_encodings):
+        """Pick the codec with the highest client q-value, ties broken by server preference"""
+        best, best_quality = None, 0
+        for codec in self.codecs:
+            quality = accept_encodings.quality(codec.name)
+            if quality > best_quality:
+                best, best_quality = codec, quality
+        return best
+    
+    def _eligible(self, response):
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+        if response.direct_passthrough or 'Content-Encoding' in response.headers:
+            return False
+        mimetype = response.mimetype or ''
+        return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_MIMETYPES
+    
+    def __call__(self, response):
+        if not self._eligible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        
+        codec = self.negotiate(request.accept_encodings)
+        if codec is None:
+            return response
+        
+        if response.is_streamed:
+            response.response = codec.stream(chunk for chunk in response.iter_encoded() if chunk)
+            response.headers.pop('Content-Length', None)
+        else:
+            body = response.get_data()
+            if len(body) < self.min_bytes:
+                return response
+            
+            cache_key = getattr(response, 'compression_cache_key', None)
+            payload = self.cache.get((cache_key, codec.name)) if cache_key is not None else None
+            if payload is None:
+                payload = codec.compress(body)
+                if cache_key is not None:
+                    self.cache.put((cache_key, codec.name), payload)
+            if len(payload) >= len(body):
+                return response
+            response.set_data(payload)
+        
+        response.headers['Content-Encoding'] = codec.name
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f'{etag}-{codec.name}', weak)
+        return response
+
+def cache_compressed(response, *key):
+    """Mark response as fully determined by key so its compressed body is reused; returns response"""
+    # Kept on the response, not in g: batch sub-requests share the outer request's app context
+    response.compression_cache_key = key
+    return response
+
+response_compressor = ResponseCompressor()
+
+def init_compression(app):
+    """Compress responses after every other after_request hook has run"""
+    app.after_request_funcs.setdefault(None, []).insert(0, response_compressor)
+    logger.info(f"🗜️ Response compression: {', '.join(codec.name for codec in response_compressor.codecs)}")
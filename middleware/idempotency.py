@@ -0,0 +1,143 @@
+"""
+Idempotency keys for KingGroup backend
+Replays the stored response of a retried write instead of running it again
+"""
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import request, jsonify, make_response, current_app
+
+REPLAYED_HEADERS = ('Content-Type', 'Location')
+
+class IdempotencyEntry:
+    """One key: in flight until the first response is stored"""
+    __slots__ = ('fingerprint', 'expires_at', 'done', 'response')
+    
+    def __init__(self, fingerprint, expires_at):
+        self.fingerprint = fingerprint
+        self.expires_at = expires_at
+        self.done = threading.Event()
+        self.response = None
+
+class IdempotencyStore:
+    """Bounded, TTL-limited key → stored response map (per worker process)"""
+    
+    def __init__(self, ttl_seconds=None, max_entries=None, wait_seconds=None):
+        self.ttl_seconds = ttl_seconds or float(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 3600))
+        self.max_entries = max_entries or int(os.environ.get('IDEMPOTENCY_MAX_KEYS', 10000))
+        self.wait_seconds = wait_seconds or float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', 10))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def begin(self, key, fingerprint):
+        """Get (entry, True) if the caller should run the request, (existing entry, False) otherwise,
+        or (None, False) if the store is full of requests still in flight"""
+        now = time.monotonic()
+        with self._lock:
+            # Same TTL for every completed entry: the oldest ones sit at the front
+            self._evict(lambda entry: entry.expires_at <= now)
+            
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                return entry, False
+            
+            if len(self._entries) >= self.max_entries and key not in self._entries:
+                # Least recently used first, but never a key still in flight
+                self._evict(lambda entry: True, len(self._entries) - self.max_entries + 1)
+                if len(self._entries) >= self.max_entries:
+                    return None, False
+            
+            entry = IdempotencyEntry(fingerprint, now + self.ttl_seconds)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            return entry, True
+    
+    def _evict(self, evictable, limit=None):
+        """Drop completed entries from the front while evictable(entry) (call with the lock held)"""
+        evicted = []
+        for key, entry in self._entries.items():
+            if limit is not None and len(evicted) >= limit:
+                break
+            if not entry.done.is_set():
+                continue
+            if not evictable(entry):
+                break
+            evicted.append(key)
+        for key in evicted:
+            del self._entries[key]
+    
+    def complete(self, key, entry, response):
+        """Store the response and release waiting duplicates"""
+        entry.response = response
+        entry.expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            if self._entries.get(key) is entry:
+                self._entries.move_to_end(key)
+        entry.done.set()
+    
+    def abandon(self, key, entry):
+        """Forget a key whose request failed, so a retry runs again"""
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+        entry.done.set()
+    
+    def __len__(self):
+        return len(self._entries)
+
+# Global idempotency store
+idempotency_store = IdempotencyStore()
+
+def _replay(stored):
+    status, body, headers = stored
+    response = current_app.response_class(body, status=status, headers=headers)
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def idempotent(f):
+    """Decorator for write routes honouring an Idempotency-Key header (put it above token_required)"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > 255:
+            return jsonify({'message': 'Idempotency-Key inválida'}), 400
+        
+        # Keys are only meaningful per client credentials and endpoint
+        scope = hashlib.sha256(request.headers.get('Authorization', '').encode('utf-8')).hexdigest()
+        store_key = (scope, request.method, request.path, key)
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+        
+        while True:
+            entry, owner = idempotency_store.begin(store_key, fingerprint)
+            if owner:
+                break
+            if entry is None:
+                return jsonify({'message': 'Muitas requisições com Idempotency-Key em andamento'}), 503, {'Retry-After': '1'}
+            if entry.fingerprint != fingerprint:
+                return jsonify({'message': 'Idempotency-Key já usada com outra requisição'}), 422
+            if not entry.done.wait(idempotency_store.wait_seconds):
+                return jsonify({'message': 'Requisição com esta Idempotency-Key ainda em andamento'}), 409
+            if entry.response is not None:
+                return _replay(entry.response)
+            # The first attempt failed and was abandoned: run it ourselves
+        
+        try:
+            response = make_response(f(*args, **kwargs))
+        except Exception:
+            idempotency_store.abandon(store_key, entry)
+            raise
+        
+        # Server errors and streams are not stored: a retry should really retry
+        if response.status_code >= 500 or response.is_streamed:
+            idempotency_store.abandon(store_key, entry)
+            return response
+        
+        headers = {name: response.headers[name] for name in REPLAYED_HEADERS if name in response.headers}
+        idempotency_store.complete(store_key, entry, (response.status_code, response.get_data(), headers))
+        return response
+    return decorated
@@ -0,0 +1,42 @@
+"""
+Read-your-writes marker for KingGroup backend
+Carries a client's last write time in a signed cookie/header so any worker or instance pins its reads to the primary
+"""
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from flask import request
+from config.database import db_config
+from config.replicas import client_write, request_write
+
+WRITE_COOKIE = 'kg_last_write'
+WRITE_HEADER = 'X-Last-Write'
+
+def init_read_your_writes(app):
+    """Accept the marker on every request and issue a fresh one after a write"""
+    serializer = URLSafeTimedSerializer(app.config['SECRET_KEY'], salt='read-your-writes')
+    
+    @app.before_request
+    def load_write_marker():
+        token = request.headers.get(WRITE_HEADER) or request.cookies.get(WRITE_COOKIE)
+        if not token:
+            return
+        try:
+            # The signature carries the write time: older markers are simply ignored
+            client_write.set(serializer.loads(token, max_age=db_config.replicas.sticky_seconds))
+        except BadSignature:
+            pass
+    
+    @app.after_request
+    def issue_write_marker(response):
+        user_id = request_write.get()
+        if user_id is not None:
+            token = serializer.dumps(user_id)
+            response.headers[WRITE_HEADER] = token
+            response.set_cookie(WRITE_COOKIE, token, max_age=int(db_config.replicas.sticky_seconds) + 1,
+                                secure=request.is_secure, httponly=True, samesite='Lax')
+        return response
+    
+    @app.teardown_request
+    def reset_write_marker(error=None):
+        # Worker threads serve many requests: never leak a marker into the next one
+        client_write.set(None)
+        request_write.set(None)
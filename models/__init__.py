@@ -5,6 +5,10 @@ Exports all database models
 from .user import User
 from .map import Map
 from .download import Download
+from .catalogue_change import CatalogueChange
+from .analytics_sketch import AnalyticsSketch
+from .geography import Country, State, City, GeoAlias
 
-__all__ = ['User', 'Map', 'Download']
+__all__ = ['User', 'Map', 'Download', 'CatalogueChange', 'AnalyticsSketch',
+           'Country', 'State', 'City', 'GeoAlias']
 
@@ -0,0 +1,25 @@
+"""
+Analytics sketch model for KingGroup backend
+Serialized Space-Saving and HyperLogLog sketches, one row per kind, key and period
+"""
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary, UniqueConstraint
+from sqlalchemy.sql import func
+from config.database import Base
+
+class AnalyticsSketch(Base):
+    """Mergeable sketch; workers fold their deltas into the stored bytes"""
+    
+    __tablename__ = 'analytics_sketches'
+    __table_args__ = (
+        UniqueConstraint('kind', 'period', 'sketch_key', name='uq_analytics_sketches_kind_period_key'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(20), nullable=False)  # 'top_maps', 'map_users', 'country_users', 'users', 'rebuilt'
+    period = Column(String(13), nullable=False, index=True)  # 'YYYY-MM-DD' or 'YYYY-MM-DDTHH'
+    sketch_key = Column(String(100), nullable=False, default='')  # '', map id or country
+    data = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<AnalyticsSketch {self.kind} {self.period} {self.sketch_key!r}>"
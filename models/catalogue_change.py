@@ -0,0 +1,92 @@
+"""
+Catalogue change log model for KingGroup backend
+Append-only record of map inserts, updates and deactivations
+"""
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, event, inspect, text, select, delete, func
+from sqlalchemy.orm import aliased
+from config.database import Base
+from .map import Map
+
+# Columns that change on every download and are not catalogue changes
+COUNTER_COLUMNS = {'download_count', 'updated_at'}
+
+# Advisory lock serializing change log writers on PostgreSQL, so sequence
+# order equals commit order and readers never skip a late-committing entry
+CHANGE_LOG_LOCK_KEY = 735001
+
+class CatalogueChange(Base):
+    """Change log entry with a monotonic sequence number"""
+    
+    __tablename__ = 'catalogue_changes'
+    
+    # Monotonic sequence (BIGSERIAL on PostgreSQL, rowid on SQLite)
+    seq = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    
+    map_id = Column(Integer, nullable=False, index=True)
+    operation = Column(String(12), nullable=False)  # 'insert', 'update', 'deactivate', 'delete'
+    version = Column(String(20))
+    changed_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def to_dict(self):
+        """Convert change to dictionary for API responses"""
+        return {
+            'seq': self.seq,
+            'map_id': self.map_id,
+            'operation': self.operation,
+            'version': self.version,
+            'changed_at': self.changed_at.isoformat() if self.changed_at else None
+        }
+    
+    def __repr__(self):
+        return f"<CatalogueChange {self.seq} {self.operation} map:{self.map_id}>"
+    
+    @classmethod
+    def current_watermark(cls, session):
+        """Highest sequence number written so far (0 when empty)"""
+        return session.query(func.max(cls.seq)).scalar() or 0
+    
+    @classmethod
+    def changes_since(cls, session, since, limit=500):
+        """Entries after a watermark, in sequence order"""
+        return session.query(cls).filter(cls.seq > since).order_by(cls.seq).limit(limit).all()
+    
+    @classmethod
+    def compact(cls, session):
+        """Drop entries superseded by a later entry for the same map"""
+        # Sync responses only carry the latest state per map, so this is lossless
+        # and keeps the log bounded by catalogue size plus recent churn
+        newer = aliased(cls)
+        superseded = select(newer.seq).where(newer.map_id == cls.map_id, newer.seq > cls.seq).exists()
+        result = session.execute(delete(cls).where(superseded).execution_options(synchronize_session=False))
+        session.commit()
+        return result.rowcount
+
+def _append(connection, target, operation):
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': CHANGE_LOG_LOCK_KEY})
+    connection.execute(CatalogueChange.__table__.insert().values(
+        map_id=target.id,
+        operation=operation,
+        version=target.version
+    ))
+
+@event.listens_for(Map, 'after_insert')
+def _log_map_insert(mapper, connection, target):
+    _append(connection, target, 'insert')
+
+@event.listens_for(Map, 'after_update')
+def _log_map_update(mapper, connection, target):
+    state = inspect(target)
+    changed = {attr.key for attr in state.attrs if attr.history.has_changes()}
+    if not changed - COUNTER_COLUMNS:
+        return
+    
+    was_active = state.attrs.is_active.history.deleted
+    if 'is_active' in changed and not target.is_active and (not was_active or was_active[0]):
+        _append(connection, target, 'deactivate')
+    else:
+        _append(connection, target, 'update')
+
+@event.listens_for(Map, 'after_delete')
+def _log_map_delete(mapper, connection, target):
+    _append(connection, target, 'delete')
@@ -2,7 +2,7 @@
 Download tracking model for KingGroup backend
 Tracks user downloads and analytics
 """
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Float
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Float, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from config.database import Base
@@ -11,12 +11,20 @@ class Download(Base):
     """Download tracking model"""
     
     __tablename__ = 'downloads'
+    __table_args__ = (
+        # A user's history and today's count; also serves plain user_id lookups
+        Index('ix_downloads_user_date', 'user_id', 'download_date'),
+        # Date ranges in the admin statistics
+        Index('ix_downloads_date', 'download_date'),
+        # Per-country download breakdowns
+        Index('ix_downloads_country_date', 'country_id', 'download_date'),
+    )
     
     # Primary key
     id = Column(Integer, primary_key=True, index=True)
     
     # Foreign keys
-    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     map_id = Column(Integer, ForeignKey('maps.id'), nullable=False, index=True)
     
     # Download details
@@ -31,6 +39,7 @@ class Download(Base):
     
     # Location info (optional)
     country_code = Column(String(2))
+    country_id = Column(Integer)  # geo_countries id of the map's country
     city = Column(String(100))
     
     # Device info
@@ -0,0 +1,65 @@
+"""
+Geography dimension models for KingGroup backend
+Canonical countries, states and cities with integer keys, plus accepted spellings
+"""
+from sqlalchemy import Column, Integer, String, ForeignKey, UniqueConstraint
+from config.database import Base
+
+class Country(Base):
+    """Canonical country"""
+    
+    __tablename__ = 'geo_countries'
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String(50), unique=True, nullable=False)
+    
+    def __repr__(self):
+        return f"<Country {self.id} {self.name}>"
+
+class State(Base):
+    """Canonical state (or province) of a country"""
+    
+    __tablename__ = 'geo_states'
+    __table_args__ = (
+        UniqueConstraint('country_id', 'name', name='uq_geo_states_country_name'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    country_id = Column(Integer, ForeignKey('geo_countries.id'), nullable=False)
+    name = Column(String(100), nullable=False)
+    
+    def __repr__(self):
+        return f"<State {self.id} {self.name}>"
+
+class City(Base):
+    """Canonical city of a state (state_id 0 when the state is unknown)"""
+    
+    __tablename__ = 'geo_cities'
+    __table_args__ = (
+        UniqueConstraint('country_id', 'state_id', 'name', name='uq_geo_cities_country_state_name'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    country_id = Column(Integer, ForeignKey('geo_countries.id'), nullable=False)
+    state_id = Column(Integer, nullable=False, default=0)
+    name = Column(String(100), nullable=False)
+    
+    def __repr__(self):
+        return f"<City {self.id} {self.name}>"
+
+class GeoAlias(Base):
+    """Normalized spelling → canonical id, scoped to the parent region (0 for countries)"""
+    
+    __tablename__ = 'geo_aliases'
+    __table_args__ = (
+        UniqueConstraint('kind', 'parent_id', 'alias', name='uq_geo_aliases_kind_parent_alias'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(10), nullable=False)  # 'country', 'state', 'city'
+    parent_id = Column(Integer, nullable=False, default=0)
+    alias = Column(String(120), nullable=False)
+    target_id = Column(Integer, nullable=False)
+    
+    def __repr__(self):
+        return f"<GeoAlias {self.kind} {self.alias!r} → {self.target_id}>"
@@ -2,7 +2,7 @@
 Map model for KingGroup backend
 Handles offline maps and truck stop data
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Float
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Float, Index
 from sqlalchemy.sql import func
 from config.database import Base
 
@@ -10,6 +10,13 @@ class Map(Base):
     """Map model for offline maps management"""
     
     __tablename__ = 'maps'
+    __table_args__ = (
+        # get_maps: active maps (optionally of one type) by popularity
+        Index('ix_maps_active_type_downloads', 'is_active', 'map_type', 'download_count'),
+        Index('ix_maps_active_downloads', 'is_active', 'download_count'),
+        # get_map_categories: active maps per country, grouped on the integer key
+        Index('ix_maps_active_country', 'is_active', 'country_id'),
+    )
     
     # Primary key
     id = Column(Integer, primary_key=True, index=True)
@@ -20,6 +27,11 @@ class Map(Base):
     city = Column(String(100), index=True)
     region = Column(String(100))  # Additional region info
     
+    # Geography dimension keys (geo_countries / geo_states / geo_cities), kept in step with the names
+    country_id = Column(Integer)
+    state_id = Column(Integer, index=True)
+    city_id = Column(Integer, index=True)
+    
     # Map details
     map_type = Column(String(50), nullable=False, index=True)  # 'offline', 'truck_stops', 'routes'
     map_name = Column(String(200), nullable=False)
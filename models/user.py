@@ -23,22 +23,26 @@ class User(Base):
     # Profile fields
     country = Column(String(50))
     region = Column(String(100))
+    country_id = Column(Integer, index=True)  # geo_countries, resolved from country
+    state_id = Column(Integer)  # geo_states, resolved from region
     invite_code = Column(String(20), unique=True, index=True)
-    license_expires = Column(String(20))  # ISO date format
+    license_expires = Column(String(20))  # ISO date format (legacy, mirrors license_expires_at)
+    license_expires_at = Column(DateTime(timezone=True), index=True)  # None = no expiry
     
     # Status fields
     is_active = Column(Boolean, default=True, nullable=False)
     is_premium = Column(Boolean, default=False, nullable=False)
     
     # Timestamps
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     last_login = Column(DateTime(timezone=True))
+    last_seen_at = Column(DateTime(timezone=True), index=True)  # last authenticated request, written in batches
     
     # Additional fields for enhanced functionality
     profile_image = Column(String(255))  # URL to profile image
     phone = Column(String(20))
-    company = Column(String(100))
+    company = Column(String(100), index=True)  # fleet operator, target of bulk admin operations
     notes = Column(Text)  # Admin notes
     
     def __init__(self, username, email, password, **kwargs):
@@ -56,6 +60,16 @@ class User(Base):
         """Hash and set password"""
         self.password_hash = generate_password_hash(password)
     
+    def set_license_expiry(self, expires_at):
+        """Set the premium license expiry (None = never expires)"""
+        self.license_expires_at = expires_at
+        self.license_expires = self.legacy_expiry(expires_at)
+    
+    @staticmethod
+    def legacy_expiry(expires_at):
+        """The legacy license_expires string for an expiry datetime"""
+        return expires_at.strftime('%Y-%m-%dT%H:%M:%S') if expires_at else None
+    
     def check_password(self, password):
         """Check if provided password matches hash"""
         return check_password_hash(self.password_hash, password)
@@ -69,7 +83,7 @@ class User(Base):
             'country': self.country,
             'region': self.region,
             'invite_code': self.invite_code,
-            'license_expires': self.license_expires,
+            'license_expires': self.license_expires_at.isoformat() if self.license_expires_at else self.license_expires,
             'is_active': self.is_active,
             'is_premium': self.is_premium,
             'created_at': self.created_at.isoformat() if self.created_at else None,
@@ -82,6 +96,7 @@ class User(Base):
         
         if include_sensitive:
             user_dict['notes'] = self.notes
+            user_dict['last_seen_at'] = self.last_seen_at.isoformat() if self.last_seen_at else None
             
         return user_dict
     
@@ -0,0 +1,11 @@
+"""
+Monitoring package for KingGroup backend
+Request and database instrumentation exported in Prometheus format
+"""
+from .metrics import metrics_registry, init_metrics, instrument_engine, add_query_observer
+from .query_log import query_recorder, init_query_log, normalize_sql
+
+__all__ = [
+    'metrics_registry', 'init_metrics', 'instrument_engine', 'add_query_observer',
+    'query_recorder', 'init_query_log', 'normalize_sql'
+]
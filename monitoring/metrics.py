@@ -0,0 +1,294 @@
+"""
+Request and database metrics for KingGroup backend
+Per-thread aggregation, merged only when /metrics is scraped
+"""
+import time
+import weakref
+import threading
+from flask import g, request, Response
+from sqlalchemy import event
+
+# Latency buckets in seconds (Prometheus defaults plus a 30s tail)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Queries per request buckets
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+class _Histogram:
+    """Cumulative-on-export histogram owned by a single thread"""
+    
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+    
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+    
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.total += value
+        self.count += 1
+
+class _Shard:
+    """Metrics written by exactly one thread, so updates need no lock"""
+    
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+    
+    def inc(self, name, labels, amount=1):
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + amount
+    
+    def observe(self, name, labels, value, buckets):
+        key = (name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = _Histogram(buckets)
+        histogram.observe(value)
+    
+    def add(self, other):
+        """Fold another shard's totals into this one"""
+        for key, value in list(other.counters.items()):
+            self.counters[key] = self.counters.get(key, 0) + value
+        for key, histogram in list(other.histograms.items()):
+            merged = self.histograms.get(key)
+            if merged is None:
+                merged = self.histograms[key] = _Histogram(histogram.buckets)
+            for index, count in enumerate(list(histogram.counts)):
+                merged.counts[index] += count
+            merged.total += histogram.total
+            merged.count += histogram.count
+
+class _ShardOwner:
+    """Lives in the thread-local only, so it is collected when its thread exits"""
+    __slots__ = ('__weakref__',)
+
+class MetricsRegistry:
+    """Collects per-thread shards and renders them in Prometheus text format"""
+    
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._retired = _Shard()  # totals of threads that have exited
+        self._shards_lock = threading.RLock()  # re-entrant: a finalizer may run while it is held
+        self._help = {}
+        self._engines = {}
+    
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            # Only shard registration takes the lock, once per thread
+            with self._shards_lock:
+                self._shards.append(shard)
+            # Short-lived threads (timers, refreshes) must not leave a shard behind
+            owner = self._local.owner = _ShardOwner()
+            weakref.finalize(owner, self._retire, shard).atexit = False
+        return shard
+    
+    def _retire(self, shard):
+        """Fold an exited thread's shard into the retired totals"""
+        with self._shards_lock:
+            self._retired.add(shard)
+            self._shards.remove(shard)
+    
+    def describe(self, name, metric_type, help_text):
+        """Register HELP/TYPE metadata for a metric"""
+        self._help[name] = (metric_type, help_text)
+    
+    def inc(self, name, amount=1, **labels):
+        """Increment a counter"""
+        self._shard().inc(name, tuple(sorted(labels.items())), amount)
+    
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        """Record a histogram observation"""
+        self._shard().observe(name, tuple(sorted(labels.items())), value, buckets)
+    
+    def track_engine(self, name, engine):
+        """Export connection pool gauges for an engine"""
+        self._engines[name] = engine
+    
+    def _merge(self):
+        """Sum every thread's shard into one view"""
+        merged = _Shard()
+        with self._shards_lock:
+            shards = list(self._shards)
+            merged.add(self._retired)
+        
+        for shard in shards:
+            merged.add(shard)
+        return merged.counters, merged.histograms
+    
+    def _pool_gauges(self):
+        """Read current pool state from each tracked engine"""
+        gauges = {}
+        for name, engine in self._engines.items():
+            pool = engine.pool
+            for metric, method in (('size', 'size'), ('checked_in', 'checkedin'),
+                                   ('checked_out', 'checkedout'), ('overflow', 'overflow')):
+                reader = getattr(pool, method, None)
+                if reader is None:
+                    continue
+                try:
+                    gauges[(f'kinggroup_db_pool_{metric}', (('engine', name),))] = reader()
+                except Exception:
+                    continue
+        return gauges
+    
+    def render(self):
+        """Render all metrics in Prometheus text exposition format"""
+        counters, histograms = self._merge()
+        lines = []
+        
+        def header(name, default_type):
+            metric_type, help_text = self._help.get(name, (default_type, name))
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+        
+        for name in sorted({key[0] for key in counters}):
+            header(name, 'counter')
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+        
+        for name in sorted({key[0] for key in histograms}):
+            header(name, 'histogram')
+            for (metric, labels), histogram in sorted(histograms.items(), key=lambda item: item[0]):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", _format_bound(bound)),))} {cumulative}')
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {histogram.count}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {histogram.total:.6f}')
+                lines.append(f'{name}_count{_format_labels(labels)} {histogram.count}')
+        
+        gauges = self._pool_gauges()
+        for name in sorted({key[0] for key in gauges}):
+            header(name, 'gauge')
+            for (metric, labels), value in sorted(gauges.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+        
+        return '\n'.join(lines) + '\n'
+
+def _format_bound(bound):
+    return repr(float(bound))
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+# Global metrics registry
+metrics_registry = MetricsRegistry()
+
+metrics_registry.describe('kinggroup_http_requests_total', 'counter', 'HTTP requests by endpoint, method and status')
+metrics_registry.describe('kinggroup_http_request_duration_seconds', 'histogram', 'HTTP request latency by endpoint')
+metrics_registry.describe('kinggroup_db_queries_per_request', 'histogram', 'Database statements executed per request')
+metrics_registry.describe('kinggroup_db_time_seconds', 'histogram', 'Time spent in the database per request')
+metrics_registry.describe('kinggroup_db_queries_total', 'counter', 'Database statements executed by engine')
+metrics_registry.describe('kinggroup_db_pool_size', 'gauge', 'Configured connection pool size')
+metrics_registry.describe('kinggroup_db_pool_checked_in', 'gauge', 'Idle connections in the pool')
+metrics_registry.describe('kinggroup_db_pool_checked_out', 'gauge', 'Connections currently in use')
+metrics_registry.describe('kinggroup_db_pool_overflow', 'gauge', 'Connections opened beyond the pool size')
+
+# Per-thread state for the request currently being served
+_request_state = threading.local()
+
+# Callables notified after every statement: fn(conn, statement, parameters, executemany, elapsed, engine_name)
+_query_observers = []
+
+def add_query_observer(observer):
+    """Register a callable that receives every executed statement and its duration"""
+    if observer not in _query_observers:
+        _query_observers.append(observer)
+
+def current_request_stats():
+    """Get the (query_count, db_seconds) accumulator of the active request, if any"""
+    return getattr(_request_state, 'stats', None)
+
+class RequestStats:
+    """Database activity accumulated while serving one request"""
+    
+    __slots__ = ('query_count', 'db_seconds')
+    
+    def __init__(self):
+        self.query_count = 0
+        self.db_seconds = 0.0
+
+def instrument_engine(engine, name='primary'):
+    """Attach cursor execute hooks that feed per-request query count and DB time"""
+    if getattr(engine, '_kinggroup_instrumented', False):
+        return
+    engine._kinggroup_instrumented = True
+    metrics_registry.track_engine(name, engine)
+    
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('kinggroup_query_start', []).append(time.perf_counter())
+    
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['kinggroup_query_start'].pop()
+        elapsed = time.perf_counter() - started
+        
+        metrics_registry.inc('kinggroup_db_queries_total', engine=name)
+        stats = current_request_stats()
+        if stats is not None:
+            stats.query_count += 1
+            stats.db_seconds += elapsed
+        
+        for observer in _query_observers:
+            observer(conn, statement, parameters, executemany, elapsed, name)
+
+def init_metrics(app, engines=None):
+    """Install request timing middleware and the /metrics endpoint on an app"""
+    for name, engine in (engines or {}).items():
+        instrument_engine(engine, name)
+    
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+        _request_state.stats = RequestStats()
+    
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('metrics_started', None)
+        stats = current_request_stats()
+        _request_state.stats = None
+        if started is None:
+            return response
+        
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        elapsed = time.perf_counter() - started
+        
+        metrics_registry.inc('kinggroup_http_requests_total',
+                             endpoint=endpoint, method=request.method, status=str(response.status_code))
+        metrics_registry.observe('kinggroup_http_request_duration_seconds', elapsed,
+                                 endpoint=endpoint, method=request.method)
+        if stats is not None:
+            metrics_registry.observe('kinggroup_db_queries_per_request', stats.query_count,
+                                     buckets=QUERY_COUNT_BUCKETS, endpoint=endpoint)
+            metrics_registry.observe('kinggroup_db_time_seconds', stats.db_seconds, endpoint=endpoint)
+        return response
+    
+    @app.teardown_request
+    def clear_request_stats(error=None):
+        _request_state.stats = None
+    
+    def metrics():
+        """Prometheus scrape endpoint"""
+        return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+    
+    app.add_url_rule('/metrics', 'metrics', metrics, methods=['GET'])
+    return app
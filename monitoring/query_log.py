@@ -0,0 +1,197 @@
+"""
+Slow-query log and N+1 detector for KingGroup backend
+Groups statements by normalized shape within each request
+"""
+import os
+import re
+import time
+import logging
+import threading
+import functools
+from flask import request
+from .metrics import add_query_observer
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_NAMED_PARAM = re.compile(r"%\(\w+\)s|:\w+|\$\d+|%s")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+_POSTCOMPILE = re.compile(r"\(\s*__\[POSTCOMPILE_\w+\]\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+@functools.lru_cache(maxsize=2048)
+def normalize_sql(statement):
+    """Reduce a statement to its shape: literals and placeholders become ?, IN lists collapse"""
+    shape = _STRING_LITERAL.sub('?', statement)
+    shape = _NAMED_PARAM.sub('?', shape)
+    shape = _POSTCOMPILE.sub('(?)', shape)
+    shape = _NUMBER_LITERAL.sub('?', shape)
+    shape = _IN_LIST.sub('IN (...)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+def parameters_shape(parameters, executemany=False):
+    """Describe bound parameters by type only, never by value"""
+    if executemany and parameters:
+        return f"{len(parameters)} x {parameters_shape(parameters[0])}"
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{key}: {type(value).__name__}' for key, value in parameters.items()) + '}'
+    if isinstance(parameters, (list, tuple)):
+        return '(' + ', '.join(type(value).__name__ for value in parameters) + ')'
+    return type(parameters).__name__
+
+class QueryOffenders:
+    """Bounded store of the worst slow and repeated statement shapes"""
+    
+    def __init__(self, max_entries=200):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+    
+    def record(self, kind, endpoint, shape, duration_ms, occurrences=1, params_shape=None, plan=None):
+        """Add one slow statement or one N+1 burst to the aggregate"""
+        key = (kind, endpoint, shape)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self.max_entries:
+                    # Evict the cheapest entry to keep memory bounded
+                    cheapest = min(self._entries, key=lambda k: self._entries[k]['total_ms'])
+                    del self._entries[cheapest]
+                entry = self._entries[key] = {
+                    'kind': kind,
+                    'endpoint': endpoint,
+                    'sql': shape,
+                    'hits': 0,
+                    'occurrences': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'params_shape': params_shape,
+                    'plan': plan,
+                    'last_seen': None
+                }
+            
+            entry['hits'] += 1
+            entry['occurrences'] += occurrences
+            entry['total_ms'] += duration_ms
+            entry['max_ms'] = max(entry['max_ms'], duration_ms)
+            entry['last_seen'] = time.time()
+            if plan:
+                entry['plan'] = plan
+    
+    def worst(self, kind=None, limit=20):
+        """Get the offenders with the highest total time"""
+        with self._lock:
+            entries = [dict(entry) for entry in self._entries.values() if kind in (None, entry['kind'])]
+        
+        entries.sort(key=lambda entry: entry['total_ms'], reverse=True)
+        for entry in entries:
+            entry['total_ms'] = round(entry['total_ms'], 3)
+            entry['max_ms'] = round(entry['max_ms'], 3)
+        return entries[:limit]
+    
+    def reset(self):
+        """Drop all collected offenders"""
+        with self._lock:
+            self._entries.clear()
+
+class QueryRecorder:
+    """Per-request statement recorder feeding the slow log and the N+1 detector"""
+    
+    def __init__(self, slow_ms=None, explain=None, n_plus_one_threshold=None):
+        self.slow_ms = slow_ms if slow_ms is not None else float(os.environ.get('SLOW_QUERY_MS', 200))
+        self.explain = explain if explain is not None else os.environ.get('SLOW_QUERY_EXPLAIN') == 'true'
+        self.n_plus_one_threshold = n_plus_one_threshold or int(os.environ.get('N_PLUS_ONE_THRESHOLD', 5))
+        self.offenders = QueryOffenders()
+        self._local = threading.local()
+    
+    def begin(self):
+        """Start collecting statements for the current request"""
+        self._local.shapes = {}
+    
+    def observe(self, conn, statement, parameters, executemany, elapsed, engine_name):
+        """Query observer: aggregate by shape and log slow statements"""
+        if conn.info.get('kinggroup_explaining'):
+            return
+        
+        shape = normalize_sql(statement)
+        duration_ms = elapsed * 1000
+        
+        shapes = getattr(self._local, 'shapes', None)
+        if shapes is not None:
+            entry = shapes.get(shape)
+            if entry is None:
+                shapes[shape] = [1, duration_ms, parameters_shape(parameters, executemany)]
+            else:
+                entry[0] += 1
+                entry[1] += duration_ms
+        
+        if duration_ms >= self.slow_ms:
+            params_shape = parameters_shape(parameters, executemany)
+            plan = self._explain(conn, statement, parameters) if self.explain and not executemany else None
+            endpoint = self._endpoint()
+            
+            logger.warning(
+                f"🐢 Slow query {duration_ms:.1f}ms on {engine_name} [{endpoint}]: {shape} params={params_shape}"
+                + (f"\n{plan}" if plan else '')
+            )
+            self.offenders.record('slow', endpoint, shape, duration_ms, params_shape=params_shape, plan=plan)
+    
+    def finish(self):
+        """Close the request: report statement shapes repeated past the N+1 threshold"""
+        shapes = getattr(self._local, 'shapes', None)
+        self._local.shapes = None
+        if not shapes:
+            return
+        
+        endpoint = self._endpoint()
+        for shape, (count, total_ms, params_shape) in shapes.items():
+            if count < self.n_plus_one_threshold:
+                continue
+            logger.warning(f"🔁 Possible N+1 on [{endpoint}]: {count}x {shape} ({total_ms:.1f}ms total)")
+            self.offenders.record('n_plus_one', endpoint, shape, total_ms,
+                                  occurrences=count, params_shape=params_shape)
+    
+    @staticmethod
+    def _endpoint():
+        try:
+            return request.url_rule.rule if request.url_rule else request.path
+        except RuntimeError:
+            return 'background'
+    
+    @staticmethod
+    def _explain(conn, statement, parameters):
+        """Run EXPLAIN for a SELECT on the same DBAPI connection, bypassing events"""
+        if not statement.lstrip().upper().startswith('SELECT'):
+            return None
+        
+        prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+        conn.info['kinggroup_explaining'] = True
+        try:
+            cursor = conn.connection.cursor()
+            try:
+                cursor.execute(prefix + statement, parameters)
+                return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+            finally:
+                cursor.close()
+        except Exception as e:
+            return f"EXPLAIN failed: {str(e)}"
+        finally:
+            conn.info['kinggroup_explaining'] = False
+
+# Global query recorder
+query_recorder = QueryRecorder()
+
+def init_query_log(app):
+    """Record statements per request on an app whose engines are instrumented"""
+    add_query_observer(query_recorder.observe)
+    
+    @app.before_request
+    def begin_query_log():
+        query_recorder.begin()
+    
+    @app.teardown_request
+    def finish_query_log(error=None):
+        query_recorder.finish()
+    
+    return app
@@ -2,14 +2,21 @@
 Admin routes for KingGroup backend
 Handles administrative functions and statistics
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 import datetime
 from sqlalchemy import func
 from models.user import User
 from models.map import Map
 from models.download import Download
+from models.catalogue_change import CatalogueChange
+from models.geography import Country
+from services.partitions import download_partitions
+from services.sketches import download_sketches, DAY_FORMAT, HOUR_FORMAT
+from services.catalogue import catalogue_cache
+from services.bulk_users import bulk_update_statement, apply_bulk_result, stream_bulk_result, parse_license_expiry
 from config.database import db_config
 from auth.jwt_auth import admin_required
+from monitoring.query_log import query_recorder
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
@@ -18,7 +25,12 @@ admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 def get_stats(current_user_id):
     """Get comprehensive system statistics"""
     try:
-        session = db_config.get_session()
+        session = db_config.get_read_session(current_user_id)
+        
+        # Day bounds as ranges so the date indexes apply (func.date() defeats them);
+        # UTC like the stored timestamps and the rolling windows below
+        today_start = datetime.datetime.combine(datetime.datetime.utcnow().date(), datetime.time.min)
+        tomorrow_start = today_start + datetime.timedelta(days=1)
         
         # User statistics
         user_stats = {
@@ -26,13 +38,35 @@ def get_stats(current_user_id):
             'active': session.query(User).filter(User.is_active == True).count(),
             'premium': session.query(User).filter(User.is_premium == True).count(),
             'new_today': session.query(User).filter(
-                func.date(User.created_at) == datetime.date.today()
+                User.created_at >= today_start, User.created_at < tomorrow_start
             ).count(),
             'new_this_week': session.query(User).filter(
                 User.created_at >= datetime.datetime.now() - datetime.timedelta(days=7)
+            ).count(),
+            # Active users by last authenticated request (flushed in batches, up to a minute behind)
+            'seen_today': session.query(User).filter(User.last_seen_at >= today_start).count(),
+            'seen_this_week': session.query(User).filter(
+                User.last_seen_at >= datetime.datetime.utcnow() - datetime.timedelta(days=7)
+            ).count(),
+            'seen_this_month': session.query(User).filter(
+                User.last_seen_at >= datetime.datetime.utcnow() - datetime.timedelta(days=30)
             ).count()
         }
         
+        # Users per country, grouped on the integer key and named afterwards
+        user_countries = session.query(
+            User.country_id,
+            func.count(User.id).label('count')
+        ).filter(User.country_id != None).group_by(User.country_id).order_by(
+            func.count(User.id).desc()
+        ).limit(10).subquery()
+        user_stats['by_country'] = [
+            {'country': row.country, 'count': row.count}
+            for row in session.query(Country.name.label('country'), user_countries.c.count).join(
+                user_countries, Country.id == user_countries.c.country_id
+            ).order_by(user_countries.c.count.desc())
+        ]
+        
         # Map statistics
         map_stats = {
             'total': session.query(Map).count(),
@@ -54,7 +88,7 @@ def get_stats(current_user_id):
         download_stats = {
             'total': session.query(Download).count(),
             'today': session.query(Download).filter(
-                func.date(Download.download_date) == datetime.date.today()
+                Download.download_date >= today_start, Download.download_date < tomorrow_start
             ).count(),
             'this_week': session.query(Download).filter(
                 Download.download_date >= datetime.datetime.now() - datetime.timedelta(days=7)
@@ -109,7 +143,7 @@ def get_stats(current_user_id):
 def get_users(current_user_id):
     """Get users list with filtering and pagination"""
     try:
-        session = db_config.get_session()
+        session = db_config.get_read_session(current_user_id)
         
         # Filters
         active_only = request.args.get('active_only') == 'true'
@@ -172,6 +206,7 @@ def toggle_user_status(current_user_id, user_id):
         
         user.is_active = not user.is_active
         session.commit()
+        db_config.mark_write(current_user_id)
         
         user_data = user.to_dict(include_sensitive=True)
         session.close()
@@ -198,6 +233,7 @@ def toggle_user_premium(current_user_id, user_id):
         
         user.is_premium = not user.is_premium
         session.commit()
+        db_config.mark_write(current_user_id)
         
         user_data = user.to_dict(include_sensitive=True)
         session.close()
@@ -210,3 +246,220 @@ def toggle_user_premium(current_user_id, user_id):
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
+
+@admin_bp.route('/users/<int:user_id>/license', methods=['PUT'])
+@admin_required
+def set_user_license(current_user_id, user_id):
+    """Set premium license expiry ({"expires_at": ISO date | null} or {"days": n})"""
+    try:
+        data = request.get_json() or {}
+        expires_at = parse_license_expiry(data)
+        
+        session = db_config.get_session()
+        user = session.query(User).filter(User.id == user_id).first()
+        if not user:
+            session.close()
+            return jsonify({'message': 'Usuário não encontrado'}), 404
+        
+        user.is_premium = True
+        user.set_license_expiry(expires_at)
+        session.commit()
+        db_config.mark_write(current_user_id)
+        
+        result = user.to_dict()
+        session.close()
+        
+        return jsonify({
+            'message': 'Licença atualizada com sucesso',
+            'user': result
+        })
+    
+    except (TypeError, ValueError):
+        return jsonify({'message': 'Data de expiração inválida'}), 400
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@admin_bp.route('/users/bulk', methods=['POST'])
+@admin_required
+def bulk_update_users(current_user_id):
+    """Apply one action to many users in a single UPDATE, streaming back the affected ids"""
+    # {"action": "grant_premium", "user_ids": [...]} or {"action": ..., "filter": {"company": ...}};
+    # set_license also takes "days" or "expires_at" like PUT /users/<id>/license
+    try:
+        data = request.get_json() or {}
+        action = data.get('action')
+        try:
+            expires_at = parse_license_expiry(data) if action == 'set_license' else None
+        except (TypeError, ValueError):
+            return jsonify({'message': 'Data de expiração inválida'}), 400
+        try:
+            statement = bulk_update_statement(action, data.get('user_ids'), data.get('filter'), expires_at)
+        except (TypeError, ValueError) as e:
+            return jsonify({'message': str(e)}), 400
+        
+        session = db_config.get_session()
+        try:
+            rows = session.execute(statement).all()
+            session.commit()
+        finally:
+            session.close()
+        db_config.mark_write(current_user_id)
+        
+        user_ids = apply_bulk_result(action, rows, current_user_id)
+        return Response(stream_bulk_result(action, user_ids), mimetype='application/json')
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@admin_bp.route('/queries', methods=['GET'])
+@admin_required
+def get_query_offenders(current_user_id):
+    """Get the worst slow and N+1 statement shapes seen by this instance"""
+    try:
+        kind = request.args.get('kind')  # 'slow' or 'n_plus_one'
+        limit = min(int(request.args.get('limit', 20)), 200)
+        
+        return jsonify({
+            'offenders': query_recorder.offenders.worst(kind=kind, limit=limit),
+            'config': {
+                'slow_ms': query_recorder.slow_ms,
+                'explain': query_recorder.explain,
+                'n_plus_one_threshold': query_recorder.n_plus_one_threshold
+            },
+            'generated_at': datetime.datetime.utcnow().isoformat()
+        })
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@admin_bp.route('/queries/reset', methods=['POST'])
+@admin_required
+def reset_query_offenders(current_user_id):
+    """Clear the collected query offenders"""
+    query_recorder.offenders.reset()
+    return jsonify({'message': 'Estatísticas de consultas reiniciadas'})
+
+@admin_bp.route('/catalogue/compact', methods=['POST'])
+@admin_required
+def compact_catalogue_changes(current_user_id):
+    """Drop change log entries superseded by a later change to the same map"""
+    try:
+        session = db_config.get_session()
+        removed = CatalogueChange.compact(session)
+        watermark = CatalogueChange.current_watermark(session)
+        session.close()
+        
+        return jsonify({
+            'message': 'Log de alterações compactado',
+            'removed': removed,
+            'watermark': watermark
+        })
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@admin_bp.route('/downloads/partitions', methods=['GET'])
+@admin_required
+def get_download_partitions(current_user_id):
+    """Hot, detached and archived months of the downloads table"""
+    try:
+        return jsonify(download_partitions.status())
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@admin_bp.route('/downloads/retention', methods=['POST'])
+@admin_required
+def run_download_retention(current_user_id):
+    """Roll old months out of the hot downloads table and archive those past retention"""
+    try:
+        result = download_partitions.run_retention()
+        
+        return jsonify({
+            'message': 'Retenção de downloads executada',
+            'rolled': result['rolled'],
+            'archived': result['archived']
+        })
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@admin_bp.route('/analytics/top-maps', methods=['GET'])
+@admin_required
+def get_top_maps_sketch(current_user_id):
+    """Most downloaded maps of an hour or day, from the Space-Saving sketches"""
+    try:
+        window = request.args.get('window', 'hour')
+        if window not in ('hour', 'day'):
+            return jsonify({'message': 'Janela inválida (use hour ou day)'}), 400
+        period_format = HOUR_FORMAT if window == 'hour' else DAY_FORMAT
+        period = request.args.get('at') or datetime.datetime.utcnow().strftime(period_format)
+        try:
+            datetime.datetime.strptime(period, period_format)
+        except ValueError:
+            return jsonify({'message': f'Período inválido (formato {period_format})'}), 400
+        
+        country = request.args.get('country', '')
+        if country and window == 'hour':
+            return jsonify({'message': 'Filtro por país disponível apenas para janela diária'}), 400
+        limit = min(request.args.get('limit', 20, type=int), download_sketches.top_k)
+        
+        result = download_sketches.top_maps(period, country, limit)
+        by_id = catalogue_cache.snapshot().by_id
+        for item in result['items']:
+            map_data = by_id.get(item['map_id'])
+            item['map_name'] = map_data['map_name'] if map_data else None
+        
+        return jsonify({
+            'window': window,
+            'period': period,
+            'country': country or None,
+            'capacity': download_sketches.top_k,
+            **result
+        })
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@admin_bp.route('/analytics/distinct-users', methods=['GET'])
+@admin_required
+def get_distinct_users_sketch(current_user_id):
+    """Estimated distinct downloading users of a day, from the HyperLogLog sketches"""
+    try:
+        day = request.args.get('day') or datetime.datetime.utcnow().strftime(DAY_FORMAT)
+        try:
+            datetime.datetime.strptime(day, DAY_FORMAT)
+        except ValueError:
+            return jsonify({'message': f'Dia inválido (formato {DAY_FORMAT})'}), 400
+        map_id = request.args.get('map_id', type=int)
+        country = request.args.get('country')
+        
+        return jsonify({
+            'day': day,
+            'map_id': map_id,
+            'country': country if map_id is None else None,
+            **download_sketches.distinct_users(day, map_id, country)
+        })
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@admin_bp.route('/analytics/rebuild', methods=['POST'])
+@admin_required
+def rebuild_analytics_sketches(current_user_id):
+    """Recompute one day's sketches from the downloads table"""
+    try:
+        data = request.get_json() or {}
+        day = data.get('day')
+        try:
+            datetime.datetime.strptime(day or '', DAY_FORMAT)
+        except ValueError:
+            return jsonify({'message': f'Dia inválido (formato {DAY_FORMAT})'}), 400
+        
+        download_sketches.flush()
+        result = download_sketches.rebuild(day)
+        
+        return jsonify({'message': 'Sketches reconstruídos', **result})
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
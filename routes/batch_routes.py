@@ -0,0 +1,128 @@
+"""
+Batch routes for KingGroup backend
+Runs several API calls in-process so mobile clients need a single round-trip
+"""
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, request, jsonify, current_app
+from werkzeug.test import EnvironBuilder
+from auth.jwt_auth import JWTAuth, PREAUTHENTICATED_USER_KEY
+
+batch_bp = Blueprint('batch', __name__, url_prefix='/api')
+
+MAX_SUB_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS', 20))
+
+# Shared pool for parallel sub-requests (bounded so one batch cannot starve the worker)
+_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('BATCH_MAX_WORKERS', 4)),
+                               thread_name_prefix='batch')
+
+def _run_sub_request(app, spec, authorization, user_id, remote_addr):
+    """Dispatch one sub-request through the app's URL map and error handlers"""
+    headers = {'Authorization': authorization} if authorization else {}
+    environ_base = {'REMOTE_ADDR': remote_addr}
+    if user_id is not None:
+        environ_base[PREAUTHENTICATED_USER_KEY] = user_id
+    
+    builder = EnvironBuilder(
+        path=spec['path'],
+        method=spec['method'],
+        headers=dict(headers, **{'User-Agent': spec.get('user_agent', '')}),
+        json=spec.get('body'),
+        environ_base=environ_base
+    )
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+    
+    # Dispatch without before/after_request hooks: the outer /api/batch request
+    # is the one being timed and recorded. Each sub-request gets its own app
+    # context (and g), even when it runs on the outer request's thread.
+    with app.app_context(), app.request_context(environ):
+        try:
+            rv = app.dispatch_request()
+        except Exception as e:
+            rv = app.handle_user_exception(e)
+        response = app.make_response(rv)
+    
+    body = response.get_data(as_text=True)
+    try:
+        body = json.loads(body) if response.is_json else body
+    except ValueError:
+        pass
+    
+    return {'id': spec.get('id'), 'status': response.status_code, 'body': body}
+
+def _validate(sub_requests):
+    """Normalize sub-request specs, returning (specs, error message)"""
+    if not isinstance(sub_requests, list) or not sub_requests:
+        return None, 'Lista de requisições é obrigatória'
+    if len(sub_requests) > MAX_SUB_REQUESTS:
+        return None, f'Máximo de {MAX_SUB_REQUESTS} requisições por lote'
+    
+    specs = []
+    for index, sub_request in enumerate(sub_requests):
+        if not isinstance(sub_request, dict) or not str(sub_request.get('path', '')).startswith('/api/'):
+            return None, f'Requisição {index} inválida: path deve começar com /api/'
+        if sub_request['path'].split('?')[0].rstrip('/') == '/api/batch':
+            return None, 'Lotes aninhados não são permitidos'
+        
+        specs.append({
+            'id': sub_request.get('id', index),
+            'method': str(sub_request.get('method', 'GET')).upper(),
+            'path': sub_request['path'],
+            'body': sub_request.get('body')
+        })
+    return specs, None
+
+@batch_bp.route('/batch', methods=['POST'])
+def run_batch():
+    """Run sub-requests: consecutive GETs in parallel, writes in order"""
+    try:
+        data = request.get_json(silent=True) or {}
+        specs, error = _validate(data.get('requests'))
+        if error:
+            return jsonify({'message': error}), 400
+        
+        # One authentication for the whole batch
+        authorization = request.headers.get('Authorization')
+        user_id = None
+        if authorization:
+            try:
+                user_id = JWTAuth.get_current_user(authorization).id
+            except Exception as e:
+                return jsonify({'message': f'Token inválido: {str(e)}'}), 401
+        
+        app = current_app._get_current_object()
+        remote_addr = request.remote_addr
+        for spec in specs:
+            spec['user_agent'] = request.headers.get('User-Agent', '')
+        
+        results = []
+        pending_reads = []
+        
+        def flush_reads():
+            if len(pending_reads) == 1:
+                results.append(_run_sub_request(app, pending_reads[0], authorization, user_id, remote_addr))
+            elif pending_reads:
+                futures = [
+                    _executor.submit(_run_sub_request, app, spec, authorization, user_id, remote_addr)
+                    for spec in pending_reads
+                ]
+                results.extend(future.result() for future in futures)
+            pending_reads.clear()
+        
+        for spec in specs:
+            if spec['method'] == 'GET':
+                pending_reads.append(spec)
+                continue
+            # A write is a barrier: earlier reads finish first, later reads see it
+            flush_reads()
+            results.append(_run_sub_request(app, spec, authorization, user_id, remote_addr))
+        flush_reads()
+        
+        return jsonify({'responses': results})
+        
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
@@ -2,12 +2,23 @@
 Map routes for KingGroup backend
 Handles offline maps listing, filtering, and downloads
 """
-from flask import Blueprint, request, jsonify
-from models.user import User
+from flask import Blueprint, Response, request, jsonify, send_file, url_for
+from sqlalchemy import func
 from models.map import Map
 from models.download import Download
+from models.catalogue_change import CatalogueChange
+from models.geography import Country
 from config.database import db_config
 from auth.jwt_auth import token_required, premium_required
+from services.catalogue import catalogue_cache
+from services.catalogue_artifact import catalogue_artifacts
+from services.entitlements import entitlements
+from services.trending import trending
+from services.corridor import corridor_index, decode_polyline
+from services.region_tree import region_tree
+from services.suggest import suggestions, SUGGESTION_KINDS
+from middleware.compression import cache_compressed
+from middleware.idempotency import idempotent
 
 map_bp = Blueprint('map', __name__, url_prefix='/api/maps')
 
@@ -15,20 +26,50 @@ map_bp = Blueprint('map', __name__, url_prefix='/api/maps')
 def get_maps():
     """List available maps with filtering"""
     try:
-        session = db_config.get_session()
-        
         # Optional filters
         country = request.args.get('country')
         state = request.args.get('state')
         map_type = request.args.get('type')
         premium_only = request.args.get('premium') == 'true'
         search = request.args.get('search')
+        sort = request.args.get('sort', 'downloads')
         
         # Pagination
         page = int(request.args.get('page', 1))
         per_page = min(int(request.args.get('per_page', 20)), 100)  # Max 100 per page
         offset = (page - 1) * per_page
         
+        if sort == 'trending':
+            # Ranked in memory: trending index + catalogue cache, no database access
+            map_list, total = _trending_maps(country, state, map_type, premium_only, search, offset, per_page)
+        else:
+            map_list, total = _maps_by_downloads(country, state, map_type, premium_only, search, offset, per_page)
+        
+        return jsonify({
+            'maps': map_list,
+            'pagination': {
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': (total + per_page - 1) // per_page
+            },
+            'filters': {
+                'country': country,
+                'state': state,
+                'type': map_type,
+                'premium_only': premium_only,
+                'search': search,
+                'sort': sort
+            }
+        })
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+def _maps_by_downloads(country, state, map_type, premium_only, search, offset, per_page):
+    """Filtered page of active maps by lifetime downloads, with the total count"""
+    session = db_config.get_read_session()
+    try:
         # Build query
         query = session.query(Map).filter(Map.is_active == True)
         
@@ -52,33 +93,55 @@ def get_maps():
         # Apply pagination and ordering
         maps = query.order_by(Map.download_count.desc()).offset(offset).limit(per_page).all()
         
+        return [map_obj.to_dict() for map_obj in maps], total
+    finally:
         session.close()
-        
-        return jsonify({
-            'maps': [map_obj.to_dict() for map_obj in maps],
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total,
-                'pages': (total + per_page - 1) // per_page
-            },
-            'filters': {
-                'country': country,
-                'state': state,
-                'type': map_type,
-                'premium_only': premium_only,
-                'search': search
-            }
-        })
-        
-    except Exception as e:
-        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+def _trending_maps(country, state, map_type, premium_only, search, offset, per_page):
+    """Filtered page of active maps by trending score, with the total count"""
+    snapshot = catalogue_cache.snapshot()
+    country, state, search = [value.lower() if value else None for value in (country, state, search)]
+    
+    if not (country or state or map_type or premium_only or search):
+        # Unfiltered pages within the global top-K need no sort
+        head = [(snapshot.by_id[map_id], score) for map_id, score in trending.top() if map_id in snapshot.by_id]
+        if offset + per_page <= len(head):
+            page = head[offset:offset + per_page]
+            return [dict(map_data, trending_score=round(score, 3)) for map_data, score in page], len(snapshot)
+    
+    matching = []
+    for map_data in snapshot.by_id.values():
+        if country and country not in (map_data['country'] or '').lower():
+            continue
+        if state and state not in (map_data['state'] or '').lower():
+            continue
+        if map_type and map_data['map_type'] != map_type:
+            continue
+        if premium_only and not map_data['is_premium']:
+            continue
+        if search and search not in (map_data['map_name'] or '').lower() \
+                and search not in (map_data['description'] or '').lower():
+            continue
+        matching.append(map_data)
+    
+    # Maps without recent downloads score 0 and keep the lifetime-downloads order
+    scores = trending.scores()
+    matching.sort(key=lambda map_data: (-scores.get(map_data['id'], 0.0), -(map_data['download_count'] or 0)))
+    page = matching[offset:offset + per_page]
+    return [dict(map_data, trending_score=round(scores.get(map_data['id'], 0.0), 3)) for map_data in page], len(matching)
 
 @map_bp.route('/<int:map_id>', methods=['GET'])
 def get_map_details(map_id):
     """Get detailed information about a specific map"""
     try:
-        session = db_config.get_session()
+        # Served from the shared in-memory catalogue when possible
+        snapshot = catalogue_cache.snapshot()
+        map_data = snapshot.by_id.get(map_id)
+        if map_data:
+            return cache_compressed(jsonify({'map': map_data}), 'catalogue', snapshot.version, request.full_path)
+        
+        # Not cached yet (e.g. created after the last refresh)
+        session = db_config.get_read_session()
         
         map_obj = session.query(Map).filter(Map.id == map_id, Map.is_active == True).first()
         
@@ -90,11 +153,272 @@ def get_map_details(map_id):
         session.close()
         
         return jsonify({'map': map_data})
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+MAX_BATCH_IDS = 1000
+
+def _parse_map_ids():
+    """Map ids from ?ids=1,2,3 or {"ids": [...]}, as (ids, None) or (None, error response)"""
+    if request.method == 'POST':
+        raw_ids = (request.get_json(silent=True) or {}).get('ids')
+    else:
+        raw_ids = [value for value in request.args.get('ids', '').split(',') if value.strip()]
+    
+    if not isinstance(raw_ids, list) or not raw_ids:
+        return None, (jsonify({'message': 'Lista de ids é obrigatória'}), 400)
+    if len(raw_ids) > MAX_BATCH_IDS:
+        return None, (jsonify({'message': f'Máximo de {MAX_BATCH_IDS} ids por requisição'}), 400)
+    
+    try:
+        # Keep request order, drop duplicates
+        return list(dict.fromkeys(int(value) for value in raw_ids)), None
+    except (TypeError, ValueError):
+        return None, (jsonify({'message': 'Ids devem ser números inteiros'}), 400)
+
+@map_bp.route('/batch', methods=['GET', 'POST'])
+def get_maps_batch():
+    """Get many maps by id from the in-memory catalogue (?ids=1,2,3 or {"ids": [...]})"""
+    try:
+        map_ids, error = _parse_map_ids()
+        if error:
+            return error
+        
+        snapshot = catalogue_cache.snapshot()
+        maps, inactive, missing = catalogue_cache.get_many(map_ids, snapshot)
+        
+        response = jsonify({
+            'maps': maps,
+            'inactive': inactive,
+            'missing': missing,
+            'catalogue_version': snapshot.version
+        })
+        if request.method == 'GET':
+            cache_compressed(response, 'catalogue', snapshot.version, request.full_path)
+        return response
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@map_bp.route('/check-updates', methods=['POST'])
+def check_map_updates():
+    """Which installed maps are up to date, outdated or removed ({"maps": [{id, version, file_hash}]})"""
+    try:
+        data = request.get_json(silent=True)
+        entries = data.get('maps') if isinstance(data, dict) else data
+        if not isinstance(entries, list) or not entries:
+            return jsonify({'message': 'Lista de mapas instalados é obrigatória'}), 400
+        if len(entries) > MAX_BATCH_IDS:
+            return jsonify({'message': f'Máximo de {MAX_BATCH_IDS} mapas por requisição'}), 400
+        
+        installed = []
+        for entry in entries:
+            if not isinstance(entry, dict):
+                return jsonify({'message': 'Cada mapa deve ser um objeto com id, version e file_hash'}), 400
+            try:
+                map_id = int(entry.get('id'))
+            except (TypeError, ValueError):
+                return jsonify({'message': 'Ids devem ser números inteiros'}), 400
+            installed.append((map_id, entry.get('version'), entry.get('file_hash')))
+        
+        snapshot = catalogue_cache.snapshot()
+        results = catalogue_cache.check_updates(installed, snapshot)
+        summary = {'up_to_date': 0, 'outdated': 0, 'removed': 0}
+        for result in results:
+            summary[result['status']] += 1
         
+        return jsonify({
+            'maps': results,
+            'summary': summary,
+            'catalogue_version': snapshot.version
+        })
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+MAX_ROUTE_POINTS = 50000
+MAX_BUFFER_KM = 50
+
+@map_bp.route('/along-route', methods=['POST'])
+def get_maps_along_route():
+    """Maps whose area lies within buffer_km of an encoded route polyline, in route order"""
+    try:
+        data = request.get_json(silent=True) or {}
+        encoded = data.get('polyline')
+        if not isinstance(encoded, str) or not encoded:
+            return jsonify({'message': 'Polyline codificada é obrigatória'}), 400
+        
+        try:
+            buffer_km = float(data.get('buffer_km', 5))
+            precision = int(data.get('precision', 5))
+        except (TypeError, ValueError):
+            return jsonify({'message': 'buffer_km e precision devem ser numéricos'}), 400
+        if not 0 <= buffer_km <= MAX_BUFFER_KM:
+            return jsonify({'message': f'buffer_km deve estar entre 0 e {MAX_BUFFER_KM}'}), 400
+        if precision not in (5, 6):
+            return jsonify({'message': 'precision deve ser 5 ou 6'}), 400
+        
+        try:
+            points = decode_polyline(encoded, precision)
+        except ValueError:
+            return jsonify({'message': 'Polyline inválida'}), 400
+        if len(points) < 2:
+            return jsonify({'message': 'A rota precisa de pelo menos 2 pontos'}), 400
+        if len(points) > MAX_ROUTE_POINTS:
+            return jsonify({'message': f'Máximo de {MAX_ROUTE_POINTS} pontos por rota'}), 400
+        
+        map_types = data.get('map_types', ['truck_stops'])
+        if isinstance(map_types, str):
+            map_types = [map_types]
+        
+        matches, route_km = corridor_index.query(points, buffer_km, set(map_types or ()))
+        by_id = catalogue_cache.snapshot().by_id
+        maps = []
+        for map_id, at_km, distance in matches:
+            map_data = dict(by_id[map_id])
+            map_data['route_km'] = round(at_km, 2)
+            map_data['distance_km'] = round(distance, 3)
+            maps.append(map_data)
+        
+        return jsonify({
+            'maps': maps,
+            'total': len(maps),
+            'route_km': round(route_km, 2),
+            'buffer_km': buffer_km,
+            'points': len(points)
+        })
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+SNAPSHOT_MAX_AGE = 365 * 24 * 3600
+
+@map_bp.route('/snapshot', methods=['GET'])
+def get_catalogue_snapshot():
+    """Get the version and immutable URL of the full-catalogue snapshot"""
+    try:
+        snapshot = catalogue_cache.snapshot()
+        artifact = catalogue_artifacts.current()
+        if artifact is None:
+            # First request in this worker, before the background build finished
+            artifact = catalogue_artifacts.build(snapshot)
+        
+        pointer = artifact.to_dict()
+        pointer['url'] = url_for('map.get_catalogue_snapshot_file', name=artifact.name)
+        
+        response = jsonify(pointer)
+        response.set_etag(artifact.digest)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@map_bp.route('/snapshot/<name>', methods=['GET'])
+def get_catalogue_snapshot_file(name):
+    """Serve a precompressed snapshot artifact (content-addressed, never changes)"""
+    try:
+        found = catalogue_artifacts.open(name, request.accept_encodings)
+        if found is None:
+            return jsonify({'message': 'Snapshot não encontrado'}), 404
+        
+        path, encoding = found
+        if encoding is None:
+            # The stored bytes themselves, so the body matches the hash in the name
+            response = Response(catalogue_artifacts.read_identity(path), mimetype='application/json')
+            response.set_etag(f'{name}-identity')
+            response = response.make_conditional(request)
+        else:
+            response = send_file(path, mimetype='application/json', etag=f'{name}-{encoding}',
+                                 max_age=SNAPSHOT_MAX_AGE, conditional=True)
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = f'public, max-age={SNAPSHOT_MAX_AGE}, immutable'
+        return response
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@map_bp.route('/access', methods=['GET', 'POST'])
+@token_required
+def get_maps_access(current_user_id):
+    """Which of these maps the user can download (?ids=1,2,3 or {"ids": [...]})"""
+    try:
+        map_ids, error = _parse_map_ids()
+        if error:
+            return error
+        
+        downloadable, needs_premium, unavailable = entitlements.classify(current_user_id, map_ids)
+        expires_at = entitlements.expires_at(current_user_id)
+        
+        return jsonify({
+            'downloadable': downloadable,
+            'premium_required': needs_premium,
+            'unavailable': unavailable,
+            'is_premium': entitlements.is_premium(current_user_id),
+            'license_expires_at': expires_at.isoformat() if expires_at else None
+        })
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@map_bp.route('/changes', methods=['GET'])
+def get_catalogue_changes():
+    """Get catalogue changes after a watermark (delta sync)"""
+    try:
+        since = int(request.args.get('since', 0))
+        limit = min(int(request.args.get('limit', 500)), 1000)
+        
+        session = db_config.get_read_session()
+        current = CatalogueChange.current_watermark(session)
+        
+        # No watermark yet, or one from a different database: client must resync fully
+        if since <= 0 or since > current:
+            session.close()
+            return jsonify({'full_resync': True, 'watermark': current, 'changes': [], 'has_more': False})
+        
+        entries = CatalogueChange.changes_since(session, since, limit)
+        
+        # Only the latest entry per map matters to the client
+        latest = {}
+        for entry in entries:
+            latest[entry.map_id] = entry
+        
+        upsert_ids = [map_id for map_id, entry in latest.items() if entry.operation in ('insert', 'update')]
+        maps = {
+            map_obj.id: map_obj
+            for map_obj in session.query(Map).filter(Map.id.in_(upsert_ids)).all()
+        } if upsert_ids else {}
+        session.close()
+        
+        changes = []
+        for entry in sorted(latest.values(), key=lambda change: change.seq):
+            change = {'seq': entry.seq, 'map_id': entry.map_id, 'operation': entry.operation}
+            if entry.operation in ('insert', 'update'):
+                map_obj = maps.get(entry.map_id)
+                # Report the current state if a later change is beyond this page
+                if map_obj is None:
+                    change['operation'] = 'delete'
+                elif not map_obj.is_active:
+                    change['operation'] = 'deactivate'
+                else:
+                    change['operation'] = 'upsert'
+                    change['map'] = map_obj.to_dict()
+            changes.append(change)
+        
+        return jsonify({
+            'full_resync': False,
+            'changes': changes,
+            'watermark': entries[-1].seq if entries else since,
+            'has_more': len(entries) == limit
+        })
+    
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
 @map_bp.route('/<int:map_id>/download', methods=['POST'])
+@idempotent
 @token_required
 def download_map(current_user_id, map_id):
     """Initiate map download"""
@@ -108,8 +432,7 @@ def download_map(current_user_id, map_id):
             return jsonify({'message': 'Mapa não encontrado'}), 404
         
         # Check user access (premium)
-        user = session.query(User).filter(User.id == current_user_id).first()
-        if map_obj.is_premium and not user.is_premium:
+        if not entitlements.can_download(current_user_id, map_obj.is_premium):
             session.close()
             return jsonify({
                 'message': 'Acesso premium necessário',
@@ -135,6 +458,7 @@ def download_map(current_user_id, map_id):
         # Increment download counter
         map_obj.download_count += 1
         session.commit()
+        db_config.mark_write(current_user_id)
         
         result = {
             'message': 'Download autorizado',
@@ -156,23 +480,28 @@ def download_map(current_user_id, map_id):
 def get_map_categories():
     """Get available map categories and statistics"""
     try:
-        session = db_config.get_session()
+        session = db_config.get_read_session()
         
         # Get map types with counts
-        from sqlalchemy import func
         categories = session.query(
             Map.map_type,
             func.count(Map.id).label('count'),
             func.count(func.nullif(Map.is_premium, False)).label('premium_count')
         ).filter(Map.is_active == True).group_by(Map.map_type).all()
         
-        # Get countries with counts
-        countries = session.query(
-            Map.country,
+        # Get countries with counts (grouped on the integer key, names joined afterwards)
+        country_counts = session.query(
+            Map.country_id,
             func.count(Map.id).label('count')
-        ).filter(Map.is_active == True).group_by(Map.country).order_by(
+        ).filter(Map.is_active == True, Map.country_id != None).group_by(Map.country_id).order_by(
             func.count(Map.id).desc()
-        ).limit(10).all()
+        ).limit(10).subquery()
+        countries = session.query(
+            Country.name.label('country'),
+            country_counts.c.count
+        ).join(country_counts, Country.id == country_counts.c.country_id).order_by(
+            country_counts.c.count.desc()
+        ).all()
         
         session.close()
         
@@ -193,7 +522,46 @@ def get_map_categories():
                 for country in countries
             ]
         })
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@map_bp.route('/regions/tree', methods=['GET'])
+def get_region_tree():
+    """Country → state → city tree with map counts, sizes and premium counts per region"""
+    try:
+        version, tree = region_tree.render()
+        
+        country = request.args.get('country')
+        if country:
+            countries = [node for node in tree['countries'] if node['name'].lower() == country.lower()]
+            if not countries:
+                return jsonify({'message': 'País não encontrado'}), 404
+            return jsonify({'country': countries[0], 'catalogue_version': version})
         
+        return cache_compressed(jsonify({**tree, 'catalogue_version': version}), 'region_tree', version)
+    
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@map_bp.route('/suggest', methods=['GET'])
+def suggest_maps():
+    """Typeahead completions for map names, countries, states and cities (?q=&type=&limit=)"""
+    try:
+        query = request.args.get('q', '')
+        kind = request.args.get('type') or None
+        if kind and kind not in SUGGESTION_KINDS:
+            return jsonify({'message': f'Tipo inválido (use {", ".join(SUGGESTION_KINDS)})'}), 400
+        limit = max(1, min(request.args.get('limit', 10, type=int), suggestions.max_results))
+        
+        index = suggestions.index()
+        results = [{**suggestion, 'score': weight} for weight, suggestion in index.suggest(query, limit, kind)]
+        
+        return cache_compressed(
+            jsonify({'query': query, 'suggestions': results, 'catalogue_version': index.version}),
+            'suggest', index.version, request.full_path
+        )
+    
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
@@ -202,7 +570,7 @@ def get_map_categories():
 def get_user_downloads(current_user_id):
     """Get user's download history"""
     try:
-        session = db_config.get_session()
+        session = db_config.get_read_session(current_user_id)
         
         # Pagination
         page = int(request.args.get('page', 1))
@@ -3,14 +3,16 @@ User routes for KingGroup backend
 Handles user registration, login, and profile management
 """
 from flask import Blueprint, request, jsonify
-from sqlalchemy.sql import func
 from models.user import User
 from config.database import db_config
 from auth.jwt_auth import JWTAuth, token_required
+from services.last_seen import last_seen
+from middleware.idempotency import idempotent
 
 user_bp = Blueprint('user', __name__, url_prefix='/api/user')
 
 @user_bp.route('/register', methods=['POST'])
+@idempotent
 def register():
     """Register new user"""
     try:
@@ -55,6 +57,7 @@ def register():
         
         session.add(user)
         session.commit()
+        db_config.mark_write(user.id)
         
         # Generate token
         token = JWTAuth.generate_token(user.id)
@@ -93,14 +96,14 @@ def login():
             session.close()
             return jsonify({'message': 'Conta desativada'}), 401
         
-        # Update last login
-        user.last_login = func.now()
-        session.commit()
+        # Recorded in memory and written with the next batched last-seen flush
+        logged_in_at = last_seen.login(user.id)
         
         # Generate token
         token = JWTAuth.generate_token(user.id)
         
         user_data = user.to_dict()
+        user_data['last_login'] = logged_in_at.isoformat()
         session.close()
         
         return jsonify({
@@ -117,7 +120,7 @@ def login():
 def get_profile(current_user_id):
     """Get user profile"""
     try:
-        session = db_config.get_session()
+        session = db_config.get_read_session(current_user_id)
         user = session.query(User).filter(User.id == current_user_id).first()
         
         if not user:
@@ -133,6 +136,7 @@ def get_profile(current_user_id):
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
 @user_bp.route('/profile', methods=['PUT'])
+@idempotent
 @token_required
 def update_profile(current_user_id):
     """Update user profile"""
@@ -164,6 +168,7 @@ def update_profile(current_user_id):
             user.set_password(data['password'])
         
         session.commit()
+        db_config.mark_write(current_user_id)
         user_data = user.to_dict()
         session.close()
         
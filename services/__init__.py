@@ -0,0 +1,23 @@
+"""
+Services package for KingGroup backend
+In-memory caches and background helpers shared by the routes
+"""
+from .health import HealthMetricsCache, health_metrics
+from .catalogue import CatalogueCache, catalogue_cache
+from .catalogue_artifact import CatalogueArtifactBuilder, catalogue_artifacts
+from .entitlements import EntitlementIndex, entitlements
+from .events import EventBus, event_bus
+from .trending import TrendingIndex, trending
+from .sketches import DownloadSketches, download_sketches
+from .corridor import CorridorIndex, corridor_index
+from .region_tree import RegionTree, region_tree
+from .suggest import SuggestService, suggestions
+from .geography import GeographyDirectory, geography
+from .last_seen import LastSeenTracker, last_seen
+
+__all__ = ['HealthMetricsCache', 'health_metrics', 'CatalogueCache', 'catalogue_cache',
+           'CatalogueArtifactBuilder', 'catalogue_artifacts', 'EntitlementIndex', 'entitlements',
+           'EventBus', 'event_bus', 'TrendingIndex', 'trending', 'DownloadSketches', 'download_sketches',
+           'CorridorIndex', 'corridor_index', 'RegionTree', 'region_tree',
+           'SuggestService', 'suggestions', 'GeographyDirectory', 'geography',
+           'LastSeenTracker', 'last_seen']
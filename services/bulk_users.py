@@ -0,0 +1,114 @@
+"""
+Bulk user administration for KingGroup backend
+Set-based UPDATE ... RETURNING over an ID list or a filter, with one entitlement refresh per batch
+"""
+import os
+import json
+import logging
+import datetime
+from sqlalchemy import update, select, or_
+from models.user import User
+from models.geography import GeoAlias
+from .entitlements import entitlements
+from .suggest import normalize
+from .geography import COUNTRY_ALIASES
+
+logger = logging.getLogger(__name__)
+
+BULK_ACTIONS = ('activate', 'deactivate', 'grant_premium', 'revoke_premium', 'set_license')
+BULK_FILTERS = ('company', 'country', 'region', 'is_active', 'is_premium', 'search')
+MAX_BULK_IDS = int(os.environ.get('ADMIN_BULK_MAX_IDS', 10000))
+
+def parse_license_expiry(data):
+    """License expiry from {"days": n} or {"expires_at": ISO date}, None for no expiry"""
+    if data.get('days') is not None:
+        return datetime.datetime.utcnow() + datetime.timedelta(days=int(data['days']))
+    if data.get('expires_at'):
+        return datetime.datetime.fromisoformat(data['expires_at'])
+    return None
+
+def _selection(user_ids, filters):
+    conditions = []
+    if user_ids is not None:
+        if not isinstance(user_ids, list) or not user_ids:
+            raise ValueError('user_ids deve ser uma lista não vazia')
+        if len(user_ids) > MAX_BULK_IDS:
+            raise ValueError(f'Máximo de {MAX_BULK_IDS} usuários por operação')
+        conditions.append(User.id.in_([int(user_id) for user_id in user_ids]))
+    
+    filters = filters or {}
+    unknown = set(filters) - set(BULK_FILTERS)
+    if unknown:
+        raise ValueError(f'Filtros inválidos: {", ".join(sorted(unknown))}')
+    if filters.get('company'):
+        conditions.append(User.company == filters['company'])
+    if filters.get('country'):
+        # Any accepted spelling of the country, matched on the indexed key
+        alias = normalize(filters['country'])
+        alias = normalize(COUNTRY_ALIASES.get(alias, alias))
+        conditions.append(User.country_id == select(GeoAlias.target_id).where(
+            GeoAlias.kind == 'country', GeoAlias.parent_id == 0, GeoAlias.alias == alias
+        ).scalar_subquery())
+    if filters.get('region'):
+        conditions.append(User.region == filters['region'])
+    for flag in ('is_active', 'is_premium'):
+        if filters.get(flag) is not None:
+            conditions.append(getattr(User, flag) == bool(filters[flag]))
+    if filters.get('search'):
+        search = filters['search']
+        conditions.append(or_(
+            User.username.ilike(f'%{search}%'),
+            User.email.ilike(f'%{search}%'),
+            User.country.ilike(f'%{search}%')
+        ))
+    
+    if not conditions:
+        # An empty selection would update every user
+        raise ValueError('Informe user_ids ou ao menos um filtro')
+    return conditions
+
+def bulk_update_statement(action, user_ids=None, filters=None, expires_at=None):
+    """UPDATE ... RETURNING for one bulk action; only rows the action changes are returned"""
+    conditions = _selection(user_ids, filters)
+    if action == 'activate':
+        values = {'is_active': True}
+        conditions.append(User.is_active == False)
+    elif action == 'deactivate':
+        values = {'is_active': False}
+        conditions += [User.is_active == True, User.username != 'admin']
+    elif action == 'grant_premium':
+        values = {'is_premium': True}
+        conditions.append(User.is_premium == False)
+    elif action == 'revoke_premium':
+        values = {'is_premium': False}
+        conditions.append(User.is_premium == True)
+    elif action == 'set_license':
+        values = {
+            'is_premium': True,
+            'license_expires_at': expires_at,
+            'license_expires': User.legacy_expiry(expires_at)
+        }
+    else:
+        raise ValueError(f'Ação inválida: use {", ".join(BULK_ACTIONS)}')
+    
+    return update(User).where(*conditions).values(**values).returning(
+        User.id, User.is_active, User.is_premium, User.license_expires_at
+    ).execution_options(synchronize_session=False)
+
+def apply_bulk_result(action, rows, admin_id=None):
+    """Refresh the entitlement index for the updated rows (call after commit); returns their ids"""
+    entitlements.apply_many((row.id, row.is_active and row.is_premium, row.license_expires_at) for row in rows)
+    user_ids = sorted(row.id for row in rows)
+    logger.info(f"👥 Bulk {action} by user {admin_id}: {len(user_ids)} users updated")
+    return user_ids
+
+def stream_bulk_result(action, user_ids, chunk_size=1000):
+    """JSON body listing the updated ids, written out chunk by chunk"""
+    yield json.dumps({
+        'message': 'Operação em lote concluída',
+        'action': action,
+        'count': len(user_ids)
+    })[:-1] + ', "user_ids": ['
+    for start in range(0, len(user_ids), chunk_size):
+        yield (',' if start else '') + ','.join(map(str, user_ids[start:start + chunk_size]))
+    yield ']}'
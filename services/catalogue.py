@@ -0,0 +1,215 @@
+"""
+Catalogue cache for KingGroup backend
+Serialized active maps held in memory, loaded once and shared read-only
+"""
+import os
+import time
+import logging
+import threading
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from models.map import Map
+from models.catalogue_change import CatalogueChange, COUNTER_COLUMNS
+from config.database import db_config
+
+logger = logging.getLogger(__name__)
+
+class CatalogueSnapshot:
+    """Immutable view of the active catalogue at one point in time"""
+    
+    def __init__(self, maps, version, inactive_ids=(), watermark=0, file_versions=None):
+        self.version = version
+        self.watermark = watermark
+        self.by_id = {map_data['id']: map_data for map_data in maps}
+        # map id → (version, file_hash, file_size); file_hash is not part of the public dicts
+        self.file_versions = file_versions or {}
+        self.inactive_ids = frozenset(inactive_ids)
+        self.loaded_at = time.time()
+    
+    def __len__(self):
+        return len(self.by_id)
+
+class CatalogueCache:
+    """Lazily loaded, periodically refreshed catalogue of active maps"""
+    
+    def __init__(self, refresh_seconds=None, watermark_seconds=None):
+        self.refresh_seconds = refresh_seconds or float(os.environ.get('CATALOGUE_REFRESH_SECONDS', 300))
+        self.watermark_seconds = watermark_seconds or float(os.environ.get('CATALOGUE_WATERMARK_SECONDS', 5))
+        self._snapshot = None
+        self._loaded_monotonic = 0.0
+        self._checked_monotonic = 0.0
+        self._version = 0
+        # Loads are serialized by _load_lock; readers only take it before the first snapshot
+        # exists, so a reload (and its listeners) never blocks requests on the old snapshot
+        self._load_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshing = False
+        self._stale = False
+        self._listeners = []
+    
+    def subscribe(self, listener):
+        """Call listener(snapshot) after every reload"""
+        self._listeners.append(listener)
+    
+    def snapshot(self):
+        """Get the current snapshot, loading it synchronously the first time"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._load_lock:
+                if self._snapshot is None:
+                    self._load_locked()
+                return self._snapshot
+        
+        now = time.monotonic()
+        if self._stale or now - self._loaded_monotonic > self.refresh_seconds:
+            self._schedule_refresh()
+        elif now - self._checked_monotonic > self.watermark_seconds:
+            # Other workers' changes show up as a higher change log sequence
+            self._schedule_refresh(only_if_changed=True)
+        return snapshot
+    
+    def get(self, map_id):
+        """Get the serialized active map, or None"""
+        return self.snapshot().by_id.get(map_id)
+    
+    def get_many(self, map_ids, snapshot=None):
+        """Split ids into (serialized active maps, inactive ids, missing ids) in one pass"""
+        snapshot = snapshot or self.snapshot()
+        found, inactive, missing = [], [], []
+        for map_id in map_ids:
+            map_data = snapshot.by_id.get(map_id)
+            if map_data is not None:
+                found.append(map_data)
+            elif map_id in snapshot.inactive_ids:
+                inactive.append(map_id)
+            else:
+                missing.append(map_id)
+        return found, inactive, missing
+    
+    def check_updates(self, installed, snapshot=None):
+        """Compare installed (id, version, file_hash) entries with the catalogue in one pass"""
+        snapshot = snapshot or self.snapshot()
+        results = []
+        for map_id, version, file_hash in installed:
+            current = snapshot.file_versions.get(map_id)
+            if current is None:
+                reason = 'inactive' if map_id in snapshot.inactive_ids else 'deleted'
+                results.append({'id': map_id, 'status': 'removed', 'reason': reason})
+                continue
+            
+            current_version, current_hash, file_size = current
+            # The hash identifies the exact file; the version is only used without one
+            if file_hash and current_hash:
+                up_to_date = file_hash.lower() == current_hash.lower()
+            else:
+                up_to_date = version == current_version
+            if up_to_date:
+                results.append({'id': map_id, 'status': 'up_to_date'})
+            else:
+                results.append({
+                    'id': map_id,
+                    'status': 'outdated',
+                    'version': current_version,
+                    'file_hash': current_hash,
+                    'file_size': file_size,
+                    # No delta files are produced yet: an update is a full download
+                    'delta_available': False,
+                    'download_size': file_size
+                })
+        return results
+    
+    def invalidate(self):
+        """Mark the catalogue as changed and start a background reload"""
+        self._stale = True
+        if self._snapshot is not None:
+            self._schedule_refresh()
+    
+    def load(self):
+        """Reload the catalogue now"""
+        with self._load_lock:
+            self._load_locked()
+        return self._snapshot
+    
+    def _load_locked(self):
+        # Cleared before reading so a change committed mid-load marks it stale again
+        self._stale = False
+        session = db_config.get_read_session()
+        try:
+            # Read the watermark first: anything committed later is newer than this snapshot
+            watermark = CatalogueChange.current_watermark(session)
+            maps = session.query(Map).filter(Map.is_active == True).order_by(Map.id).all()
+            serialized = [map_obj.to_dict() for map_obj in maps]
+            file_versions = {map_obj.id: (map_obj.version, map_obj.file_hash, map_obj.file_size) for map_obj in maps}
+            inactive_ids = [row.id for row in session.query(Map.id).filter(Map.is_active == False).all()]
+        finally:
+            session.close()
+        
+        self._version += 1
+        # Swap the reference: readers see either the old or the new snapshot
+        self._snapshot = CatalogueSnapshot(serialized, self._version, inactive_ids, watermark, file_versions)
+        self._loaded_monotonic = self._checked_monotonic = time.monotonic()
+        logger.info(f"🗺️ Catalogue loaded: {len(serialized)} active maps (v{self._version})")
+        
+        for listener in self._listeners:
+            try:
+                listener(self._snapshot)
+            except Exception as e:
+                logger.warning(f"⚠️ Catalogue listener failed: {str(e)}")
+    
+    def _has_new_changes(self):
+        session = db_config.get_read_session()
+        try:
+            return CatalogueChange.current_watermark(session) > self._snapshot.watermark
+        finally:
+            session.close()
+            self._checked_monotonic = time.monotonic()
+    
+    def _schedule_refresh(self, only_if_changed=False):
+        with self._refresh_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        
+        def run():
+            try:
+                if not only_if_changed or self._has_new_changes():
+                    self.load()
+            except Exception as e:
+                logger.warning(f"⚠️ Catalogue refresh failed: {str(e)}")
+            finally:
+                self._refreshing = False
+        
+        threading.Thread(target=run, name='catalogue-refresh', daemon=True).start()
+    
+    def after_fork(self):
+        """Reset locks that a refresh thread may have held when the process forked"""
+        self._load_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshing = False
+
+# Global catalogue cache
+catalogue_cache = CatalogueCache()
+
+def _flag_catalogue_change(mapper, connection, target):
+    """Remember in the owning session that a map was written"""
+    session = Session.object_session(target)
+    if session is not None:
+        session.info['catalogue_changed'] = True
+
+def _flag_catalogue_update(mapper, connection, target):
+    changed = {attr.key for attr in inspect(target).attrs if attr.history.has_changes()}
+    if changed - COUNTER_COLUMNS:
+        _flag_catalogue_change(mapper, connection, target)
+
+event.listen(Map, 'after_insert', _flag_catalogue_change)
+event.listen(Map, 'after_delete', _flag_catalogue_change)
+event.listen(Map, 'after_update', _flag_catalogue_update)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    if session.info.pop('catalogue_changed', False):
+        catalogue_cache.invalidate()
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_on_rollback(session):
+    session.info.pop('catalogue_changed', None)
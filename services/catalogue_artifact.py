@@ -0,0 +1,210 @@
+"""
+Catalogue snapshot artifacts for KingGroup backend
+Full active catalogue rendered to content-hashed, precompressed files on every change
+"""
+import os
+import re
+import json
+import time
+import gzip
+import hashlib
+import logging
+import tempfile
+import threading
+from middleware.compression import GzipCodec, BrotliCodec, brotli
+from models.catalogue_change import COUNTER_COLUMNS
+from .catalogue import catalogue_cache
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_NAME = re.compile(r'^catalogue-[0-9a-f]{16}\.json$')
+
+class CatalogueArtifact:
+    """One immutable rendering of the catalogue, addressed by its content hash"""
+    
+    def __init__(self, digest, files, size, map_count, watermark):
+        self.digest = digest
+        self.name = f'catalogue-{digest}.json'
+        self.files = files
+        self.compressed_sizes = {encoding: os.path.getsize(path) for encoding, path in files.items()}
+        self.size = size
+        self.map_count = map_count
+        self.watermark = watermark
+        self.built_at = time.time()
+    
+    def to_dict(self):
+        return {
+            'version': self.digest,
+            'name': self.name,
+            'map_count': self.map_count,
+            'watermark': self.watermark,
+            'size': self.size,
+            'compressed_sizes': self.compressed_sizes,
+            'built_at': self.built_at
+        }
+
+class CatalogueArtifactBuilder:
+    """Rebuilds the snapshot artifact in the background whenever the catalogue reloads"""
+    
+    def __init__(self, directory=None, keep=None):
+        # Per-instance by default; a miss on a name is rebuilt from the catalogue (see open)
+        self.directory = directory or os.environ.get(
+            'CATALOGUE_ARTIFACT_DIR', os.path.join(tempfile.gettempdir(), 'kinggroup-catalogue'))
+        self.keep = keep or int(os.environ.get('CATALOGUE_ARTIFACT_KEEP', 3))
+        # Built off the request path, so spend CPU on the smallest file
+        self.encoders = [('gzip', 'gz', GzipCodec(9))]
+        if brotli is not None:
+            self.encoders.insert(0, ('br', 'br', BrotliCodec(int(os.environ.get('CATALOGUE_ARTIFACT_BROTLI_LEVEL', 11)))))
+        self._current = None
+        self._built_version = None
+        self._build_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._building = False
+        self._pending = None
+    
+    def attach(self, cache):
+        """Rebuild after every reload of cache"""
+        cache.subscribe(self._schedule_build)
+    
+    def current(self):
+        """Get the latest artifact, or None before the first build"""
+        return self._current
+    
+    def build(self, snapshot):
+        """Render snapshot to disk (no-op if this version is already built)"""
+        with self._build_lock:
+            if self._current is not None and snapshot.version == self._built_version:
+                return self._current
+            
+            body = self.render(snapshot)
+            digest = hashlib.sha256(body).hexdigest()[:16]
+            name = f'catalogue-{digest}.json'
+            
+            os.makedirs(self.directory, exist_ok=True)
+            files = {}
+            for encoding, suffix, codec in self.encoders:
+                path = os.path.join(self.directory, f'{name}.{suffix}')
+                if not os.path.exists(path):
+                    self._write_atomic(path, codec.compress(body))
+                files[encoding] = path
+            
+            self._current = CatalogueArtifact(digest, files, len(body), len(snapshot), snapshot.watermark)
+            self._built_version = snapshot.version
+            self._prune()
+        
+        logger.info(f"📦 Catalogue artifact {name}: {len(snapshot)} maps, {len(body)} bytes")
+        return self._current
+    
+    @staticmethod
+    def render(snapshot):
+        """Deterministic body: every worker and instance renders the same bytes and hash"""
+        # Counters change on every download, not with the catalogue: left out so the
+        # hash (and the URL) only moves when maps do
+        maps = [
+            {key: value for key, value in snapshot.by_id[map_id].items() if key not in COUNTER_COLUMNS}
+            for map_id in sorted(snapshot.by_id)
+        ]
+        return json.dumps({'watermark': snapshot.watermark, 'maps': maps},
+                          sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    
+    def open(self, name, accept_encodings):
+        """Get (path, encoding) of an artifact in the best encoding the client accepts"""
+        if not ARTIFACT_NAME.match(name):
+            return None
+        
+        candidates = self._candidates(name, accept_encodings)
+        if not candidates:
+            # Pointer handed out by another instance (or before this one's build finished):
+            # the same catalogue renders the same name, so build it here
+            artifact = self.build(catalogue_cache.snapshot())
+            if artifact.name != name:
+                return None
+            candidates = self._candidates(name, accept_encodings)
+            if not candidates:
+                return None
+        
+        quality, encoding, path = max(candidates, key=lambda candidate: candidate[0])
+        if quality > 0:
+            return path, encoding
+        # Client takes neither: fall back to identity from the gzip file
+        gzip_path = dict((candidate[1], candidate[2]) for candidate in candidates).get('gzip')
+        return (gzip_path, None) if gzip_path else None
+    
+    def _candidates(self, name, accept_encodings):
+        candidates = []
+        for encoding, suffix, _ in self.encoders:
+            path = os.path.join(self.directory, f'{name}.{suffix}')
+            if os.path.exists(path):
+                candidates.append((accept_encodings.quality(encoding), encoding, path))
+        return candidates
+    
+    def read_identity(self, path):
+        """Decompressed body of a gzip artifact: exactly the bytes that were hashed"""
+        with open(path, 'rb') as artifact_file:
+            return gzip.decompress(artifact_file.read())
+    
+    def _write_atomic(self, path, data):
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, prefix='.artifact-')
+        try:
+            with os.fdopen(descriptor, 'wb') as artifact_file:
+                artifact_file.write(data)
+            os.replace(temporary, path)
+        except Exception:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+    
+    def _prune(self):
+        """Keep the newest artifacts so clients holding an older pointer can still fetch"""
+        artifacts = {}
+        for filename in os.listdir(self.directory):
+            stem = filename.rsplit('.', 1)[0]
+            if ARTIFACT_NAME.match(stem):
+                path = os.path.join(self.directory, filename)
+                artifacts.setdefault(stem, []).append(path)
+        
+        def newest(stem):
+            return max(os.path.getmtime(path) for path in artifacts[stem])
+        
+        stale = sorted(artifacts, key=newest, reverse=True)[self.keep:]
+        for stem in stale:
+            if stem == self._current.name:
+                continue
+            for path in artifacts[stem]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+    
+    def _schedule_build(self, snapshot):
+        # Coalesce: while a build runs only the newest snapshot is kept
+        with self._lock:
+            self._pending = snapshot
+            if self._building:
+                return
+            self._building = True
+        
+        def run():
+            while True:
+                with self._lock:
+                    pending, self._pending = self._pending, None
+                    if pending is None:
+                        self._building = False
+                        return
+                try:
+                    self.build(pending)
+                except Exception as e:
+                    logger.warning(f"⚠️ Catalogue artifact build failed: {str(e)}")
+        
+        threading.Thread(target=run, name='catalogue-artifact', daemon=True).start()
+    
+    def after_fork(self):
+        """Reset locks that a build thread may have held when the process forked"""
+        self._build_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._building = False
+        self._pending = None
+
+# Global artifact builder, fed by the catalogue cache
+catalogue_artifacts = CatalogueArtifactBuilder()
+catalogue_artifacts.attach(catalogue_cache)
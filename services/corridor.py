@@ -0,0 +1,267 @@
+"""
+Route corridor index for KingGroup backend
+Grid index over map bounding boxes, queried with a buffered route polyline
+"""
+import os
+import math
+import logging
+import threading
+from .catalogue import catalogue_cache
+
+logger = logging.getLogger(__name__)
+
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LNG = 111.320
+
+def decode_polyline(encoded, precision=5):
+    """[(lat, lng)] from an encoded polyline (Google polyline algorithm)"""
+    factor = 10 ** precision
+    points = []
+    index = lat = lng = 0
+    length = len(encoded)
+    while index < length:
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                if index >= length:
+                    raise ValueError('truncated polyline')
+                byte = ord(encoded[index]) - 63
+                index += 1
+                if byte < 0 or byte > 63:
+                    raise ValueError('invalid polyline character')
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append((lat / factor, lng / factor))
+    return points
+
+def encode_polyline(points, precision=5):
+    """Encoded polyline of [(lat, lng)] (inverse of decode_polyline)"""
+    factor = 10 ** precision
+    chunks = []
+    previous = (0, 0)
+    for lat, lng in points:
+        current = (round(lat * factor), round(lng * factor))
+        for value in (current[0] - previous[0], current[1] - previous[1]):
+            value = ~(value << 1) if value < 0 else value << 1
+            while value >= 0x20:
+                chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            chunks.append(chr(value + 63))
+        previous = current
+    return ''.join(chunks)
+
+def _point_box_distance(x, y, x_min, y_min, x_max, y_max):
+    dx = max(x_min - x, 0.0, x - x_max)
+    dy = max(y_min - y, 0.0, y - y_max)
+    return math.hypot(dx, dy)
+
+def _point_segment_distance(px, py, ax, ay, bx, by):
+    dx, dy = bx - ax, by - ay
+    length_sq = dx * dx + dy * dy
+    t = 0.0 if length_sq == 0 else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length_sq))
+    return math.hypot(px - ax - t * dx, py - ay - t * dy)
+
+def _segment_crosses_box(ax, ay, bx, by, x_min, y_min, x_max, y_max):
+    # Liang-Barsky clipping: does any part of the segment fall inside the box?
+    t0, t1 = 0.0, 1.0
+    dx, dy = bx - ax, by - ay
+    for p, q in ((-dx, ax - x_min), (dx, x_max - ax), (-dy, ay - y_min), (dy, y_max - ay)):
+        if p == 0:
+            if q < 0:
+                return False
+        else:
+            t = q / p
+            if p < 0:
+                t0 = max(t0, t)
+            else:
+                t1 = min(t1, t)
+            if t0 > t1:
+                return False
+    return True
+
+def _projected_segment_box_distance(ax, ay, bx, by, x_min, y_min, x_max, y_max):
+    if _segment_crosses_box(ax, ay, bx, by, x_min, y_min, x_max, y_max):
+        return 0.0
+    return min(
+        _point_box_distance(ax, ay, x_min, y_min, x_max, y_max),
+        _point_box_distance(bx, by, x_min, y_min, x_max, y_max),
+        *(_point_segment_distance(x, y, ax, ay, bx, by)
+          for x in (x_min, x_max) for y in (y_min, y_max))
+    )
+
+def segment_box_distance_km(a, b, bounds):
+    """Distance in km between segment a-b and a lat/lng box, in a local equirectangular projection"""
+    # Scaling both axes by constants keeps the box axis-aligned
+    scale = KM_PER_DEGREE_LNG * math.cos(math.radians((a[0] + b[0]) / 2))
+    return _projected_segment_box_distance(
+        a[1] * scale, a[0] * KM_PER_DEGREE_LAT, b[1] * scale, b[0] * KM_PER_DEGREE_LAT,
+        bounds['lng_min'] * scale, bounds['lat_min'] * KM_PER_DEGREE_LAT,
+        bounds['lng_max'] * scale, bounds['lat_max'] * KM_PER_DEGREE_LAT
+    )
+
+def segment_length_km(a, b):
+    scale = KM_PER_DEGREE_LNG * math.cos(math.radians((a[0] + b[0]) / 2))
+    return math.hypot((b[1] - a[1]) * scale, (b[0] - a[0]) * KM_PER_DEGREE_LAT)
+
+class CorridorGrid:
+    """Uniform lat/lng grid: cell → ids of the maps whose box overlaps it"""
+    
+    def __init__(self, snapshot, cell_degrees, max_cells_per_map):
+        self.version = snapshot.version
+        self.cell_degrees = cell_degrees
+        self.cells = {}
+        self.oversized = []  # boxes too large to grid, candidates for every query
+        self.bounds = {}
+        for map_id, map_data in snapshot.by_id.items():
+            bounds = map_data.get('bounds')
+            if not bounds:
+                continue
+            self.bounds[map_id] = bounds
+            rows = range(self._cell(bounds['lat_min']), self._cell(bounds['lat_max']) + 1)
+            columns = range(self._cell(bounds['lng_min']), self._cell(bounds['lng_max']) + 1)
+            if len(rows) * len(columns) > max_cells_per_map:
+                self.oversized.append(map_id)
+                continue
+            for row in rows:
+                for column in columns:
+                    self.cells.setdefault((row, column), []).append(map_id)
+    
+    def _cell(self, degrees):
+        return math.floor(degrees / self.cell_degrees)
+    
+    def candidates(self, lat_min, lat_max, lng_min, lng_max, buffer_km):
+        """Ids of maps in the cells covered by a lat/lng box grown by buffer_km"""
+        lat_pad = buffer_km / KM_PER_DEGREE_LAT
+        lat_extreme = min(89.0, max(abs(lat_min), abs(lat_max)) + lat_pad)
+        lng_pad = buffer_km / (KM_PER_DEGREE_LNG * math.cos(math.radians(lat_extreme)))
+        found = set(self.oversized)
+        cells = self.cells
+        for row in range(self._cell(lat_min - lat_pad), self._cell(lat_max + lat_pad) + 1):
+            for column in range(self._cell(lng_min - lng_pad), self._cell(lng_max + lng_pad) + 1):
+                entries = cells.get((row, column))
+                if entries:
+                    found.update(entries)
+        return found
+
+class CorridorIndex:
+    """Maps whose bounding box lies within a buffer distance of a route"""
+    
+    # Routes are walked in chunks no wider than chunk_degrees: one grid lookup
+    # and one projection per chunk, and a chunk-box test that rejects most
+    # candidates before any per-segment work.
+    
+    def __init__(self, cell_degrees=None, max_cells_per_map=None, chunk_degrees=None):
+        self.cell_degrees = cell_degrees or float(os.environ.get('CORRIDOR_CELL_DEGREES', 0.5))
+        self.max_cells_per_map = max_cells_per_map or int(os.environ.get('CORRIDOR_MAX_CELLS_PER_MAP', 400))
+        self.chunk_degrees = chunk_degrees or float(os.environ.get('CORRIDOR_CHUNK_DEGREES', 0.25))
+        self._grid = None
+        self._lock = threading.Lock()
+    
+    def grid(self):
+        """Grid for the current catalogue snapshot, rebuilt when the catalogue changes"""
+        snapshot = catalogue_cache.snapshot()
+        grid = self._grid
+        if grid is None or grid.version != snapshot.version:
+            with self._lock:
+                grid = self._grid
+                if grid is None or grid.version != snapshot.version:
+                    grid = self._grid = CorridorGrid(snapshot, self.cell_degrees, self.max_cells_per_map)
+                    logger.info(f"🧭 Corridor grid built: {len(grid.bounds)} maps in {len(grid.cells)} cells")
+        return grid
+    
+    def _chunks(self, points):
+        """Runs of consecutive points (sharing end points) whose box spans at most chunk_degrees"""
+        limit = self.chunk_degrees
+        chunk = [points[0]]
+        lat_min = lat_max = points[0][0]
+        lng_min = lng_max = points[0][1]
+        for point in points[1:]:
+            lat, lng = point
+            if lat < lat_min:
+                lat_min = lat
+            elif lat > lat_max:
+                lat_max = lat
+            if lng < lng_min:
+                lng_min = lng
+            elif lng > lng_max:
+                lng_max = lng
+            if (lat_max - lat_min > limit or lng_max - lng_min > limit) and len(chunk) > 1:
+                yield chunk
+                chunk = [chunk[-1]]
+                lat_min, lat_max = sorted((chunk[0][0], lat))
+                lng_min, lng_max = sorted((chunk[0][1], lng))
+            chunk.append(point)
+        yield chunk
+    
+    def query(self, points, buffer_km, map_types=None):
+        """[(map_id, km along the route where the corridor first reaches it, closest distance km)] in route order"""
+        grid = self.grid()
+        by_id = catalogue_cache.snapshot().by_id
+        matched = {}
+        skipped = set()
+        route_km = 0.0
+        for chunk in self._chunks(points):
+            lats = [point[0] for point in chunk]
+            lngs = [point[1] for point in chunk]
+            scale = KM_PER_DEGREE_LNG * math.cos(math.radians((min(lats) + max(lats)) / 2))
+            xs = [lng * scale for lng in lngs]
+            ys = [lat * KM_PER_DEGREE_LAT for lat in lats]
+            at = [route_km]
+            for index in range(1, len(chunk)):
+                at.append(at[-1] + math.hypot(xs[index] - xs[index - 1], ys[index] - ys[index - 1]))
+            chunk_x_min, chunk_x_max, chunk_y_min, chunk_y_max = min(xs), max(xs), min(ys), max(ys)
+            
+            for map_id in grid.candidates(min(lats), max(lats), min(lngs), max(lngs), buffer_km):
+                if map_id in skipped:
+                    continue
+                match = matched.get(map_id)
+                if match is None:
+                    map_data = by_id.get(map_id)
+                    if map_data is None or (map_types and map_data['map_type'] not in map_types):
+                        skipped.add(map_id)
+                        continue
+                elif match[1] == 0.0:
+                    continue
+                
+                bounds = grid.bounds[map_id]
+                x_min, x_max = bounds['lng_min'] * scale, bounds['lng_max'] * scale
+                y_min, y_max = bounds['lat_min'] * KM_PER_DEGREE_LAT, bounds['lat_max'] * KM_PER_DEGREE_LAT
+                if (max(x_min - chunk_x_max, chunk_x_min - x_max) > buffer_km or
+                        max(y_min - chunk_y_max, chunk_y_min - y_max) > buffer_km):
+                    continue
+                
+                # Every point of a segment is within half its length of an end point,
+                # so segments whose end points are all far from the box are skipped
+                near = [_point_box_distance(x, y, x_min, y_min, x_max, y_max) for x, y in zip(xs, ys)]
+                for index in range(len(chunk) - 1):
+                    half = (at[index + 1] - at[index]) / 2
+                    if min(near[index], near[index + 1]) - half > buffer_km:
+                        continue
+                    distance = _projected_segment_box_distance(
+                        xs[index], ys[index], xs[index + 1], ys[index + 1], x_min, y_min, x_max, y_max
+                    )
+                    if distance > buffer_km:
+                        continue
+                    if match is None:
+                        match = matched[map_id] = [at[index], distance]
+                    elif distance < match[1]:
+                        match[1] = distance
+                    if distance == 0.0:
+                        break
+            route_km = at[-1]
+        
+        ordered = sorted(matched.items(), key=lambda item: (item[1][0], item[0]))
+        return [(map_id, at_km, distance) for map_id, (at_km, distance) in ordered], route_km
+    
+    def after_fork(self):
+        """Reset the lock a request thread may have held when the process forked"""
+        self._lock = threading.Lock()
+
+# Global corridor index over the catalogue
+corridor_index = CorridorIndex()
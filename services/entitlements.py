@@ -0,0 +1,217 @@
+"""
+Entitlement index for KingGroup backend
+In-memory set of users with active premium access, expired in order of license expiry
+"""
+import os
+import time
+import heapq
+import logging
+import datetime
+import threading
+from sqlalchemy import event, inspect, or_
+from sqlalchemy.orm import Session
+from models.user import User
+from config.database import db_config
+from .catalogue import catalogue_cache
+
+logger = logging.getLogger(__name__)
+
+NEVER = float('inf')
+ENTITLEMENT_COLUMNS = {'is_active', 'is_premium', 'license_expires_at'}
+
+def expiry_timestamp(expires_at):
+    """Epoch seconds of a license expiry (naive datetimes are UTC), inf for no expiry"""
+    if expires_at is None:
+        return NEVER
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=datetime.timezone.utc)
+    return expires_at.timestamp()
+
+def parse_legacy_expiry(value):
+    """Parse the legacy license_expires string, or None"""
+    try:
+        return datetime.datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+class EntitlementIndex:
+    """Premium user → expiry map with a min-heap on expiry for eviction"""
+    
+    def __init__(self, refresh_seconds=None):
+        self.refresh_seconds = refresh_seconds or float(os.environ.get('ENTITLEMENT_REFRESH_SECONDS', 60))
+        self._expiry = None
+        self._heap = []
+        self._loaded_monotonic = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+    
+    def is_premium(self, user_id):
+        """Whether user_id currently has premium access (O(1) amortized)"""
+        expiry = self._ensure_loaded()
+        heap = self._heap
+        if heap and heap[0][0] <= time.time():
+            self._evict_expired()
+        return user_id in expiry
+    
+    def can_download(self, user_id, map_is_premium):
+        """Access decision for one map"""
+        return not map_is_premium or self.is_premium(user_id)
+    
+    def expires_at(self, user_id):
+        """License expiry of a premium user as a datetime, or None"""
+        expiry = self._ensure_loaded().get(user_id)
+        if expiry is None or expiry == NEVER:
+            return None
+        return datetime.datetime.fromtimestamp(expiry, tz=datetime.timezone.utc)
+    
+    def classify(self, user_id, map_ids):
+        """Split map ids into (downloadable, premium required, unavailable) using the catalogue"""
+        premium = self.is_premium(user_id)
+        snapshot = catalogue_cache.snapshot()
+        downloadable, premium_required, unavailable = [], [], []
+        for map_id in map_ids:
+            map_data = snapshot.by_id.get(map_id)
+            if map_data is None:
+                unavailable.append(map_id)
+            elif map_data['is_premium'] and not premium:
+                premium_required.append(map_id)
+            else:
+                downloadable.append(map_id)
+        return downloadable, premium_required, unavailable
+    
+    def grant(self, user_id, expires_at=None):
+        """Add or update a premium user"""
+        expiry = expiry_timestamp(expires_at)
+        if expiry <= time.time():
+            self.revoke(user_id)
+            return
+        with self._lock:
+            if self._expiry is None:
+                return
+            self._expiry[user_id] = expiry
+            if expiry != NEVER:
+                heapq.heappush(self._heap, (expiry, user_id))
+    
+    def revoke(self, user_id):
+        """Remove a user (its heap entry is dropped lazily)"""
+        with self._lock:
+            if self._expiry is not None:
+                self._expiry.pop(user_id, None)
+    
+    def apply_many(self, changes):
+        """Grant or revoke many users at once from (user_id, premium, expires_at) tuples"""
+        now = time.time()
+        with self._lock:
+            if self._expiry is None:
+                return
+            for user_id, premium, expires_at in changes:
+                expiry = expiry_timestamp(expires_at) if premium else now
+                if expiry <= now:
+                    self._expiry.pop(user_id, None)
+                    continue
+                self._expiry[user_id] = expiry
+                if expiry != NEVER:
+                    heapq.heappush(self._heap, (expiry, user_id))
+    
+    def load(self):
+        """Rebuild the index from the users table"""
+        now = datetime.datetime.utcnow()
+        # Primary, not a replica: a lagging replica would undo grants just applied by the commit hook
+        session = db_config.get_session()
+        try:
+            rows = session.query(User.id, User.license_expires_at).filter(
+                User.is_active == True,
+                User.is_premium == True,
+                or_(User.license_expires_at == None, User.license_expires_at > now)
+            ).all()
+        finally:
+            session.close()
+        
+        expiry = {row.id: expiry_timestamp(row.license_expires_at) for row in rows}
+        heap = [(value, user_id) for user_id, value in expiry.items() if value != NEVER]
+        heapq.heapify(heap)
+        
+        with self._lock:
+            self._expiry, self._heap = expiry, heap
+            self._loaded_monotonic = time.monotonic()
+        logger.info(f"🔑 Entitlements loaded: {len(expiry)} premium users, {len(heap)} with expiry")
+        return len(expiry)
+    
+    def _ensure_loaded(self):
+        expiry = self._expiry
+        if expiry is None:
+            self.load()
+            return self._expiry
+        if time.monotonic() - self._loaded_monotonic > self.refresh_seconds:
+            # Picks up grants and revocations made by other workers
+            self._schedule_refresh()
+        return expiry
+    
+    def _evict_expired(self):
+        now = time.time()
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                expiry, user_id = heapq.heappop(self._heap)
+                # Skip entries superseded by a later grant or a revoke
+                if self._expiry.get(user_id) == expiry:
+                    del self._expiry[user_id]
+    
+    def _schedule_refresh(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        
+        def run():
+            try:
+                self.load()
+            except Exception as e:
+                logger.warning(f"⚠️ Entitlement refresh failed: {str(e)}")
+            finally:
+                self._refreshing = False
+        
+        threading.Thread(target=run, name='entitlement-refresh', daemon=True).start()
+    
+    def after_fork(self):
+        """Reset locks that a refresh thread may have held when the process forked"""
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+# Global entitlement index
+entitlements = EntitlementIndex()
+
+def backfill_license_expiry(session):
+    """Copy legacy license_expires strings into license_expires_at"""
+    users = session.query(User).filter(User.license_expires != None, User.license_expires_at == None).all()
+    updated = 0
+    for user in users:
+        expires_at = parse_legacy_expiry(user.license_expires)
+        if expires_at is not None:
+            user.license_expires_at = expires_at
+            updated += 1
+    session.commit()
+    if updated:
+        logger.info(f"🔑 Backfilled license_expires_at for {updated} users")
+    return updated
+
+def _track_entitlement_change(mapper, connection, target):
+    changed = {attr.key for attr in inspect(target).attrs if attr.history.has_changes()}
+    if changed & ENTITLEMENT_COLUMNS:
+        session = Session.object_session(target)
+        if session is not None:
+            session.info.setdefault('entitlement_changes', {})[target.id] = (
+                target.is_active and target.is_premium, target.license_expires_at
+            )
+
+event.listen(User, 'after_insert', _track_entitlement_change)
+event.listen(User, 'after_update', _track_entitlement_change)
+
+@event.listens_for(Session, 'after_commit')
+def _apply_entitlement_changes(session):
+    changes = session.info.pop('entitlement_changes', None)
+    if changes:
+        entitlements.apply_many((user_id, premium, expires_at) for user_id, (premium, expires_at) in changes.items())
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_entitlement_changes(session):
+    session.info.pop('entitlement_changes', None)
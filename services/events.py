@@ -0,0 +1,56 @@
+"""
+Domain events for KingGroup backend
+In-process publish/subscribe, fed by committed database writes
+"""
+import time
+import logging
+from collections import defaultdict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models.download import Download
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_TOPIC = 'download'
+
+class EventBus:
+    """Synchronous in-process event bus (handlers must be cheap)"""
+    
+    def __init__(self):
+        self._handlers = defaultdict(list)
+    
+    def subscribe(self, topic, handler):
+        """Call handler(payload) for every event published on topic"""
+        self._handlers[topic].append(handler)
+    
+    def publish(self, topic, payload):
+        for handler in self._handlers.get(topic, ()):
+            try:
+                handler(payload)
+            except Exception as e:
+                logger.warning(f"⚠️ Event handler for '{topic}' failed: {str(e)}")
+
+# Global event bus
+event_bus = EventBus()
+
+def _queue_download_event(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault('download_events', []).append({
+            'download_id': target.id,
+            'map_id': target.map_id,
+            'user_id': target.user_id,
+            'at': time.time()
+        })
+
+event.listen(Download, 'after_insert', _queue_download_event)
+
+@event.listens_for(Session, 'after_commit')
+def _publish_download_events(session):
+    # Only committed downloads are announced
+    for payload in session.info.pop('download_events', ()):
+        event_bus.publish(DOWNLOAD_TOPIC, payload)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_download_events(session):
+    session.info.pop('download_events', None)
@@ -0,0 +1,198 @@
+"""
+Geography dimension for KingGroup backend
+Resolves free-text country/state/city names to canonical integer ids on every write
+"""
+import logging
+import threading
+from sqlalchemy import event, inspect, select, text
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import postgresql, sqlite
+from models.map import Map
+from models.user import User
+from models.download import Download
+from models.geography import Country, State, City, GeoAlias
+from .suggest import normalize
+
+logger = logging.getLogger(__name__)
+
+# Known alternative spellings (normalized) → canonical country name
+COUNTRY_ALIASES = {
+    'brasil': 'Brazil',
+    'bresil': 'Brazil',
+    'republica federativa do brasil': 'Brazil',
+    'estados unidos': 'United States',
+    'eua': 'United States',
+    'usa': 'United States',
+    'united states of america': 'United States',
+}
+
+def _insert_ignore(connection, model, values):
+    dialect = postgresql if connection.dialect.name == 'postgresql' else sqlite
+    connection.execute(dialect.insert(model.__table__).values(**values).on_conflict_do_nothing())
+
+class GeographyDirectory:
+    """Alias → id map of the geography dimension, cached per process"""
+    
+    # Aliases are scoped by parent: countries by 0, states by their country id,
+    # cities by their state id or, without a state, by minus their country id.
+    
+    def __init__(self):
+        self._ids = None
+        self._lock = threading.Lock()
+    
+    def _cached(self, connection):
+        ids = self._ids
+        if ids is None:
+            rows = connection.execute(select(GeoAlias.kind, GeoAlias.parent_id, GeoAlias.alias, GeoAlias.target_id))
+            ids = {(kind, parent_id, alias): target_id for kind, parent_id, alias, target_id in rows}
+            with self._lock:
+                if self._ids is None:
+                    self._ids = ids
+                ids = self._ids
+        return ids
+    
+    def resolve(self, connection, pending, country, state=None, city=None):
+        """(country_id, state_id, city_id) for the names, creating canonical rows on first sight"""
+        if not normalize(country):
+            return None, None, None
+        country_id = self._resolve(connection, pending, 'country', 0, country)
+        state_id = self._resolve(connection, pending, 'state', country_id, state) if normalize(state) else None
+        city_id = None
+        if normalize(city):
+            parent_id = state_id if state_id is not None else -country_id
+            city_id = self._resolve(connection, pending, 'city', parent_id, city, country_id, state_id)
+        return country_id, state_id, city_id
+    
+    def _resolve(self, connection, pending, kind, parent_id, name, country_id=None, state_id=None):
+        alias = normalize(name)
+        key = (kind, parent_id, alias)
+        target_id = self._cached(connection).get(key) or pending.get(key)
+        if target_id is not None:
+            return target_id
+        
+        canonical = name.strip()
+        if kind == 'country' and alias in COUNTRY_ALIASES:
+            canonical = COUNTRY_ALIASES[alias]
+            if normalize(canonical) != alias:
+                target_id = self._resolve(connection, pending, kind, parent_id, canonical)
+        if target_id is None:
+            target_id = self._create(connection, kind, parent_id, canonical, country_id, state_id)
+        
+        _insert_ignore(connection, GeoAlias, {'kind': kind, 'parent_id': parent_id, 'alias': alias, 'target_id': target_id})
+        # A concurrent writer may have registered the alias first: its id wins
+        target_id = connection.execute(select(GeoAlias.target_id).where(
+            GeoAlias.kind == kind, GeoAlias.parent_id == parent_id, GeoAlias.alias == alias
+        )).scalar()
+        pending[key] = target_id
+        return target_id
+    
+    def _create(self, connection, kind, parent_id, name, country_id, state_id):
+        if kind == 'country':
+            _insert_ignore(connection, Country, {'name': name})
+            return connection.execute(select(Country.id).where(Country.name == name)).scalar()
+        if kind == 'state':
+            _insert_ignore(connection, State, {'country_id': parent_id, 'name': name})
+            return connection.execute(select(State.id).where(State.country_id == parent_id, State.name == name)).scalar()
+        state_key = state_id or 0
+        _insert_ignore(connection, City, {'country_id': country_id, 'state_id': state_key, 'name': name})
+        return connection.execute(select(City.id).where(
+            City.country_id == country_id, City.state_id == state_key, City.name == name
+        )).scalar()
+    
+    def publish(self, pending):
+        """Cache aliases created by a committed transaction"""
+        with self._lock:
+            if self._ids is not None:
+                self._ids.update(pending)
+    
+    def after_fork(self):
+        """Reset the lock a writer thread may have held when the process forked"""
+        self._lock = threading.Lock()
+
+# Global geography directory
+geography = GeographyDirectory()
+
+def _pending(target):
+    session = Session.object_session(target)
+    return session.info.setdefault('geography_pending', {}) if session is not None else {}
+
+def _changed(target, names):
+    state = inspect(target)
+    return any(state.attrs[name].history.has_changes() for name in names)
+
+def _resolve_map(mapper, connection, target):
+    if target.country_id is None or _changed(target, ('country', 'state', 'city')):
+        target.country_id, target.state_id, target.city_id = geography.resolve(
+            connection, _pending(target), target.country, target.state, target.city
+        )
+
+def _resolve_user(mapper, connection, target):
+    if (target.country_id is None and target.country) or _changed(target, ('country', 'region')):
+        target.country_id, target.state_id, _ = geography.resolve(
+            connection, _pending(target), target.country, target.region
+        )
+
+def _resolve_download(mapper, connection, target):
+    if target.country_id is None and target.map_id is not None:
+        target.country_id = connection.execute(
+            select(Map.country_id).where(Map.id == target.map_id)
+        ).scalar()
+
+event.listen(Map, 'before_insert', _resolve_map)
+event.listen(Map, 'before_update', _resolve_map)
+event.listen(User, 'before_insert', _resolve_user)
+event.listen(User, 'before_update', _resolve_user)
+event.listen(Download, 'before_insert', _resolve_download)
+
+@event.listens_for(Session, 'after_commit')
+def _publish_geography(session):
+    pending = session.info.pop('geography_pending', None)
+    if pending:
+        geography.publish(pending)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_geography(session):
+    # Rows created in a rolled back transaction are gone: never cache their ids
+    session.info.pop('geography_pending', None)
+
+def _equals(column, value):
+    return column.is_(None) if value is None else column == value
+
+def backfill_geography(session, batch_size=10000):
+    """Fill the geography ids of maps, users and downloads written before the dimension existed"""
+    connection = session.connection()
+    pending = session.info.setdefault('geography_pending', {})
+    
+    maps = 0
+    for country, state, city in session.query(Map.country, Map.state, Map.city).filter(
+            Map.country_id == None).distinct().all():
+        country_id, state_id, city_id = geography.resolve(connection, pending, country, state, city)
+        maps += session.query(Map).filter(
+            Map.country_id == None, Map.country == country, _equals(Map.state, state), _equals(Map.city, city)
+        ).update({'country_id': country_id, 'state_id': state_id, 'city_id': city_id}, synchronize_session=False)
+    
+    users = 0
+    for country, region in session.query(User.country, User.region).filter(
+            User.country_id == None, User.country != None).distinct().all():
+        country_id, state_id, _ = geography.resolve(connection, pending, country, region)
+        users += session.query(User).filter(
+            User.country_id == None, User.country == country, _equals(User.region, region)
+        ).update({'country_id': country_id, 'state_id': state_id}, synchronize_session=False)
+    session.commit()
+    
+    # Downloads take their map's country, in batches so a large table is not locked at once
+    downloads = 0
+    while True:
+        result = session.execute(text(
+            "UPDATE downloads SET country_id = (SELECT maps.country_id FROM maps WHERE maps.id = downloads.map_id) "
+            "WHERE id IN (SELECT id FROM downloads WHERE country_id IS NULL AND map_id IN "
+            "(SELECT id FROM maps WHERE country_id IS NOT NULL) LIMIT :batch)"
+        ), {'batch': batch_size})
+        session.commit()
+        downloads += result.rowcount
+        if result.rowcount < batch_size:
+            break
+    
+    if maps or users or downloads:
+        logger.info(f"🌎 Geography backfill: {maps} maps, {users} users, {downloads} downloads")
+    return {'maps': maps, 'users': users, 'downloads': downloads}
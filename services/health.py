@@ -0,0 +1,107 @@
+"""
+Health metrics cache for KingGroup backend
+Keeps table counts off the probe path by refreshing them in the background
+"""
+import os
+import time
+import logging
+import datetime
+import threading
+from sqlalchemy import text
+from config.database import db_config
+
+logger = logging.getLogger(__name__)
+
+# Tables reported by the detailed /health endpoint
+HEALTH_TABLES = ('users', 'maps', 'downloads')
+
+class HealthMetricsCache:
+    """Periodically refreshed table counts for the detailed health check"""
+    
+    def __init__(self, ttl_seconds=None):
+        self.ttl_seconds = ttl_seconds or int(os.environ.get('HEALTH_METRICS_TTL', 300))
+        self._counts = None
+        self._source = None
+        self._refreshed_at = None
+        self._refreshed_monotonic = 0.0
+        self._last_error = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+    
+    def is_stale(self):
+        """Check whether the cached counts are older than the TTL"""
+        return self._counts is None or time.monotonic() - self._refreshed_monotonic > self.ttl_seconds
+    
+    def get(self):
+        """Return the cached counts, scheduling a background refresh when stale"""
+        if self.is_stale():
+            self._schedule_refresh()
+        
+        return {
+            'counts': self._counts,
+            'source': self._source,
+            'refreshed_at': self._refreshed_at.isoformat() if self._refreshed_at else None,
+            'age_seconds': round(time.monotonic() - self._refreshed_monotonic, 1) if self._refreshed_at else None,
+            'last_error': self._last_error
+        }
+    
+    def _schedule_refresh(self):
+        """Start a refresh thread unless one is already running"""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        
+        threading.Thread(target=self.refresh, name='health-metrics-refresh', daemon=True).start()
+    
+    def refresh(self):
+        """Reload counts from table statistics (PostgreSQL) or COUNT(*) (SQLite)"""
+        try:
+            with db_config.engine.connect() as connection:
+                if db_config.is_postgres():
+                    counts = self._postgres_estimates(connection)
+                    source = 'pg_class.reltuples'
+                else:
+                    counts = self._exact_counts(connection)
+                    source = 'count'
+            
+            self._counts = counts
+            self._source = source
+            self._refreshed_at = datetime.datetime.utcnow()
+            self._refreshed_monotonic = time.monotonic()
+            self._last_error = None
+            
+        except Exception as e:
+            self._last_error = str(e)
+            logger.warning(f"⚠️ Health metrics refresh failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+    
+    def after_fork(self):
+        """Reset locks that a refresh thread may have held when the process forked"""
+        self._lock = threading.Lock()
+        self._refreshing = False
+    
+    @staticmethod
+    def _postgres_estimates(connection):
+        """Read planner row estimates instead of scanning the tables"""
+        rows = connection.execute(text(
+            "SELECT relname, reltuples::bigint AS estimate FROM pg_class "
+            "WHERE relkind IN ('r', 'p') AND relname IN ('users', 'maps', 'downloads')"
+        )).all()
+        
+        # reltuples is -1 until the table has been vacuumed or analyzed
+        estimates = {row.relname: (row.estimate if row.estimate >= 0 else None) for row in rows}
+        return {table: estimates.get(table) for table in HEALTH_TABLES}
+    
+    @staticmethod
+    def _exact_counts(connection):
+        """Count rows directly, acceptable for the small SQLite fallback"""
+        return {
+            table: connection.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+            for table in HEALTH_TABLES
+        }
+
+# Global health metrics cache
+health_metrics = HealthMetricsCache()
@@ -0,0 +1,149 @@
+"""
+Last-seen tracker for KingGroup backend
+Coalesces per-request last_seen_at and per-login last_login writes into one batched UPDATE
+"""
+import os
+import atexit
+import logging
+import datetime
+import threading
+from sqlalchemy import bindparam, or_
+from models.user import User
+from config.database import db_config
+
+logger = logging.getLogger(__name__)
+
+class LastSeenTracker:
+    """Per-worker user id → latest time, flushed at most flush_seconds after the first unflushed touch"""
+    
+    def __init__(self, flush_seconds=None, max_pending=None):
+        self.flush_seconds = flush_seconds or float(os.environ.get('LAST_SEEN_FLUSH_SECONDS', 60))
+        self.max_pending = max_pending or int(os.environ.get('LAST_SEEN_MAX_PENDING', 5000))
+        self._seen = {}
+        self._logins = {}
+        self._lock = threading.Lock()
+        self._timer = None
+        self._flushing = False
+    
+    def touch(self, user_id, at=None):
+        """Record an authenticated request by user_id"""
+        self._record(user_id, at or datetime.datetime.utcnow(), login=False)
+    
+    def login(self, user_id, at=None):
+        """Record a login by user_id (also counts as seen); returns the login time"""
+        at = at or datetime.datetime.utcnow()
+        self._record(user_id, at, login=True)
+        return at
+    
+    def _record(self, user_id, at, login):
+        with self._lock:
+            if self._seen.get(user_id, at) <= at:
+                self._seen[user_id] = at
+            if login:
+                self._logins[user_id] = at
+            pending = len(self._seen)
+            # Bounded staleness: the first unflushed touch arms the flush
+            timer = self._arm()
+        if timer is not None:
+            timer.start()
+        if pending >= self.max_pending:
+            self._schedule_flush()
+    
+    def _arm(self):
+        """New flush timer unless one is already armed (call with the lock held)"""
+        if self._timer is not None:
+            return None
+        self._timer = threading.Timer(self.flush_seconds, self._run_flush)
+        self._timer.daemon = True
+        return self._timer
+    
+    def pending(self):
+        """Number of users with an unflushed last-seen time"""
+        return len(self._seen)
+    
+    def flush(self):
+        """Write pending times in one executemany UPDATE per column; returns the number of users"""
+        with self._lock:
+            seen, self._seen = self._seen, {}
+            logins, self._logins = self._logins, {}
+        if not seen:
+            return 0
+        
+        users = User.__table__
+        at, login_at = bindparam('at'), bindparam('login_at')
+        try:
+            with db_config.engine.begin() as connection:
+                # Never move a time backwards (another worker may have flushed a later one);
+                # updated_at is kept so activity does not look like a profile change
+                connection.execute(
+                    users.update().where(
+                        users.c.id == bindparam('user_id'),
+                        or_(users.c.last_seen_at == None, users.c.last_seen_at < at)
+                    ).values(last_seen_at=at, updated_at=users.c.updated_at),
+                    [{'user_id': user_id, 'at': seen_at} for user_id, seen_at in seen.items()]
+                )
+                if logins:
+                    connection.execute(
+                        users.update().where(
+                            users.c.id == bindparam('user_id'),
+                            or_(users.c.last_login == None, users.c.last_login < login_at)
+                        ).values(last_login=login_at, updated_at=users.c.updated_at),
+                        [{'user_id': user_id, 'login_at': logged_in_at} for user_id, logged_in_at in logins.items()]
+                    )
+        except Exception:
+            # Keep the times for the next attempt
+            with self._lock:
+                for pending, flushed in ((self._seen, seen), (self._logins, logins)):
+                    for user_id, flushed_at in flushed.items():
+                        if pending.get(user_id, flushed_at) <= flushed_at:
+                            pending[user_id] = flushed_at
+            raise
+        return len(seen)
+    
+    def _run_flush(self):
+        with self._lock:
+            self._timer = None
+        try:
+            count = self.flush()
+            if count:
+                logger.debug(f"👣 Flushed last-seen times of {count} users")
+        except Exception as e:
+            logger.warning(f"⚠️ Last-seen flush failed: {str(e)}")
+            with self._lock:
+                timer = self._arm() if self._seen else None
+            if timer is not None:
+                timer.start()
+    
+    def _schedule_flush(self):
+        with self._lock:
+            if self._flushing:
+                return
+            self._flushing = True
+        
+        def run():
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"⚠️ Last-seen flush failed: {str(e)}")
+            finally:
+                self._flushing = False
+        
+        threading.Thread(target=run, name='last-seen-flush', daemon=True).start()
+    
+    def after_fork(self):
+        """Reset the lock and timer and drop the master's pending times (every worker would flush them)"""
+        self._lock = threading.Lock()
+        self._timer = None
+        self._flushing = False
+        self._seen = {}
+        self._logins = {}
+
+def _flush_at_exit():
+    try:
+        last_seen.flush()
+    except Exception as e:
+        logger.warning(f"⚠️ Last-seen flush at exit failed: {str(e)}")
+
+# Global last-seen tracker, fed by authenticated requests and logins
+last_seen = LastSeenTracker()
+atexit.register(_flush_at_exit)
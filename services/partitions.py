@@ -0,0 +1,362 @@
+"""
+Download partitioning for KingGroup backend
+Monthly partitions for downloads, rolled out of the hot table and archived to columnar files
+"""
+import os
+import re
+import gzip
+import json
+import logging
+import datetime
+import tempfile
+from sqlalchemy import text, inspect
+from config.database import db_config
+from models.download import Download
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Optional: falls back to gzip'd JSON column chunks
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+PARTITION_NAME = re.compile(r'^downloads_p(\d{4})_(\d{2})$')
+ARCHIVE_CHUNK_ROWS = 50000
+# pg_advisory_xact_lock key serializing partition DDL across instances
+PARTITION_LOCK_KEY = 0x6b67646c
+
+def month_start(value):
+    return datetime.date(value.year, value.month, 1)
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month):
+    return f'downloads_p{month.year:04d}_{month.month:02d}'
+
+def partition_month(name):
+    match = PARTITION_NAME.match(name)
+    return datetime.date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+class DownloadPartitionManager:
+    """Keeps the downloads table to the last few months and archives the rest"""
+    
+    # PostgreSQL (DOWNLOADS_PARTITIONING=true): downloads is natively partitioned
+    # by month and closed months past the hot window are detached. Otherwise
+    # those months are moved into their own table. Either way they stay
+    # readable through the downloads_all view until archived.
+    
+    def __init__(self, hot_months=None, retention_months=None, archive_dir=None):
+        self.hot_months = hot_months or int(os.environ.get('DOWNLOADS_HOT_MONTHS', 3))
+        self.retention_months = retention_months or int(os.environ.get('DOWNLOADS_RETENTION_MONTHS', 12))
+        self.archive_dir = archive_dir or os.environ.get('DOWNLOADS_ARCHIVE_DIR', os.path.join('archive', 'downloads'))
+        self.native_partitioning = os.environ.get('DOWNLOADS_PARTITIONING', 'false').lower() == 'true'
+        self.columns = [column.name for column in Download.__table__.columns]
+        self.column_types = {column.name: column.type.python_type for column in Download.__table__.columns}
+    
+    def is_partitioned(self, connection):
+        """Whether downloads is a native partitioned table (PostgreSQL only)"""
+        if connection.dialect.name != 'postgresql':
+            return False
+        return connection.execute(text(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('downloads')"
+        )).first() is not None
+    
+    def _lock(self, connection):
+        """Serialize partition DDL with other instances until the transaction ends"""
+        if connection.dialect.name == 'postgresql':
+            connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': PARTITION_LOCK_KEY})
+    
+    def prepare(self, months_ahead=2):
+        """Create upcoming months of a partitioned downloads table, refresh downloads_all"""
+        with db_config.engine.begin() as connection:
+            self._lock(connection)
+            if connection.dialect.name == 'postgresql' and self.native_partitioning:
+                if self.is_partitioned(connection):
+                    self._create_partitions(connection, months_ahead)
+                else:
+                    logger.warning("⚠️ downloads is not partitioned yet: run download_retention.py to convert it")
+            self._refresh_view(connection)
+    
+    def migrate(self, months_ahead=2):
+        """Convert downloads to a natively partitioned table once; True if it was converted"""
+        if not self.native_partitioning:
+            return False
+        with db_config.engine.begin() as connection:
+            if connection.dialect.name != 'postgresql':
+                return False
+            self._lock(connection)
+            # Checked under the lock: another instance may have converted it meanwhile
+            if self.is_partitioned(connection):
+                return False
+            self._migrate_to_partitioned(connection)
+            self._create_partitions(connection, months_ahead)
+            self._refresh_view(connection)
+        return True
+    
+    def _migrate_to_partitioned(self, connection):
+        logger.info("🧱 Converting downloads to a monthly partitioned table...")
+        connection.execute(text("LOCK TABLE downloads IN ACCESS EXCLUSIVE MODE"))
+        sequence = connection.execute(text("SELECT pg_get_serial_sequence('downloads', 'id')")).scalar()
+        
+        # Free the names the partitioned table is going to use
+        for index in inspect(connection).get_indexes('downloads'):
+            connection.execute(text(f'DROP INDEX IF EXISTS "{index["name"]}"'))
+        connection.execute(text("ALTER TABLE downloads RENAME TO downloads_unpartitioned"))
+        connection.execute(text("ALTER INDEX IF EXISTS downloads_pkey RENAME TO downloads_unpartitioned_pkey"))
+        
+        # The partition key has to be part of every unique constraint
+        connection.execute(text(
+            "CREATE TABLE downloads (LIKE downloads_unpartitioned INCLUDING DEFAULTS) "
+            "PARTITION BY RANGE (download_date)"
+        ))
+        connection.execute(text("ALTER TABLE downloads ADD PRIMARY KEY (id, download_date)"))
+        connection.execute(text("ALTER TABLE downloads ADD FOREIGN KEY (user_id) REFERENCES users (id)"))
+        connection.execute(text("ALTER TABLE downloads ADD FOREIGN KEY (map_id) REFERENCES maps (id)"))
+        if sequence:
+            connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY downloads.id"))
+        
+        first = connection.execute(text("SELECT MIN(download_date) FROM downloads_unpartitioned")).scalar()
+        self._create_partitions(connection, 0, since=month_start(first) if first else None)
+        connection.execute(text("CREATE TABLE IF NOT EXISTS downloads_default PARTITION OF downloads DEFAULT"))
+        
+        columns = ', '.join(self.columns)
+        select_columns = columns.replace('download_date', 'COALESCE(download_date, started_at, now())')
+        connection.execute(text(
+            f"INSERT INTO downloads ({columns}) SELECT {select_columns} FROM downloads_unpartitioned"
+        ))
+        connection.execute(text("DROP TABLE downloads_unpartitioned"))
+        
+        # Indexes on the parent cascade to every partition
+        for index in Download.__table__.indexes:
+            index.create(bind=connection)
+        logger.info("✅ downloads is now partitioned by month")
+    
+    def _create_partitions(self, connection, months_ahead, since=None):
+        """Create monthly partitions from since (default: this month) to months_ahead"""
+        current = month_start(datetime.date.today())
+        month = since or current
+        last = add_months(current, months_ahead)
+        while month <= last:
+            upper = add_months(month, 1)
+            connection.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF downloads "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+            ))
+            month = upper
+    
+    def attached_months(self, connection):
+        """Months still in the hot table"""
+        if self.is_partitioned(connection):
+            rows = connection.execute(text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = 'downloads'::regclass"
+            ))
+            months = [partition_month(row[0]) for row in rows]
+        else:
+            rows = connection.execute(text(
+                "SELECT DISTINCT substr(CAST(download_date AS TEXT), 1, 7) FROM downloads "
+                "WHERE download_date IS NOT NULL"
+            ))
+            months = [datetime.date(int(row[0][:4]), int(row[0][5:7]), 1) for row in rows if row[0]]
+        return sorted(month for month in months if month)
+    
+    def detached_months(self, connection):
+        """Months moved out of the hot table but not archived yet"""
+        attached = set()
+        if self.is_partitioned(connection):
+            attached = {
+                row[0] for row in connection.execute(text(
+                    "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                    "WHERE i.inhparent = 'downloads'::regclass"
+                ))
+            }
+        names = inspect(connection).get_table_names()
+        return sorted(partition_month(name) for name in names if partition_month(name) and name not in attached)
+    
+    def _select_list(self, connection, table):
+        """Model columns of a detached month, with NULL for columns added after it was detached"""
+        present = {column['name'] for column in inspect(connection).get_columns(table)}
+        return ', '.join(column if column in present else f"NULL AS {column}" for column in self.columns)
+    
+    def source_table(self, connection):
+        """downloads_all when it exists (hot + detached months), else downloads"""
+        return 'downloads_all' if 'downloads_all' in inspect(connection).get_view_names() else 'downloads'
+    
+    def _refresh_view(self, connection):
+        """downloads_all = hot table + detached months, for exports and rollups"""
+        selects = [f"SELECT {', '.join(self.columns)} FROM downloads"]
+        selects += [
+            f"SELECT {self._select_list(connection, partition_name(month))} FROM {partition_name(month)}"
+            for month in self.detached_months(connection)
+        ]
+        connection.execute(text("DROP VIEW IF EXISTS downloads_all"))
+        connection.execute(text("CREATE VIEW downloads_all AS " + " UNION ALL ".join(selects)))
+    
+    def roll(self):
+        """Move closed months older than the hot window out of downloads"""
+        cutoff = add_months(month_start(datetime.date.today()), -self.hot_months + 1)
+        rolled = []
+        with db_config.engine.begin() as connection:
+            partitioned = self.is_partitioned(connection)
+            for month in self.attached_months(connection):
+                if month >= cutoff:
+                    continue
+                name = partition_name(month)
+                if partitioned:
+                    connection.execute(text(f"ALTER TABLE downloads DETACH PARTITION {name}"))
+                else:
+                    self._move_month(connection, month, name)
+                rolled.append(month.isoformat()[:7])
+            self._refresh_view(connection)
+        
+        if rolled:
+            logger.info(f"🧊 Moved out of the hot downloads table: {', '.join(rolled)}")
+        return rolled
+    
+    def _move_month(self, connection, month, name):
+        bounds = {'lower': month.isoformat(), 'upper': add_months(month, 1).isoformat()}
+        where = "download_date >= :lower AND download_date < :upper"
+        if name in inspect(connection).get_table_names():
+            connection.execute(text(f"INSERT INTO {name} SELECT * FROM downloads WHERE {where}"), bounds)
+        else:
+            connection.execute(text(f"CREATE TABLE {name} AS SELECT * FROM downloads WHERE {where}"), bounds)
+        connection.execute(text(f"DELETE FROM downloads WHERE {where}"), bounds)
+    
+    def archive(self):
+        """Write detached months past retention to compressed columnar files and drop them"""
+        cutoff = add_months(month_start(datetime.date.today()), -self.retention_months + 1)
+        archived = []
+        with db_config.engine.connect() as connection:
+            months = [month for month in self.detached_months(connection) if month < cutoff]
+        
+        for month in months:
+            name = partition_name(month)
+            with db_config.engine.begin() as connection:
+                path, rows = self._write_archive(connection, name)
+                expected = connection.execute(text(f"SELECT COUNT(*) FROM {name}")).scalar()
+                if rows != expected:
+                    raise RuntimeError(f"Archive of {name} has {rows} rows, table has {expected}")
+                connection.execute(text(f"DROP TABLE {name}"))
+                self._refresh_view(connection)
+            self._record_manifest(month, path, rows)
+            archived.append({'month': month.isoformat()[:7], 'rows': rows, 'file': path})
+            logger.info(f"📦 Archived {name}: {rows} rows → {path}")
+        return archived
+    
+    def run_retention(self):
+        """Create upcoming partitions, roll the hot window, archive past retention"""
+        self.prepare()
+        return {'rolled': self.roll(), 'archived': self.archive()}
+    
+    def status(self):
+        with db_config.engine.connect() as connection:
+            return {
+                'partitioned': self.is_partitioned(connection),
+                'hot_months': [month.isoformat()[:7] for month in self.attached_months(connection)],
+                'detached_months': [month.isoformat()[:7] for month in self.detached_months(connection)],
+                'archived_months': sorted(self._read_manifest()),
+                'hot_window_months': self.hot_months,
+                'retention_months': self.retention_months
+            }
+    
+    def _write_archive(self, connection, name):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        extension = 'parquet' if pyarrow is not None else 'columns.json.gz'
+        path = os.path.join(self.archive_dir, f'{name}.{extension}')
+        descriptor, temporary = tempfile.mkstemp(dir=self.archive_dir, prefix='.archive-')
+        os.close(descriptor)
+        
+        result = connection.execution_options(stream_results=True).execute(
+            text(f"SELECT {self._select_list(connection, name)} FROM {name} ORDER BY id"))
+        rows = 0
+        try:
+            writer = None
+            output = None if pyarrow is not None else gzip.open(temporary, 'wt', encoding='utf-8')
+            while True:
+                chunk = result.fetchmany(ARCHIVE_CHUNK_ROWS)
+                if not chunk:
+                    break
+                # One column per array: a row group (Parquet) or one JSON line per chunk
+                columns = {column: [_plain(row[index]) for row in chunk] for index, column in enumerate(self.columns)}
+                if pyarrow is not None:
+                    if writer is None:
+                        writer = pyarrow.parquet.ParquetWriter(temporary, self._arrow_schema(), compression='zstd')
+                    writer.write_table(pyarrow.table(columns, schema=writer.schema))
+                else:
+                    output.write(json.dumps({'columns': columns}) + '\n')
+                rows += len(chunk)
+            if writer is not None:
+                writer.close()
+            if output is not None:
+                output.close()
+            if pyarrow is not None and writer is None:
+                # Empty month: still leave a readable file
+                pyarrow.parquet.write_table(self._arrow_schema().empty_table(), temporary)
+            os.chmod(temporary, 0o644)
+            os.replace(temporary, path)
+        except Exception:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return path, rows
+    
+    def _arrow_schema(self):
+        """Parquet schema from the model (dates are stored as ISO strings)"""
+        arrow_types = {int: pyarrow.int64(), float: pyarrow.float64(), bool: pyarrow.bool_()}
+        return pyarrow.schema([
+            (column, arrow_types.get(self.column_types[column], pyarrow.string())) for column in self.columns
+        ])
+    
+    def _manifest_path(self):
+        return os.path.join(self.archive_dir, 'manifest.json')
+    
+    def _read_manifest(self):
+        try:
+            with open(self._manifest_path()) as manifest_file:
+                return json.load(manifest_file)
+        except (OSError, ValueError):
+            return {}
+    
+    def _record_manifest(self, month, path, rows):
+        manifest = self._read_manifest()
+        manifest[month.isoformat()[:7]] = {
+            'file': os.path.basename(path),
+            'rows': rows,
+            'archived_at': datetime.datetime.utcnow().isoformat()
+        }
+        temporary = self._manifest_path() + '.tmp'
+        with open(temporary, 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+        os.replace(temporary, self._manifest_path())
+    
+    def iter_archived_rows(self, since=None, until=None):
+        """Yield archived downloads as dicts, month by month ('YYYY-MM' bounds, inclusive)"""
+        for month, entry in sorted(self._read_manifest().items()):
+            if (since and month < since) or (until and month > until):
+                continue
+            path = os.path.join(self.archive_dir, entry['file'])
+            if path.endswith('.parquet'):
+                if pyarrow is None:
+                    raise RuntimeError(f"pyarrow is required to read {path}")
+                parquet_file = pyarrow.parquet.ParquetFile(path)
+                for group in range(parquet_file.num_row_groups):
+                    yield from parquet_file.read_row_group(group).to_pylist()
+            else:
+                with gzip.open(path, 'rt', encoding='utf-8') as archive_file:
+                    for line in archive_file:
+                        columns = json.loads(line)['columns']
+                        names = list(columns)
+                        for values in zip(*(columns[name] for name in names)):
+                            yield dict(zip(names, values))
+
+def _plain(value):
+    """Column value in a type both archive formats store the same way"""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+# Global partition manager
+download_partitions = DownloadPartitionManager()
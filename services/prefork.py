@@ -0,0 +1,54 @@
+"""
+Pre-fork support for KingGroup backend
+Warm read-only state in the master, make each forked worker fork-safe
+"""
+import gc
+import logging
+from config.database import db_config
+from .catalogue import catalogue_cache
+from .catalogue_artifact import catalogue_artifacts
+from .health import health_metrics
+from .entitlements import entitlements
+from .trending import trending
+from .sketches import download_sketches
+from .corridor import corridor_index
+from .region_tree import region_tree
+from .geography import geography
+from .last_seen import last_seen
+
+logger = logging.getLogger(__name__)
+
+def warm_shared_state():
+    """Load read-only caches in the master so workers share them copy-on-write"""
+    try:
+        snapshot = catalogue_cache.load()
+        catalogue_artifacts.build(snapshot)
+    except Exception as e:
+        logger.warning(f"⚠️ Catalogue warm-up failed: {str(e)}")
+    try:
+        # The one full downloads scan; workers only read newer rows afterwards
+        trending.load()
+    except Exception as e:
+        logger.warning(f"⚠️ Trending warm-up failed: {str(e)}")
+    
+    # Connections must not cross the fork
+    db_config.dispose()
+    
+    # Move everything allocated so far out of the GC's reach: collections in
+    # the workers would otherwise touch (and copy) every shared page
+    gc.collect()
+    gc.freeze()
+
+def after_fork_in_child():
+    """Reset pools, locks and threads a worker inherited from the master"""
+    db_config.after_fork()
+    catalogue_cache.after_fork()
+    catalogue_artifacts.after_fork()
+    health_metrics.after_fork()
+    entitlements.after_fork()
+    trending.after_fork()
+    download_sketches.after_fork()
+    corridor_index.after_fork()
+    region_tree.after_fork()
+    geography.after_fork()
+    last_seen.after_fork()
@@ -0,0 +1,130 @@
+"""
+Region tree for KingGroup backend
+Country → state → city hierarchy with per-node map aggregates, patched on catalogue reloads
+"""
+import logging
+import threading
+from .catalogue import catalogue_cache
+
+logger = logging.getLogger(__name__)
+
+class RegionNode:
+    """Aggregates of every map at or below one region"""
+    __slots__ = ('name', 'map_count', 'total_size', 'premium_count', 'map_types', 'children')
+    
+    def __init__(self, name):
+        self.name = name
+        self.map_count = 0
+        self.total_size = 0
+        self.premium_count = 0
+        self.map_types = {}
+        self.children = {}
+    
+    def apply(self, contribution, sign):
+        _, _, _, file_size, is_premium, map_type = contribution
+        self.map_count += sign
+        self.total_size += sign * file_size
+        self.premium_count += sign * is_premium
+        count = self.map_types.get(map_type, 0) + sign
+        if count:
+            self.map_types[map_type] = count
+        else:
+            self.map_types.pop(map_type, None)
+    
+    def to_dict(self):
+        node = {
+            'name': self.name,
+            'map_count': self.map_count,
+            'total_size': self.total_size,
+            'premium_count': self.premium_count,
+            'map_types': dict(sorted(self.map_types.items()))
+        }
+        if self.children:
+            node['children'] = [self.children[name].to_dict() for name in sorted(self.children)]
+        return node
+
+def _contribution(map_data):
+    """The fields of a map the tree aggregates (a map moves or changes iff this changes)"""
+    return (map_data['country'], map_data.get('state'), map_data.get('city'),
+            map_data.get('file_size') or 0, bool(map_data.get('is_premium')), map_data.get('map_type'))
+
+class RegionTree:
+    """In-memory region hierarchy, kept in step with the catalogue by diffing snapshots"""
+    
+    def __init__(self):
+        self._root = RegionNode(None)
+        self._contributions = {}
+        self._version = None
+        self._rendered = None
+        self._cache = None
+        self._lock = threading.Lock()
+    
+    def attach(self, cache):
+        """Patch the tree after every reload of cache"""
+        self._cache = cache
+        cache.subscribe(self.update)
+    
+    def update(self, snapshot):
+        """Apply the maps that were added, removed or moved since the last snapshot"""
+        with self._lock:
+            if snapshot.version == self._version:
+                return 0
+            changed = 0
+            contributions = {map_id: _contribution(map_data) for map_id, map_data in snapshot.by_id.items()}
+            for map_id, old in self._contributions.items():
+                new = contributions.get(map_id)
+                if new != old:
+                    self._apply(old, -1)
+                    changed += 1
+            for map_id, new in contributions.items():
+                if self._contributions.get(map_id) != new:
+                    self._apply(new, 1)
+                    changed += 1
+            self._contributions = contributions
+            self._version = snapshot.version
+            if changed:
+                self._rendered = None
+        if changed:
+            logger.info(f"🌎 Region tree patched with {changed} map changes (v{snapshot.version})")
+        return changed
+    
+    def _apply(self, contribution, sign):
+        node = self._root
+        node.apply(contribution, sign)
+        path = []
+        # Maps without a state (or city) count towards their parent only
+        for name in contribution[:3]:
+            if not name:
+                break
+            path.append((node, name))
+            child = node.children.get(name)
+            if child is None:
+                child = node.children[name] = RegionNode(name)
+            child.apply(contribution, sign)
+            node = child
+        
+        # Drop regions whose last map left, deepest first
+        for parent, name in reversed(path):
+            if parent.children[name].map_count == 0:
+                del parent.children[name]
+    
+    def render(self):
+        """(version, tree dict) for the current catalogue, rendered at most once per change"""
+        snapshot = self._cache.snapshot()
+        if snapshot.version != self._version:
+            self.update(snapshot)
+        with self._lock:
+            if self._rendered is None:
+                root = self._root.to_dict()
+                root.pop('name')
+                root['countries'] = root.pop('children', [])
+                self._rendered = root
+            return self._version, self._rendered
+    
+    def after_fork(self):
+        """Reset the lock a reload thread may have held when the process forked"""
+        self._lock = threading.Lock()
+
+# Global region tree, fed by the catalogue cache
+region_tree = RegionTree()
+region_tree.attach(catalogue_cache)
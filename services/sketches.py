@@ -0,0 +1,398 @@
+"""
+Download analytics sketches for KingGroup backend
+Space-Saving heavy hitters and HyperLogLog distinct counts, merged across workers
+"""
+import os
+import math
+import json
+import time
+import zlib
+import atexit
+import hashlib
+import logging
+import datetime
+import threading
+from sqlalchemy import text, insert
+from models.analytics_sketch import AnalyticsSketch
+from config.database import db_config
+from .catalogue import catalogue_cache
+from .events import event_bus, DOWNLOAD_TOPIC
+from .partitions import download_partitions
+
+logger = logging.getLogger(__name__)
+
+DAY_FORMAT = '%Y-%m-%d'
+HOUR_FORMAT = '%Y-%m-%dT%H'
+
+class SpaceSaving:
+    """Top-K counter: every count overestimates by at most its error, itself at most total / capacity"""
+    
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.total = 0
+        self._counts = {}
+        self._errors = {}
+    
+    def offer(self, item, weight=1):
+        """Count weight occurrences of item"""
+        self.total += weight
+        counts = self._counts
+        if item in counts:
+            counts[item] += weight
+        elif len(counts) < self.capacity:
+            counts[item] = weight
+            self._errors[item] = 0
+        else:
+            # Replace the smallest counter; its count becomes the newcomer's error
+            victim = min(counts, key=counts.get)
+            floor = counts.pop(victim)
+            del self._errors[victim]
+            counts[item] = floor + weight
+            self._errors[item] = floor
+    
+    def floor(self):
+        """Upper bound on the count of any item not monitored"""
+        return min(self._counts.values()) if len(self._counts) >= self.capacity else 0
+    
+    def merge(self, other):
+        """Fold another summary in (mergeable summaries, Agarwal et al. 2012)"""
+        floor, other_floor = self.floor(), other.floor()
+        merged = []
+        for item in set(self._counts) | set(other._counts):
+            count = error = 0
+            for summary, summary_floor in ((self, floor), (other, other_floor)):
+                if item in summary._counts:
+                    count += summary._counts[item]
+                    error += summary._errors[item]
+                else:
+                    count += summary_floor
+                    error += summary_floor
+            merged.append((count, error, item))
+        merged.sort(key=lambda entry: entry[0], reverse=True)
+        
+        self.capacity = max(self.capacity, other.capacity)
+        self.total += other.total
+        self._counts = {item: count for count, _, item in merged[:self.capacity]}
+        self._errors = {item: error for _, error, item in merged[:self.capacity]}
+    
+    def top(self, limit=None):
+        """[(item, count, error)] highest count first; the true count lies in [count - error, count]"""
+        entries = sorted(self._counts.items(), key=lambda entry: entry[1], reverse=True)
+        return [(item, count, self._errors[item]) for item, count in entries[:limit]]
+    
+    def max_error(self):
+        return self.total / self.capacity if self.capacity else 0
+    
+    def encode(self):
+        body = {'capacity': self.capacity, 'total': self.total,
+                'items': [[item, count, error] for item, count, error in self.top()]}
+        return b'S' + zlib.compress(json.dumps(body, separators=(',', ':')).encode('utf-8'))
+    
+    @classmethod
+    def decode(cls, data):
+        body = json.loads(zlib.decompress(data[1:]))
+        summary = cls(body['capacity'])
+        summary.total = body['total']
+        for item, count, error in body['items']:
+            summary._counts[item] = count
+            summary._errors[item] = error
+        return summary
+
+class HyperLogLog:
+    """Distinct counter in 2^precision one-byte registers, relative standard error 1.04 / sqrt(2^precision)"""
+    
+    def __init__(self, precision):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+    
+    def add(self, value):
+        hashed = int.from_bytes(hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest(), 'big')
+        width = 64 - self.precision
+        index = hashed >> width
+        rank = width - (hashed & ((1 << width) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+    
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError('HyperLogLog precisions differ')
+        self.registers = bytearray(map(max, self.registers, other.registers))
+    
+    def count(self):
+        """Estimated number of distinct values added"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small range: linear counting is more accurate
+            estimate = m * math.log(m / zeros)
+        return estimate
+    
+    def standard_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+    
+    def encode(self):
+        return b'H' + bytes([self.precision]) + zlib.compress(bytes(self.registers))
+    
+    @classmethod
+    def decode(cls, data):
+        sketch = cls(data[1])
+        sketch.registers = bytearray(zlib.decompress(data[2:]))
+        return sketch
+
+def decode_sketch(data):
+    """SpaceSaving or HyperLogLog from its encoded bytes"""
+    return SpaceSaving.decode(data) if data[:1] == b'S' else HyperLogLog.decode(data)
+
+class DownloadSketches:
+    """Per-worker pending downloads, folded into the analytics_sketches table on flush"""
+    
+    # Sketches kept per download (kind, period, key):
+    #   top_maps      hour, ''       | day, '' | day, country  → SpaceSaving of map ids
+    #   users         day, ''                                  → HyperLogLog of user ids
+    #   map_users     day, map id                              → HyperLogLog of user ids
+    #   country_users day, country                             → HyperLogLog of user ids
+    # A rebuilt day also has a ('rebuilt', day, '') row holding the last download id
+    # it counted; pending downloads up to that id are dropped at flush instead of
+    # being counted a second time.
+    
+    def __init__(self, top_k=None, precision=None, map_precision=None, flush_seconds=None,
+                 retention_days=None, hourly_retention_days=None):
+        self.top_k = top_k or int(os.environ.get('SKETCH_TOP_K', 100))
+        self.precision = precision or int(os.environ.get('SKETCH_HLL_PRECISION', 12))
+        self.map_precision = map_precision or int(os.environ.get('SKETCH_MAP_HLL_PRECISION', 10))
+        self.flush_seconds = flush_seconds or float(os.environ.get('SKETCH_FLUSH_SECONDS', 30))
+        self.retention_days = retention_days or int(os.environ.get('SKETCH_RETENTION_DAYS', 90))
+        self.hourly_retention_days = hourly_retention_days or int(os.environ.get('SKETCH_HOURLY_RETENTION_DAYS', 7))
+        self._pending = []
+        self._lock = threading.Lock()
+        self._timer = None
+    
+    def _new_sketch(self, kind):
+        if kind == 'top_maps':
+            return SpaceSaving(self.top_k)
+        return HyperLogLog(self.map_precision if kind == 'map_users' else self.precision)
+    
+    def _offer(self, sketches, kind, period, key, item):
+        sketch = sketches.get((kind, period, key))
+        if sketch is None:
+            sketch = sketches[(kind, period, key)] = self._new_sketch(kind)
+        if kind == 'top_maps':
+            sketch.offer(item)
+        else:
+            sketch.add(item)
+    
+    def _record_into(self, sketches, map_id, user_id, at, country):
+        day, hour = at.strftime(DAY_FORMAT), at.strftime(HOUR_FORMAT)
+        self._offer(sketches, 'top_maps', hour, '', map_id)
+        self._offer(sketches, 'top_maps', day, '', map_id)
+        self._offer(sketches, 'users', day, '', user_id)
+        self._offer(sketches, 'map_users', day, str(map_id), user_id)
+        if country:
+            self._offer(sketches, 'top_maps', day, country, map_id)
+            self._offer(sketches, 'country_users', day, country, user_id)
+    
+    def _sketches_of(self, downloads, rebuilt=None):
+        """Sketch deltas of (download_id, map_id, user_id, at, country) tuples, minus rebuilt ones"""
+        sketches = {}
+        for download_id, map_id, user_id, at, country in downloads:
+            through = (rebuilt or {}).get(at.strftime(DAY_FORMAT))
+            if through is not None and download_id is not None and download_id <= through:
+                continue
+            self._record_into(sketches, map_id, user_id, at, country)
+        return sketches
+    
+    def record(self, map_id, user_id, at=None, download_id=None):
+        """Count one download of map_id by user_id at time at (epoch seconds)"""
+        map_data = catalogue_cache.snapshot().by_id.get(map_id)
+        country = map_data.get('country') if map_data else None
+        at = datetime.datetime.fromtimestamp(at or time.time(), tz=datetime.timezone.utc)
+        with self._lock:
+            self._pending.append((download_id, map_id, user_id, at, country))
+            # Bounded staleness: the first pending download arms the flush
+            timer = self._arm()
+        if timer is not None:
+            timer.start()
+    
+    def _arm(self):
+        """New flush timer unless one is already armed (call with the lock held)"""
+        if self._timer is not None:
+            return None
+        self._timer = threading.Timer(self.flush_seconds, self._run_flush)
+        self._timer.daemon = True
+        return self._timer
+    
+    def flush(self):
+        """Merge pending downloads into the stored sketches; returns the number of rows written"""
+        with self._lock:
+            downloads, self._pending = self._pending, []
+        if not downloads:
+            return 0
+        
+        session = db_config.get_session()
+        try:
+            rebuilt = _rebuilt_through(session, {at.strftime(DAY_FORMAT) for _, _, _, at, _ in downloads})
+            pending = self._sketches_of(downloads, rebuilt)
+            for (kind, period, key), sketch in pending.items():
+                row = session.query(AnalyticsSketch).filter_by(
+                    kind=kind, period=period, sketch_key=key
+                ).with_for_update().first()
+                if row is None:
+                    session.add(AnalyticsSketch(kind=kind, period=period, sketch_key=key, data=sketch.encode()))
+                else:
+                    stored = decode_sketch(row.data)
+                    stored.merge(sketch)
+                    row.data = stored.encode()
+            self._purge(session)
+            session.commit()
+        except Exception:
+            session.rollback()
+            # Keep the downloads for the next attempt
+            with self._lock:
+                self._pending[:0] = downloads
+            raise
+        finally:
+            session.close()
+        return len(pending)
+    
+    def _purge(self, session):
+        today = datetime.datetime.utcnow().date()
+        day_cutoff = (today - datetime.timedelta(days=self.retention_days)).strftime(DAY_FORMAT)
+        hour_cutoff = (today - datetime.timedelta(days=self.hourly_retention_days)).strftime(DAY_FORMAT)
+        session.query(AnalyticsSketch).filter(
+            (AnalyticsSketch.period < day_cutoff) |
+            (AnalyticsSketch.period.like('%T%') & (AnalyticsSketch.period < hour_cutoff))
+        ).delete(synchronize_session=False)
+    
+    def _run_flush(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception as e:
+            logger.warning(f"⚠️ Sketch flush failed: {str(e)}")
+            with self._lock:
+                timer = self._arm() if self._pending else None
+            if timer is not None:
+                timer.start()
+    
+    def read(self, kind, period, key=''):
+        """Stored sketch merged with this worker's unflushed delta, or None"""
+        session = db_config.get_read_session()
+        try:
+            data = session.query(AnalyticsSketch.data).filter_by(
+                kind=kind, period=period, sketch_key=key
+            ).scalar()
+            rebuilt = _rebuilt_through(session, {period[:10]})
+        finally:
+            session.close()
+        
+        sketch = decode_sketch(data) if data is not None else None
+        with self._lock:
+            downloads = [download for download in self._pending if download[3].strftime(DAY_FORMAT) == period[:10]]
+        local = self._sketches_of(downloads, rebuilt).get((kind, period, key))
+        if local is None:
+            return sketch
+        if sketch is None:
+            return local
+        sketch.merge(local)
+        return sketch
+    
+    def top_maps(self, period, country='', limit=20):
+        """Heavy hitters of an hour or day, with per-item error bounds"""
+        sketch = self.read('top_maps', period, country)
+        if sketch is None:
+            return {'total': 0, 'max_error': 0, 'items': []}
+        return {
+            'total': sketch.total,
+            'max_error': sketch.max_error(),
+            'items': [
+                {'map_id': map_id, 'count': count, 'error': error, 'lower_bound': count - error}
+                for map_id, count, error in sketch.top(limit)
+            ]
+        }
+    
+    def distinct_users(self, day, map_id=None, country=None):
+        """Estimated distinct downloading users of a day, overall, for one map or for one country"""
+        if map_id is not None:
+            sketch = self.read('map_users', day, str(map_id))
+        elif country:
+            sketch = self.read('country_users', day, country)
+        else:
+            sketch = self.read('users', day)
+        if sketch is None:
+            return {'estimate': 0, 'standard_error': 0, 'interval_95': [0, 0]}
+        estimate, error = sketch.count(), sketch.standard_error()
+        return {
+            'estimate': round(estimate),
+            'standard_error': round(error, 4),
+            'interval_95': [max(0, math.floor(estimate * (1 - 2 * error))), math.ceil(estimate * (1 + 2 * error))]
+        }
+    
+    def rebuild(self, day):
+        """Replace a day's stored sketches with ones computed from the downloads table"""
+        start = datetime.datetime.strptime(day, DAY_FORMAT)
+        snapshot = catalogue_cache.snapshot()
+        sketches = {}
+        session = db_config.get_session()
+        try:
+            # Rolled-out months stay readable through downloads_all until archived
+            table = download_partitions.source_table(session.connection())
+            # Taken first: workers drop their pending downloads up to this id
+            through = session.execute(text(f"SELECT MAX(id) FROM {table}")).scalar() or 0
+            result = session.execute(
+                text(f"SELECT map_id, user_id, download_date FROM {table} "
+                     "WHERE download_date >= :start AND download_date < :end"),
+                {'start': start, 'end': start + datetime.timedelta(days=1)}
+            )
+            count = 0
+            for map_id, user_id, download_date in result:
+                if isinstance(download_date, str):
+                    download_date = datetime.datetime.fromisoformat(download_date)
+                map_data = snapshot.by_id.get(map_id)
+                self._record_into(sketches, map_id, user_id, download_date,
+                                  map_data.get('country') if map_data else None)
+                count += 1
+            
+            session.query(AnalyticsSketch).filter(
+                (AnalyticsSketch.period == day) | AnalyticsSketch.period.like(day + 'T%')
+            ).delete(synchronize_session=False)
+            rows = [
+                {'kind': kind, 'period': period, 'sketch_key': key, 'data': sketch.encode()}
+                for (kind, period, key), sketch in sketches.items()
+            ]
+            rows.append({'kind': 'rebuilt', 'period': day, 'sketch_key': '', 'data': str(through).encode()})
+            session.execute(insert(AnalyticsSketch), rows)
+            session.commit()
+        finally:
+            session.close()
+        logger.info(f"📊 Rebuilt {len(sketches)} sketches for {day} from {count} downloads")
+        return {'day': day, 'downloads': count, 'sketches': len(sketches)}
+    
+    def after_fork(self):
+        """Reset the lock and timer and drop the master's pending downloads (every worker would flush them)"""
+        self._lock = threading.Lock()
+        self._timer = None
+        self._pending = []
+
+def _rebuilt_through(session, days):
+    """Rebuilt day → last download id the rebuild counted"""
+    return {
+        period: int(data) for period, data in session.query(AnalyticsSketch.period, AnalyticsSketch.data).filter(
+            AnalyticsSketch.kind == 'rebuilt', AnalyticsSketch.period.in_(days)
+        )
+    }
+
+def _flush_at_exit():
+    try:
+        download_sketches.flush()
+    except Exception as e:
+        logger.warning(f"⚠️ Sketch flush at exit failed: {str(e)}")
+
+# Global download sketches, fed by committed downloads
+download_sketches = DownloadSketches()
+event_bus.subscribe(DOWNLOAD_TOPIC, lambda payload: download_sketches.record(
+    payload['map_id'], payload['user_id'], payload['at'], payload.get('download_id')
+))
+atexit.register(_flush_at_exit)
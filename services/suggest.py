@@ -0,0 +1,137 @@
+"""
+Typeahead index for KingGroup backend
+Sorted-array prefix index over map names and regions, accent-insensitive and popularity ranked
+"""
+import os
+import re
+import heapq
+import bisect
+import logging
+import unicodedata
+from .catalogue import catalogue_cache
+
+logger = logging.getLogger(__name__)
+
+SUGGESTION_KINDS = ('country', 'state', 'city', 'map')
+_SEPARATORS = re.compile(r'[^0-9a-z]+')
+
+def normalize(text):
+    """Lowercase, accent-free, single-spaced form used for keys and queries"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    folded = ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+    return _SEPARATORS.sub(' ', folded).strip()
+
+class SuggestIndex:
+    """Immutable prefix index built from one catalogue snapshot"""
+    
+    # Keys are the normalized label and every word suffix of it ("sao paulo",
+    # "paulo"), kept in one sorted array; a prefix is a contiguous range found
+    # by bisection. Short prefixes match too much to rank per keystroke, so
+    # their top completions are computed once at build time.
+    
+    def __init__(self, snapshot, precomputed_length, max_results):
+        self.version = snapshot.version
+        self.max_results = max_results
+        self.precomputed_length = precomputed_length
+        self.entries = []  # (weight, suggestion dict)
+        self._build_entries(snapshot)
+        
+        pairs = []
+        for position, (_, suggestion) in enumerate(self.entries):
+            words = normalize(suggestion['label']).split()
+            for start in range(len(words)):
+                pairs.append((' '.join(words[start:]), position))
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.positions = [position for _, position in pairs]
+        
+        self._top = {}
+        for prefix in {key[:length] for key in self.keys for length in range(1, precomputed_length + 1)}:
+            candidates = self._range(prefix)
+            self._top[(prefix, None)] = self._rank(candidates, None, max_results)
+            for kind in SUGGESTION_KINDS:
+                self._top[(prefix, kind)] = self._rank(candidates, kind, max_results)
+    
+    def _build_entries(self, snapshot):
+        regions = {}
+        for map_data in snapshot.by_id.values():
+            # Every map counts once so regions without downloads still rank by size
+            weight = (map_data.get('download_count') or 0) + 1
+            self.entries.append((weight, {
+                'type': 'map', 'id': map_data['id'], 'label': map_data['map_name'],
+                'country': map_data['country'], 'state': map_data.get('state'),
+                'city': map_data.get('city'), 'map_type': map_data['map_type']
+            }))
+            country, state, city = map_data['country'], map_data.get('state'), map_data.get('city')
+            for key in (('country', country, None, None),
+                        ('state', country, state, None) if state else None,
+                        ('city', country, state, city) if city else None):
+                if key:
+                    regions[key] = regions.get(key, 0) + weight
+        
+        for (kind, country, state, city), weight in regions.items():
+            label = {'country': country, 'state': state, 'city': city}[kind]
+            self.entries.append((weight, {
+                'type': kind, 'label': label, 'country': country,
+                'state': state if kind != 'country' else None,
+                'city': city if kind == 'city' else None
+            }))
+    
+    def _range(self, prefix):
+        """Entry positions whose keys start with prefix (duplicates removed)"""
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + '\uffff', start)
+        return set(self.positions[start:end])
+    
+    def _rank(self, positions, kind, limit):
+        entries = self.entries
+        if kind:
+            positions = [position for position in positions if entries[position][1]['type'] == kind]
+        return heapq.nlargest(limit, positions, key=lambda position: (entries[position][0], -position))
+    
+    def suggest(self, query, limit=10, kind=None):
+        """[(weight, suggestion)] for the best completions of query"""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        limit = min(limit, self.max_results)
+        if len(prefix) <= self.precomputed_length:
+            ranked = self._top.get((prefix, kind), [])[:limit]
+        else:
+            ranked = self._rank(self._range(prefix), kind, limit)
+        return [self.entries[position] for position in ranked]
+
+class SuggestService:
+    """Current SuggestIndex, replaced wholesale whenever the catalogue reloads"""
+    
+    def __init__(self, precomputed_length=None, max_results=None):
+        self.precomputed_length = precomputed_length or int(os.environ.get('SUGGEST_PRECOMPUTED_PREFIX', 2))
+        self.max_results = max_results or int(os.environ.get('SUGGEST_MAX_RESULTS', 20))
+        self._index = None
+        self._cache = None
+    
+    def attach(self, cache):
+        """Rebuild after every reload of cache"""
+        self._cache = cache
+        cache.subscribe(self.rebuild)
+    
+    def rebuild(self, snapshot):
+        index = SuggestIndex(snapshot, self.precomputed_length, self.max_results)
+        # Swap the reference: readers see either the old or the new index
+        self._index = index
+        logger.info(f"🔤 Suggest index built: {len(index.entries)} entries, {len(index.keys)} keys (v{index.version})")
+        return index
+    
+    def index(self):
+        index = self._index
+        snapshot = self._cache.snapshot()
+        if index is None or index.version != snapshot.version:
+            index = self.rebuild(snapshot)
+        return index
+    
+    def suggest(self, query, limit=10, kind=None):
+        return self.index().suggest(query, limit, kind)
+
+# Global typeahead service, fed by the catalogue cache
+suggestions = SuggestService()
+suggestions.attach(catalogue_cache)
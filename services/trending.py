@@ -0,0 +1,238 @@
+"""
+Trending maps for KingGroup backend
+Forward-decayed download scores per map, kept incrementally with a global top-K
+"""
+import os
+import math
+import time
+import bisect
+import logging
+import datetime
+import threading
+from sqlalchemy import text
+from config.database import db_config
+from .catalogue import catalogue_cache
+from .events import event_bus, DOWNLOAD_TOPIC
+
+logger = logging.getLogger(__name__)
+
+# Rescale once weights reach e^RESCALE_EXPONENT to stay far from float overflow
+RESCALE_EXPONENT = 60.0
+
+class TopK:
+    """The K highest scores of one dimension, kept sorted; scores only ever grow"""
+    
+    def __init__(self, k):
+        self.k = k
+        self._entries = []  # (-score, map_id), ascending = best first
+        self._scores = {}
+    
+    def offer(self, map_id, score):
+        """Record map_id's new score"""
+        previous = self._scores.get(map_id)
+        if previous is not None:
+            del self._entries[bisect.bisect_left(self._entries, (-previous, map_id))]
+        elif len(self._entries) >= self.k:
+            if score <= -self._entries[-1][0]:
+                return
+            _, evicted = self._entries.pop()
+            del self._scores[evicted]
+        bisect.insort(self._entries, (-score, map_id))
+        self._scores[map_id] = score
+    
+    def items(self):
+        """(map_id, score) best first"""
+        return [(map_id, -negative) for negative, map_id in self._entries]
+    
+    def scale(self, factor):
+        self._entries = [(negative * factor, map_id) for negative, map_id in self._entries]
+        self._scores = {map_id: score * factor for map_id, score in self._scores.items()}
+
+class TrendingIndex:
+    """Exponentially decayed download counts per map, with the global top-K kept sorted"""
+    
+    # Forward decay: a download at time t adds e^(λ(t - landmark)); comparing
+    # scores at any single instant needs no decay step at all.
+    
+    # The full scan runs once (at preload or in the background); later reloads
+    # only read downloads past the last id seen, re-reading a margin of ids so
+    # rows committed out of id order are not missed, and skip ids already counted.
+    
+    def __init__(self, half_life_hours=None, top_k=None, reload_seconds=None, rescan_ids=None):
+        self.half_life_hours = half_life_hours or float(os.environ.get('TRENDING_HALF_LIFE_HOURS', 72))
+        self.top_k = top_k or int(os.environ.get('TRENDING_TOP_K', 200))
+        self.reload_seconds = reload_seconds or float(os.environ.get('TRENDING_RELOAD_SECONDS', 900))
+        self.rescan_ids = rescan_ids or int(os.environ.get('TRENDING_RESCAN_IDS', 1000))
+        self.decay_rate = math.log(2) / (self.half_life_hours * 3600)
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._loaded_monotonic = None
+        self._last_id = 0
+        self._counted = set()
+        self._reset(time.time())
+    
+    def _reset(self, landmark):
+        self._landmark = landmark
+        self._scores = {}
+        self._top = TopK(self.top_k)
+    
+    def record(self, map_id, at=None, map_data=None, download_id=None):
+        """Count one download of map_id at time at (epoch seconds)"""
+        if map_data is None:
+            map_data = catalogue_cache.snapshot().by_id.get(map_id)
+        if map_data is None:
+            return
+        at = at or time.time()
+        with self._lock:
+            if download_id is not None:
+                if download_id in self._counted:
+                    return
+                self._counted.add(download_id)
+            self._record_locked(map_id, at, map_data)
+    
+    def _record_locked(self, map_id, at, map_data):
+        exponent = self.decay_rate * (at - self._landmark)
+        if exponent > RESCALE_EXPONENT:
+            self._rescale(at)
+            exponent = 0.0
+        score = self._scores.get(map_id, 0.0) + math.exp(exponent)
+        self._scores[map_id] = score
+        self._top.offer(map_id, score)
+    
+    def _rescale(self, landmark):
+        factor = math.exp(-self.decay_rate * (landmark - self._landmark))
+        for map_id in self._scores:
+            self._scores[map_id] *= factor
+        self._top.scale(factor)
+        self._landmark = landmark
+    
+    def top(self):
+        """[(map_id, decayed score now)] best first, at most top_k maps"""
+        self._ensure_loaded()
+        with self._lock:
+            items = self._top.items()
+            decay = math.exp(-self.decay_rate * (time.time() - self._landmark))
+        return [(map_id, score * decay) for map_id, score in items]
+    
+    def scores(self):
+        """{map_id: decayed score now} for every map with recent downloads"""
+        self._ensure_loaded()
+        with self._lock:
+            scores = dict(self._scores)
+            decay = math.exp(-self.decay_rate * (time.time() - self._landmark))
+        return {map_id: score * decay for map_id, score in scores.items()}
+    
+    def load(self):
+        """Rebuild scores from the downloads of the last few half-lives"""
+        now = time.time()
+        since = datetime.datetime.utcfromtimestamp(now - 8 * self.half_life_hours * 3600)
+        snapshot = catalogue_cache.snapshot()
+        
+        fresh = TrendingIndex(self.half_life_hours, self.top_k, self.reload_seconds, self.rescan_ids)
+        fresh._reset(now)
+        session = db_config.get_read_session()
+        try:
+            # Taken first: rows committed during the scan are picked up by the next refresh
+            fresh._last_id = session.execute(text("SELECT MAX(id) FROM downloads")).scalar() or 0
+            result = session.execute(
+                text("SELECT id, map_id, download_date FROM downloads WHERE download_date >= :since"),
+                {'since': since}
+            )
+            count = 0
+            for download_id, map_id, download_date in result:
+                fresh._counted.add(download_id)
+                map_data = snapshot.by_id.get(map_id)
+                if map_data is None or download_date is None:
+                    continue
+                fresh._record_locked(map_id, _epoch(download_date), map_data)
+                count += 1
+        finally:
+            session.close()
+        
+        with self._lock:
+            self._landmark, self._scores, self._top = fresh._landmark, fresh._scores, fresh._top
+            self._last_id, self._counted = fresh._last_id, fresh._counted
+            self._prune_counted()
+            self._loaded_monotonic = time.monotonic()
+        logger.info(f"📈 Trending scores loaded from {count} recent downloads")
+        return count
+    
+    def refresh(self):
+        """Add the downloads other workers committed since the last load"""
+        since = datetime.datetime.utcfromtimestamp(time.time() - 8 * self.half_life_hours * 3600)
+        session = db_config.get_read_session()
+        try:
+            rows = session.execute(
+                text("SELECT id, map_id, download_date FROM downloads WHERE id > :floor AND download_date >= :since"),
+                {'floor': self._last_id - self.rescan_ids, 'since': since}
+            ).all()
+        finally:
+            session.close()
+        
+        snapshot = catalogue_cache.snapshot()
+        count = 0
+        with self._lock:
+            for download_id, map_id, download_date in rows:
+                self._last_id = max(self._last_id, download_id)
+                if download_id in self._counted:
+                    continue
+                self._counted.add(download_id)
+                map_data = snapshot.by_id.get(map_id)
+                if map_data is None or download_date is None:
+                    continue
+                self._record_locked(map_id, _epoch(download_date), map_data)
+                count += 1
+            self._prune_counted()
+            self._loaded_monotonic = time.monotonic()
+        if count:
+            logger.info(f"📈 Trending scores refreshed with {count} downloads from other workers")
+        return count
+    
+    def _prune_counted(self):
+        floor = self._last_id - self.rescan_ids
+        self._counted = {download_id for download_id in self._counted if download_id > floor}
+    
+    def _ensure_loaded(self):
+        if self._loaded_monotonic is None:
+            # Never scan in the request: serve what has been recorded so far until the warm-up finishes
+            self._schedule_refresh()
+        elif time.monotonic() - self._loaded_monotonic > self.reload_seconds:
+            # Other workers' downloads only reach this index through a reload
+            self._schedule_refresh()
+    
+    def _schedule_refresh(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        
+        def run():
+            try:
+                if self._loaded_monotonic is None:
+                    self.load()
+                else:
+                    self.refresh()
+            except Exception as e:
+                logger.warning(f"⚠️ Trending reload failed: {str(e)}")
+            finally:
+                self._refreshing = False
+        
+        threading.Thread(target=run, name='trending-reload', daemon=True).start()
+    
+    def after_fork(self):
+        """Reset locks that a reload thread may have held when the process forked"""
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+def _epoch(value):
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.timestamp()
+
+# Global trending index, fed by committed downloads
+trending = TrendingIndex()
+event_bus.subscribe(DOWNLOAD_TOPIC, lambda payload: trending.record(
+    payload['map_id'], payload['at'], download_id=payload.get('download_id')
+))
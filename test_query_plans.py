@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test script for hot query plans
+Runs EXPLAIN on every hot access path and fails on full table scans
+"""
+import os
+import json
+import datetime
+import tempfile
+from sqlalchemy import create_engine, select, func, text
+
+def hot_queries():
+    """The statements behind get_maps, get_user_downloads and the admin statistics"""
+    from models.user import User
+    from models.map import Map
+    from models.download import Download
+    
+    today_start = datetime.datetime.combine(datetime.date.today(), datetime.time.min)
+    tomorrow_start = today_start + datetime.timedelta(days=1)
+    week_ago = datetime.datetime.now() - datetime.timedelta(days=7)
+    
+    return {
+        'get_maps page': select(Map).where(Map.is_active == True).order_by(
+            Map.download_count.desc()).limit(20),
+        'get_maps page by type': select(Map).where(Map.is_active == True, Map.map_type == 'offline').order_by(
+            Map.download_count.desc()).limit(20),
+        'get_maps total by type': select(func.count()).select_from(Map).where(
+            Map.is_active == True, Map.map_type == 'offline'),
+        'user downloads page': select(Download).where(Download.user_id == 42).order_by(
+            Download.download_date.desc()).limit(20),
+        'user downloads total': select(func.count()).select_from(Download).where(Download.user_id == 42),
+        'user downloads today': select(func.count()).select_from(Download).where(
+            Download.user_id == 42, Download.download_date >= func.current_date()),
+        'stats downloads today': select(func.count()).select_from(Download).where(
+            Download.download_date >= today_start, Download.download_date < tomorrow_start),
+        'stats downloads this week': select(func.count()).select_from(Download).where(
+            Download.download_date >= week_ago),
+        'stats recent activity': select(Download).order_by(Download.download_date.desc()).limit(10),
+        'stats new users today': select(func.count()).select_from(User).where(
+            User.created_at >= today_start, User.created_at < tomorrow_start),
+        'categories maps per country': select(Map.country_id, func.count(Map.id)).where(
+            Map.is_active == True, Map.country_id != None).group_by(Map.country_id),
+        'stats users per country': select(User.country_id, func.count(User.id)).where(
+            User.country_id != None).group_by(User.country_id),
+        'stats users seen this week': select(func.count(User.id)).where(
+            User.last_seen_at >= today_start - datetime.timedelta(days=7)),
+    }
+
+def _sqlite_problems(connection, statement):
+    """Full scans and sorts reported by EXPLAIN QUERY PLAN"""
+    compiled = statement.compile(bind=connection, compile_kwargs={'literal_binds': True})
+    problems = []
+    for row in connection.execute(text(f'EXPLAIN QUERY PLAN {compiled}')):
+        detail = row[-1]
+        if detail.startswith('SCAN') and 'USING' not in detail:
+            problems.append(detail)
+        elif 'TEMP B-TREE' in detail:
+            problems.append(detail)
+    return problems
+
+def _postgres_problems(connection, statement):
+    """Seq Scan nodes in the plan, with sequential scans discouraged so any usable index is chosen"""
+    compiled = statement.compile(bind=connection, compile_kwargs={'literal_binds': True})
+    connection.execute(text('SET LOCAL enable_seqscan = off'))
+    plan = connection.execute(text(f'EXPLAIN (FORMAT JSON) {compiled}')).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    
+    problems = []
+    nodes = [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node['Node Type'] == 'Seq Scan':
+            problems.append(f"Seq Scan on {node['Relation Name']}")
+        nodes.extend(node.get('Plans', []))
+    return problems
+
+def test_query_plans():
+    """Every hot query is served by an index"""
+    from config.database import Base, ensure_indexes
+    queries = hot_queries()
+    
+    database_url = os.environ.get('TEST_DATABASE_URL')
+    if not database_url:
+        workdir = tempfile.mkdtemp(prefix='kinggroup-plans-')
+        database_url = f"sqlite:///{os.path.join(workdir, 'plans.db')}"
+    
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    ensure_indexes(engine)
+    explain = _postgres_problems if engine.dialect.name == 'postgresql' else _sqlite_problems
+    
+    print(f"🔍 Checking hot query plans on {engine.dialect.name}...")
+    failures = {}
+    for name, statement in queries.items():
+        with engine.begin() as connection:
+            problems = explain(connection, statement)
+        print(f"{'❌' if problems else '✅'} {name}{': ' + '; '.join(problems) if problems else ''}")
+        if problems:
+            failures[name] = problems
+    
+    engine.dispose()
+    assert not failures, f"Full scans in hot queries: {failures}"
+    print("✅ All hot queries use an index")
+    return True
+
+if __name__ == "__main__":
+    test_query_plans()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test script for read replica routing
+Runs a primary and a replica as two local SQLite files
+"""
+import os
+import tempfile
+
+def test_replica_routing():
+    """Reads go to the replica, recent writers stick to the primary, failing replicas are ejected"""
+    from config.database import DatabaseConfig, Base
+    from models.map import Map
+    
+    workdir = tempfile.mkdtemp(prefix='kinggroup-replicas-')
+    primary_url = f"sqlite:///{os.path.join(workdir, 'primary.db')}"
+    replica_url = f"sqlite:///{os.path.join(workdir, 'replica.db')}"
+    
+    os.environ['DATABASE_URL'] = primary_url
+    os.environ['DB_REPLICA_URLS'] = replica_url
+    try:
+        config = DatabaseConfig()
+    finally:
+        del os.environ['DATABASE_URL']
+        del os.environ['DB_REPLICA_URLS']
+    
+    print("🔍 Testing read replica routing...")
+    Base.metadata.create_all(bind=config.engine)
+    Base.metadata.create_all(bind=config.replicas.replicas[0].engine)
+    
+    # Tag each database so we can tell which one served the read
+    for url, name in ((primary_url, 'primary'), (replica_url, 'replica')):
+        engine = config.engine if url == primary_url else config.replicas.replicas[0].engine
+        with engine.begin() as connection:
+            connection.execute(Map.__table__.insert(), [{
+                'country': 'Brazil', 'map_type': 'offline', 'map_name': name,
+                'is_premium': False, 'is_active': True
+            }])
+    
+    def served_by(user_id=None):
+        session = config.get_read_session(user_id)
+        try:
+            return session.query(Map.map_name).scalar()
+        finally:
+            session.close()
+    
+    assert served_by() == 'replica'
+    assert served_by(user_id=42) == 'replica'
+    
+    # Read-your-writes: a user who just wrote reads from the primary
+    config.mark_write(42)
+    assert served_by(user_id=42) == 'primary'
+    assert served_by(user_id=7) == 'replica'
+    
+    # Another worker never saw the write: the client's signed marker pins it instead
+    from config.replicas import client_write
+    config.replicas._recent_writes.clear()
+    assert served_by(user_id=42) == 'replica'
+    marker = client_write.set(42)
+    assert served_by(user_id=42) == 'primary'
+    assert served_by(user_id=7) == 'replica'
+    client_write.reset(marker)
+    
+    # Lagging replica is ejected, then re-admitted once it catches up
+    replica = config.replicas.replicas[0]
+    replica.measure_lag = lambda: config.replicas.max_lag_seconds + 1
+    config.replicas.check()
+    assert not replica.healthy
+    assert served_by() == 'primary'
+    
+    replica.measure_lag = lambda: 0.0
+    config.replicas.check()
+    assert replica.healthy
+    assert served_by() == 'replica'
+    
+    config.replicas.dispose()
+    config.engine.dispose()
+    print("✅ Replica routing test successful!")
+
+if __name__ == "__main__":
+    test_replica_routing()
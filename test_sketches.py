@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Test script for download analytics sketches
+Checks Space-Saving bounds and HyperLogLog accuracy across merged, re-encoded sketches
+"""
+import random
+from collections import Counter
+
+def test_sketches():
+    """Merged sketches stay within their advertised error bounds"""
+    from services.sketches import SpaceSaving, HyperLogLog, decode_sketch
+    
+    rng = random.Random(7)
+    stream = [int(rng.paretovariate(1.1)) for _ in range(30000)]
+    exact = Counter(stream)
+    
+    # Three workers, each with its own summary, merged through the encoded form
+    workers = [SpaceSaving(50) for _ in range(3)]
+    for position, item in enumerate(stream):
+        workers[position % 3].offer(item)
+    merged = decode_sketch(workers[0].encode())
+    for worker in workers[1:]:
+        merged.merge(decode_sketch(worker.encode()))
+    
+    assert merged.total == len(stream)
+    for item, count, error in merged.top():
+        assert count - error <= exact[item] <= count, (item, count, error, exact[item])
+        assert error <= merged.max_error()
+    assert [item for item, _, _ in merged.top(5)] == [item for item, _ in exact.most_common(5)]
+    print("✅ Space-Saving counts bracket the exact counts")
+    
+    halves = [HyperLogLog(12), HyperLogLog(12)]
+    for value in range(60000):
+        halves[value % 2].add(f"user-{value}")
+    for value in range(20000):  # duplicates must not count twice
+        halves[1].add(f"user-{value}")
+    union = decode_sketch(halves[0].encode())
+    union.merge(decode_sketch(halves[1].encode()))
+    relative = abs(union.count() - 60000) / 60000
+    assert relative < 4 * union.standard_error(), relative
+    
+    small = HyperLogLog(10)
+    for value in range(30):
+        small.add(value)
+    assert round(small.count()) in range(29, 32)
+    print(f"✅ HyperLogLog within bounds (relative error {relative:.4f})")
+    return True
+
+if __name__ == "__main__":
+    test_sketches()